@@ -0,0 +1,59 @@
+# acceptance.py
+
+import collections
+import numpy as np
+from metrics import count_overlaps, wirelength_in_band
+
+def retry_seed(seed, attempt):
+    """第 attempt 次重試使用的 SEED，只由 (原 SEED, attempt) 決定。"""
+    return int(np.random.SeedSequence([int(seed), attempt]).generate_state(1)[0])
+
+def check_placement(layout, settings):
+    """
+    generate() 結束後、生成引腳與連線之前檢查的條件：元件數、密度與重疊。
+    回傳 (未通過的條件名稱, 說明)；全部通過時回傳 None。
+    """
+    count = len(layout.rectangles)
+    if settings.get('min_components') is not None and count < settings['min_components']:
+        return 'min_components', f"元件數 {count} < {settings['min_components']}"
+    if settings.get('max_components') is not None and count > settings['max_components']:
+        return 'max_components', f"元件數 {count} > {settings['max_components']}"
+    boxes = np.array([(r.x, r.y, r.w, r.h) for r in layout.rectangles], dtype=float).reshape(-1, 4)
+    if settings.get('min_density') is not None:
+        density = float((boxes[:, 2] * boxes[:, 3]).sum() / (layout.canvas_width * layout.canvas_height))
+        if density < settings['min_density']:
+            return 'min_density', f"密度 {density:.2%} < {settings['min_density']:.2%}"
+    if settings.get('require_no_overlaps', False):
+        overlaps = count_overlaps(boxes)
+        if overlaps:
+            return 'overlaps', f"仍有 {overlaps} 個重疊"
+    return None
+
+def check_netlist(layout, settings):
+    """連線建立後的線長指標篩選 (metrics.wirelength_in_band)；未設定任何界限時不計算。"""
+    minimum, maximum = settings.get('min_wirelength'), settings.get('max_wirelength')
+    if minimum is None and maximum is None:
+        return None
+    metric = settings.get('wirelength_metric', 'wl_mean')
+    ok, value = wirelength_in_band(layout, metric, minimum, maximum)
+    return None if ok else ('wirelength', f"{metric} = {value:.2f} 超出線長範圍")
+
+class AcceptanceStats:
+    """記錄各樣本的嘗試次數與未通過的條件，供執行結束時的摘要使用。"""
+    def __init__(self):
+        self.rejections = collections.Counter()
+        self.accepted = self.retried = self.abandoned = 0
+
+    def reject(self, predicate):
+        self.rejections[predicate] += 1
+
+    def finish(self, attempts, accepted):
+        self.accepted += accepted
+        self.abandoned += not accepted
+        self.retried += attempts > 1
+
+    def summary(self):
+        total = sum(self.rejections.values())
+        detail = ', '.join(f"{name}: {count}" for name, count in self.rejections.most_common())
+        return (f"篩選統計：接受 {self.accepted} 個樣本、放棄 {self.abandoned} 個，"
+                f"{self.retried} 個樣本經過重試，共拒絕 {total} 次" + (f" ({detail})" if detail else ""))
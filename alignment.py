@@ -2,6 +2,8 @@
 
 import random
 from layout import Rectangle
+from occupancy import OccupancyMap
+from config_compiler import draw_int
 
 class AlignmentGenerator:
     def __init__(self, main_params):
@@ -11,34 +13,26 @@ class AlignmentGenerator:
         self.canvas_w = main_params['CANVAS_WIDTH']
         self.canvas_h = main_params['CANVAS_HEIGHT']
 
-    def _generate_set(self, start_id, group_id, existing_rects):
+    def _draw_set(self):
+        """
+        抽取一個對齊集合的元件類型、對齊模式與尺寸，並以種子元件中心為原點
+        計算每個元件的相對位置與整個集合的邊界框，不建立任何 Rectangle。
+        """
         comp_type = 'macro' if random.random() < self.align_config.get('macro_proportion', 0.1) else 'std_cell'
         type_def = self.comp_types_config[comp_type]
         
-        components_per_set_config = self.align_config['components_per_set']
-        num_components = random.randint(components_per_set_config['low'], components_per_set_config['high'])
+        num_components = draw_int(self.align_config['components_per_set'])
         
         modes = [choice['mode'] for choice in self.align_config['alignment_mode_weights']]
         weights = [choice['weight'] for choice in self.align_config['alignment_mode_weights']]
         align_mode = random.choices(modes, weights=weights, k=1)[0]
-        
-        generated_rects, alignment_constraints = [], []
-        current_id = start_id
 
         w = random.uniform(*type_def['width_range'])
         h = random.uniform(*type_def['height_range'])
         growth_prob = random.uniform(*type_def['growth_prob_range'])
-        padding = 100
-        x, y = random.uniform(padding + w/2, self.canvas_w - padding - w/2), random.uniform(padding + h/2, self.canvas_h - padding - h/2)
-        
-        seed_rect = Rectangle(current_id, x, y, w, h, growth_prob, comp_type)
-        seed_rect.fixed = True
-        seed_rect.constraints['alignment_id'] = group_id
-        seed_rect.constraints['alignment_type'] = align_mode
-        
-        generated_rects.append(seed_rect)
-        last_rect = seed_rect
-        current_id += 1
+        members = [(0.0, 0.0, w, h, growth_prob)]
+        seed_w, seed_h = w, h
+        last_x, last_y, last_w, last_h = 0.0, 0.0, w, h
 
         for i in range(1, num_components):
             w = random.uniform(*type_def['width_range'])
@@ -46,38 +40,59 @@ class AlignmentGenerator:
             growth_prob = random.uniform(*type_def['growth_prob_range'])
             gap = random.uniform(*self.align_config['gap_range'])
             
-            if align_mode == 'left': new_x, new_y = (seed_rect.x - seed_rect.w/2) + w/2, last_rect.y + last_rect.h/2 + gap + h/2
-            elif align_mode == 'right': new_x, new_y = (seed_rect.x + seed_rect.w/2) - w/2, last_rect.y + last_rect.h/2 + gap + h/2
-            elif align_mode == 'top': new_x, new_y = last_rect.x + last_rect.w/2 + gap + w/2, (seed_rect.y - seed_rect.h/2) + h/2
-            elif align_mode == 'bottom': new_x, new_y = last_rect.x + last_rect.w/2 + gap + w/2, (seed_rect.y + seed_rect.h/2) - h/2
-            elif align_mode == 'h_center': new_x, new_y = seed_rect.x, last_rect.y + last_rect.h/2 + gap + h/2
-            else: new_x, new_y = last_rect.x + last_rect.w/2 + gap + w/2, seed_rect.y
-            
-            new_rect = Rectangle(current_id, new_x, new_y, w, h, growth_prob, comp_type)
+            if align_mode == 'left': new_x, new_y = -seed_w/2 + w/2, last_y + last_h/2 + gap + h/2
+            elif align_mode == 'right': new_x, new_y = seed_w/2 - w/2, last_y + last_h/2 + gap + h/2
+            elif align_mode == 'top': new_x, new_y = last_x + last_w/2 + gap + w/2, -seed_h/2 + h/2
+            elif align_mode == 'bottom': new_x, new_y = last_x + last_w/2 + gap + w/2, seed_h/2 - h/2
+            elif align_mode == 'h_center': new_x, new_y = 0.0, last_y + last_h/2 + gap + h/2
+            else: new_x, new_y = last_x + last_w/2 + gap + w/2, 0.0
+
+            members.append((new_x, new_y, w, h, growth_prob))
+            last_x, last_y, last_w, last_h = new_x, new_y, w, h
+
+        bbox = (min(x - w/2 for x, _, w, _, _ in members), min(y - h/2 for _, y, _, h, _ in members),
+                max(x + w/2 for x, _, w, _, _ in members), max(y + h/2 for _, y, _, h, _ in members))
+        return {'comp_type': comp_type, 'mode': align_mode, 'members': members, 'bbox': bbox}
+
+    def _build_set(self, set_shape, seed_x, seed_y, start_id, group_id):
+        """在已確定的種子位置建立對齊集合的固定矩形與對齊約束。"""
+        generated_rects, alignment_constraints = [], []
+        align_mode = set_shape['mode']
+        for idx, (dx, dy, w, h, growth_prob) in enumerate(set_shape['members']):
+            new_rect = Rectangle(start_id + idx, seed_x + dx, seed_y + dy, w, h, growth_prob, set_shape['comp_type'])
             new_rect.fixed = True
             new_rect.constraints['alignment_id'] = group_id
             new_rect.constraints['alignment_type'] = align_mode
-
-            alignment_constraints.append((last_rect.id, new_rect.id, align_mode))
+            if generated_rects:
+                alignment_constraints.append((generated_rects[-1].id, new_rect.id, align_mode))
             generated_rects.append(new_rect)
-            last_rect = new_rect
-            current_id += 1
-            
-        return generated_rects, alignment_constraints, current_id
+        return generated_rects, alignment_constraints, start_id + len(generated_rects)
 
-    def generate_aligned_sets(self, start_id, existing_rects):
+    def generate_aligned_sets(self, start_id, existing_rects, occupancy=None):
         print("\n--- 開始生成對齊群組 (無 Pin 生成) ---")
-        num_sets_config = self.align_config['num_sets']
-        num_sets = random.randint(num_sets_config['low'], num_sets_config['high'])
+        num_sets = draw_int(self.align_config['num_sets'])
         all_newly_placed_rects, all_alignment_constraints = [], []
         current_id = start_id
+        if occupancy is None:
+            occupancy = OccupancyMap.from_rects(self.canvas_w, self.canvas_h, existing_rects,
+                                                self.params.get('OCCUPANCY_CELL_SIZE', 4.0))
+        padding = 100
         
         for i in range(num_sets):
             group_id_str = f"align_group_{i}"
             for _ in range(150):
-                potential_rects, potential_constraints, next_id = self._generate_set(current_id, group_id_str, existing_rects)
-                if any(not (0 <= r.x - r.w/2 and r.x + r.w/2 <= self.canvas_w and 0 <= r.y - r.h/2 and r.y + r.h/2 <= self.canvas_h) for r in potential_rects): continue
-                if any(pr.intersects(er) for pr in potential_rects for er in existing_rects): continue
+                set_shape = self._draw_set()
+                min_dx, min_dy, max_dx, max_dy = set_shape['bbox']
+                _, _, seed_w, seed_h, _ = set_shape['members'][0]
+                # 種子元件中心需離畫布邊緣至少 padding，換算成邊界框左上角的範圍
+                region = (padding + seed_w/2 + min_dx, padding + seed_h/2 + min_dy,
+                          self.canvas_w - padding - seed_w/2 + min_dx, self.canvas_h - padding - seed_h/2 + min_dy)
+                anchor = occupancy.sample_free_box(max_dx - min_dx, max_dy - min_dy, region)
+                if anchor is None: continue
+
+                potential_rects, potential_constraints, next_id = self._build_set(
+                    set_shape, anchor[0] - min_dx, anchor[1] - min_dy, current_id, group_id_str)
+                for r in potential_rects: occupancy.occupy_rect(r)
                 all_newly_placed_rects.extend(potential_rects)
                 all_alignment_constraints.extend(potential_constraints)
                 existing_rects.extend(potential_rects)
@@ -0,0 +1,230 @@
+# augment.py
+
+import os
+import argparse
+import functools
+import multiprocessing
+import time
+import numpy as np
+import serialization
+from merge_datasets import list_layout_files
+
+MANIFEST_NAME = 'augment_manifest.jsonl'
+
+# 畫布的 8 種二面體變換，以作用在「以畫布中心為原點」座標上的 2x2 矩陣表示 (y 軸向下)。
+# 非對角矩陣會交換 x / y 軸，畫布寬高與元件寬高也隨之交換
+TRANSFORMS = {
+    'identity': ((1, 0), (0, 1)),
+    'rot90': ((0, -1), (1, 0)),
+    'rot180': ((-1, 0), (0, -1)),
+    'rot270': ((0, 1), (-1, 0)),
+    'flip_h': ((-1, 0), (0, 1)),
+    'flip_v': ((1, 0), (0, -1)),
+    'transpose': ((0, 1), (1, 0)),
+    'anti_transpose': ((0, -1), (-1, 0)),
+}
+# 對齊類型：邊對齊以該邊的外法向量表示，中心對齊以對齊的座標軸表示
+ALIGN_EDGE_DIRECTIONS = {'left': (-1, 0), 'right': (1, 0), 'top': (0, -1), 'bottom': (0, 1)}
+ALIGN_CENTER_AXES = {'h_center': 0, 'v_center': 1}
+SYMMETRY_AXES = ('vertical', 'horizontal')
+# 與 format_for_ml.OUR_ALIGN_MAP 相同的 one-hot 順序
+ALIGN_ORDER = ('left', 'right', 'top', 'bottom', 'h_center', 'v_center')
+
+def resolve_transforms(names):
+    """'all' 或 None 代表全部 8 種；否則為名稱串列 (或逗號分隔的字串)。"""
+    if names in (None, 'all'):
+        return list(TRANSFORMS)
+    if isinstance(names, str):
+        names = [name.strip() for name in names.split(',') if name.strip()]
+    unknown = [name for name in names if name not in TRANSFORMS]
+    if unknown:
+        raise ValueError(f"不支援的變換: {', '.join(unknown)}，可用的變換: {tuple(TRANSFORMS)}")
+    return list(names)
+
+def swaps_axes(name):
+    return TRANSFORMS[name][0][0] == 0
+
+def remap_alignment(align_type, name):
+    """變換後的對齊類型：left/right/top/bottom 依外法向量旋轉或鏡射，h_center/v_center 在交換軸時互換。"""
+    m = np.array(TRANSFORMS[name])
+    if align_type in ALIGN_EDGE_DIRECTIONS:
+        direction = tuple((m @ ALIGN_EDGE_DIRECTIONS[align_type]).tolist())
+        return next(t for t, d in ALIGN_EDGE_DIRECTIONS.items() if d == direction)
+    if align_type in ALIGN_CENTER_AXES and swaps_axes(name):
+        return 'v_center' if align_type == 'h_center' else 'h_center'
+    return align_type
+
+def remap_symmetry_axis(axis, name):
+    """vertical / horizontal 對稱軸在交換軸時互換；common_centroid 不變。"""
+    if axis in SYMMETRY_AXES and swaps_axes(name):
+        return 'horizontal' if axis == 'vertical' else 'vertical'
+    return axis
+
+def align_permutation(name):
+    """one-hot 對齊特徵的欄位置換：新特徵 = 舊特徵[:, perm]。"""
+    new_of = [ALIGN_ORDER.index(remap_alignment(t, name)) for t in ALIGN_ORDER]
+    return np.argsort(new_of)
+
+def _apply(matrices, vectors):
+    """以批次矩陣乘法一次算出所有變換：(T, 2, 2) x (..., 2) -> (T, ..., 2)。"""
+    return np.einsum('tij,...j->t...i', matrices, vectors)
+
+def _remap_constraints(constraints, name):
+    if 'alignment_type' not in constraints and 'symmetry_axis' not in constraints:
+        return constraints
+    constraints = dict(constraints)
+    if 'alignment_type' in constraints:
+        constraints['alignment_type'] = remap_alignment(constraints['alignment_type'], name)
+    if 'symmetry_axis' in constraints:
+        constraints['symmetry_axis'] = remap_symmetry_axis(constraints['symmetry_axis'], name)
+    return constraints
+
+def augment_raw(data, names):
+    """
+    對一份原始佈局 (main.py 的輸出) 套用多個變換，回傳變換後的資料串列。
+    矩形中心、寬高與引腳相對位置以 NumPy 一次算完所有變換；ID、連線與階層群組不變。
+    """
+    layout = data['layout_data']
+    canvas = np.array([layout['canvas_width'], layout['canvas_height']], dtype=float)
+    rects, pins = layout['rectangles'], layout.get('pins', [])
+    matrices = np.array([TRANSFORMS[name] for name in names], dtype=float)
+    centers = np.array([(r['x'], r['y']) for r in rects], dtype=float).reshape(-1, 2) - canvas / 2
+    sizes = np.array([(r['w'], r['h']) for r in rects], dtype=float).reshape(-1, 2)
+    rel = np.array([pin['rel_pos'] for pin in pins], dtype=float).reshape(-1, 2)
+    new_centers, new_rel = _apply(matrices, centers), _apply(matrices, rel)
+
+    results = []
+    for t, name in enumerate(names):
+        swap = swaps_axes(name)
+        new_canvas = canvas[::-1] if swap else canvas
+        xy = (new_centers[t] + new_canvas / 2).tolist()
+        wh = (sizes[:, ::-1] if swap else sizes).tolist()
+        new_rects = [dict(r, x=x, y=y, w=w, h=h, constraints=_remap_constraints(r.get('constraints', {}), name))
+                     for r, (x, y), (w, h) in zip(rects, xy, wh)]
+        new_pins = [dict(pin, rel_pos=pos) for pin, pos in zip(pins, new_rel[t].tolist())]
+        new_layout = dict(layout, canvas_width=float(new_canvas[0]), canvas_height=float(new_canvas[1]),
+                          rectangles=new_rects, pins=new_pins,
+                          alignment_constraints=[[a, b, remap_alignment(kind, name)]
+                                                 for a, b, kind in layout.get('alignment_constraints', [])])
+        params = dict(data.get('generation_params', {}))
+        if swap and 'CANVAS_WIDTH' in params:
+            params['CANVAS_WIDTH'], params['CANVAS_HEIGHT'] = params.get('CANVAS_HEIGHT'), params['CANVAS_WIDTH']
+        params['augmentation'] = {"transform": name}
+        results.append({"generation_params": params, "layout_data": new_layout})
+    return results
+
+def augment_ml(data, names):
+    """
+    對一份 ML-ready 資料 (format_for_ml.py 的輸出，clique 或 hyperedge 編碼) 套用多個變換。
+    正規化座標以畫布中心為原點，因此 target、子元件位移與連線特徵都直接乘上變換矩陣，
+    節點與子元件尺寸在交換軸時交換，對齊邊的 one-hot 特徵依對齊類型的對應關係重新排列。
+    """
+    matrices = np.array([TRANSFORMS[name] for name in names], dtype=float)
+    node = np.array(data['node'], dtype=float).reshape(-1, 2)
+    target = _apply(matrices, np.array(data['target'], dtype=float).reshape(-1, 2))
+    subs = data['sub_components']
+    offsets = _apply(matrices, np.array([c['offset'] for s in subs for c in s], dtype=float).reshape(-1, 2))
+    dims = np.array([c['dims'] for s in subs for c in s], dtype=float).reshape(-1, 2)
+    edges = data['edges']
+    basic = edges['basic_component_edge']
+    features = _apply(matrices, np.array([e[1] for e in basic], dtype=float).reshape(-1, 2, 2))
+    hyperedge = data.get('constraint_encoding') == 'hyperedge'
+    align_key = 'align_hyperedge' if hyperedge else 'align_edge'
+    align = edges[align_key]
+    align_features = np.array(align['features'] if hyperedge else [e[1] for e in align], dtype=float).reshape(-1, len(ALIGN_ORDER))
+
+    results = []
+    for t, name in enumerate(names):
+        swap = swaps_axes(name)
+        new_offsets = offsets[t].tolist()
+        new_dims = (dims[:, ::-1] if swap else dims).tolist()
+        k, new_subs = 0, []
+        for s in subs:
+            new_subs.append([{"offset": new_offsets[k + j], "dims": new_dims[k + j]} for j in range(len(s))])
+            k += len(s)
+        new_features = features[t].reshape(-1, 4).tolist()
+        new_edges = dict(edges, basic_component_edge=[[e[0], f] for e, f in zip(basic, new_features)])
+        permuted = align_features[:, align_permutation(name)].tolist()
+        if hyperedge:
+            new_edges[align_key] = dict(align, features=permuted)
+        else:
+            new_edges[align_key] = [[e[0], f] for e, f in zip(align, permuted)]
+        results.append(dict(data, node=(node[:, ::-1] if swap else node).tolist(), target=target[t].tolist(),
+                            sub_components=new_subs, edges=new_edges))
+    return results
+
+def augment_sample(data, names):
+    """依資料格式 (有 node 欄位即為 ML-ready) 選擇 augment_ml 或 augment_raw。"""
+    return augment_ml(data, names) if 'node' in data else augment_raw(data, names)
+
+def _formatted_index(filename):
+    """由 formatted_<N>.json 取出編號 N；格式不符時回傳 None。"""
+    stem = filename[len('formatted_'):-len('.json')]
+    return int(stem) if filename.startswith('formatted_') and filename.endswith('.json') and stem.isdigit() else None
+
+def list_samples(directory):
+    """
+    列出要擴增的樣本 [(樣本檔名, 實際路徑)]：原始資料集的 layout_<N>.json (含虛擬合併清單)，
+    或 format_for_ml.py 逐檔輸出的 formatted_<N>.json。
+    """
+    samples = list_layout_files(directory)
+    if samples:
+        return samples
+    names = [f for f in os.listdir(directory) if _formatted_index(f) is not None]
+    return [(name, os.path.join(directory, name)) for name in sorted(names, key=_formatted_index)]
+
+def augment_file(task, names, output_dir):
+    """子行程工作：讀取一個樣本，寫出所有變換結果 (沿用輸入的 layout_ / formatted_ 前綴)，回傳清單紀錄。"""
+    index, name, path = task
+    outputs = augment_sample(serialization.load(path), names)
+    prefix = 'formatted_' if name.startswith('formatted_') else 'layout_'
+    entries = []
+    for t, (transform, data) in enumerate(zip(names, outputs)):
+        filename = f"{prefix}{index * len(names) + t + 1}.json"
+        with open(os.path.join(output_dir, filename), 'wb') as f:
+            f.write(serialization.dumps(data))
+        entries.append({"file": filename, "source": name, "transform": transform})
+    return entries
+
+def main():
+    parser = argparse.ArgumentParser(description="Multiply a raw or ML-ready dataset with the 8 rotations / mirrorings of the canvas.")
+    parser.add_argument("input_dir", nargs='?', default=None, help="Dataset directory. Defaults to path_settings.raw_output_directory.")
+    parser.add_argument("output_dir", nargs='?', default=None, help="Defaults to augmentation_settings.output_directory.")
+    parser.add_argument("--config", type=str, default='config.yaml', help="Path to the YAML config file.")
+    parser.add_argument("--transforms", type=str, default=None, help=f"Comma-separated subset of {', '.join(TRANSFORMS)} (default: augmentation_settings.transforms).")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: all CPUs).")
+    args = parser.parse_args()
+
+    config = {}
+    if os.path.exists(args.config):
+        import yaml
+        with open(args.config, 'r', encoding='utf-8') as f:
+            config = yaml.safe_load(f)
+    serialization.configure(**config.get('serialization_settings', {}))
+    settings = config.get('augmentation_settings', {})
+    input_dir = args.input_dir or config.get('path_settings', {}).get('raw_output_directory')
+    output_dir = args.output_dir or settings.get('output_directory', 'augmented_layouts')
+    try:
+        names = resolve_transforms(args.transforms or settings.get('transforms'))
+    except ValueError as e:
+        print(f"錯誤：{e}")
+        return
+    if not input_dir or not os.path.isdir(input_dir):
+        print(f"錯誤：輸入目錄 '{input_dir}' 不存在。")
+        return
+
+    samples = list_samples(input_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"在 '{input_dir}' 找到 {len(samples)} 個樣本，套用 {len(names)} 種變換 ({', '.join(names)})...")
+    start_time = time.time()
+    tasks = [(i, name, path) for i, (name, path) in enumerate(samples)]
+    worker_func = functools.partial(augment_file, names=names, output_dir=output_dir)
+    with multiprocessing.Pool(processes=args.workers) as pool, \
+            serialization.JsonLinesWriter(os.path.join(output_dir, MANIFEST_NAME)) as manifest:
+        for entries in pool.imap(worker_func, tasks):
+            for entry in entries:
+                manifest.write(entry)
+    print(f"完成！{len(samples) * len(names)} 個樣本已寫入 '{output_dir}' (耗時: {time.time() - start_time:.2f} 秒)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,395 @@
+# benchmark.py
+
+import argparse
+import functools
+import os
+import random
+import time
+from collections import defaultdict
+import serialization
+
+def _time_per_call(fn, args_list, repeat):
+    """對 args_list 中每組參數呼叫 fn，回傳多次重複中最快一輪的平均毫秒數與最後一輪的結果。"""
+    best, results = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [fn(*args) for args in args_list]
+        best = min(best, (time.perf_counter() - start) / max(1, len(args_list)))
+    return best * 1000, results
+
+def make_synthetic_layout(num_rects, pins_per_rect=4, edges_per_pin=3, seed=0):
+    """快速建立一份與 main.py 輸出結構相同的隨機佈局資料，用於大規模效能測試。"""
+    rng = random.Random(seed)
+    canvas = 1000.0
+    rects, pins, edges = [], [], []
+    alignment_constraints, groups = [], []
+    for i in range(num_rects):
+        constraints = {}
+        if i < num_rects // 10:
+            constraints['symmetry_id'] = f"sym_group_{i // 2}"
+        elif i < num_rects // 5:
+            constraints['alignment_id'] = f"align_group_{i // 4}"
+            constraints['alignment_type'] = 'left'
+            if i % 4: alignment_constraints.append((i - 1, i, 'left'))
+        rects.append({"id": i, "x": rng.uniform(0, canvas), "y": rng.uniform(0, canvas),
+                      "w": rng.uniform(5, 30), "h": rng.uniform(5, 30), "growth_prob": 0.5,
+                      "fixed": bool(constraints), "constraints": constraints, "component_type": "std_cell"})
+        for _ in range(pins_per_rect):
+            pins.append({"id": len(pins), "parent_rect_id": i, "rel_pos": [rng.uniform(-2, 2), rng.uniform(-2, 2)]})
+    for pin in pins:
+        for _ in range(edges_per_pin):
+            edges.append((pin['id'], rng.randrange(len(pins))))
+    ids = list(range(num_rects))
+    rng.shuffle(ids)
+    for start in range(0, num_rects // 2, 8):
+        groups.append(ids[start:start + 8])
+    layout_data = {"canvas_width": canvas, "canvas_height": canvas, "rectangles": rects, "pins": pins,
+                   "netlist_edges": edges, "alignment_constraints": alignment_constraints,
+                   "hierarchical_group_constraints": groups}
+    return {"generation_params": {}, "layout_data": layout_data}
+
+def _load_raw_samples(input_dir, limit):
+    files = sorted(f for f in os.listdir(input_dir) if f.endswith('.json'))[:limit]
+    samples = []
+    for f in files:
+        samples.append(serialization.load(os.path.join(input_dir, f)))
+    return samples
+
+# ---------------------------------------------------------------------------
+# format_for_ml: 逐節點 / 逐邊的舊版實作，作為向量化版本的效能與正確性參考
+# ---------------------------------------------------------------------------
+
+def legacy_get_node_definition(rects_in_node, node_idx):
+    if not rects_in_node:
+        return None
+    min_x = min(r['x'] - r['w']/2 for r in rects_in_node)
+    max_x = max(r['x'] + r['w']/2 for r in rects_in_node)
+    min_y = min(r['y'] - r['h']/2 for r in rects_in_node)
+    max_y = max(r['y'] + r['h']/2 for r in rects_in_node)
+
+    node_w, node_h = max_x - min_x, max_y - min_y
+    node_center_x, node_center_y = min_x + node_w / 2, min_y + node_h / 2
+
+    sub_components = []
+    for r in rects_in_node:
+        offset_x = r['x'] - node_center_x
+        offset_y = r['y'] - node_center_y
+        sub_components.append({ "offset": [offset_x, offset_y], "dims": [r['w'], r['h']] })
+
+    return {
+        'node_idx': node_idx, 'center_x': node_center_x, 'center_y': node_center_y,
+        'w': node_w, 'h': node_h, 'sub_components': sub_components,
+        'contained_rect_ids': [r['id'] for r in rects_in_node]
+    }
+
+def legacy_format_layout_data(raw_data):
+    layout = raw_data['layout_data']
+    canvas_w, canvas_h = layout['canvas_width'], layout['canvas_height']
+
+    rects_data = sorted(layout['rectangles'], key=lambda r: r['id'])
+    rect_map = {r['id']: r for r in rects_data}
+    pins_map = {p['id']: p for p in layout.get('pins', [])}
+
+    node_defs, rect_id_to_node_idx, processed_rect_ids = [], {}, set()
+    node_idx_counter = 0
+
+    constraint_map = defaultdict(lambda: defaultdict(list))
+    for r in rects_data:
+        constraints = r.get('constraints', {})
+        if 'symmetry_id' in constraints:
+            constraint_map['symmetry_id'][constraints['symmetry_id']].append(r)
+
+    if 'symmetry_id' in constraint_map:
+        for rects_in_group in constraint_map['symmetry_id'].values():
+            node_def = legacy_get_node_definition(rects_in_group, node_idx_counter)
+            if not node_def: continue
+            node_defs.append(node_def)
+            for r_id in node_def['contained_rect_ids']:
+                rect_id_to_node_idx[r_id] = node_idx_counter
+                processed_rect_ids.add(r_id)
+            node_idx_counter += 1
+
+    for r in rects_data:
+        if r['id'] not in processed_rect_ids:
+            node_def = legacy_get_node_definition([r], node_idx_counter)
+            if not node_def: continue
+            node_defs.append(node_def)
+            rect_id_to_node_idx[r['id']] = node_idx_counter
+            processed_rect_ids.add(r['id'])
+            node_idx_counter += 1
+
+    node_idx_to_def = {n['node_idx']: n for n in node_defs}
+
+    p = [[n['w'] / canvas_w, n['h'] / canvas_h] for n in node_defs]
+    target = [[(n['center_x'] / canvas_w * 2) - 1, (n['center_y'] / canvas_h * 2) - 1] for n in node_defs]
+
+    basic_component_edges, alignment_edges, group_edges = [], [], []
+
+    for pin1_id, pin2_id in layout.get('netlist_edges', []):
+        pin1, pin2 = pins_map.get(pin1_id), pins_map.get(pin2_id)
+        if not pin1 or not pin2: continue
+        src_rect_id, dst_rect_id = pin1['parent_rect_id'], pin2['parent_rect_id']
+        if src_rect_id == dst_rect_id: continue
+        src_node_idx, dst_node_idx = rect_id_to_node_idx.get(src_rect_id), rect_id_to_node_idx.get(dst_rect_id)
+        if src_node_idx is None or dst_node_idx is None or src_node_idx == dst_node_idx: continue
+        src_node_def, dst_node_def = node_idx_to_def[src_node_idx], node_idx_to_def[dst_node_idx]
+        src_rect, dst_rect = rect_map[src_rect_id], rect_map[dst_rect_id]
+        pin1_abs_x, pin1_abs_y = src_rect['x'] + pin1['rel_pos'][0], src_rect['y'] + pin1['rel_pos'][1]
+        pin2_abs_x, pin2_abs_y = dst_rect['x'] + pin2['rel_pos'][0], dst_rect['y'] + pin2['rel_pos'][1]
+        sx, sy = (pin1_abs_x - src_node_def['center_x']) / canvas_w, (pin1_abs_y - src_node_def['center_y']) / canvas_h
+        dx, dy = (pin2_abs_x - dst_node_def['center_x']) / canvas_w, (pin2_abs_y - dst_node_def['center_y']) / canvas_h
+        basic_component_edges.append([[src_node_idx, dst_node_idx], [sx, sy, dx, dy]])
+
+    our_align_map = {"left": 0, "right": 1, "top": 2, "bottom": 3, "h_center": 4, "v_center": 5}
+    for id1, id2, align_type in layout.get('alignment_constraints', []):
+        node1_idx, node2_idx = rect_id_to_node_idx.get(id1), rect_id_to_node_idx.get(id2)
+        if node1_idx is None or node2_idx is None or node1_idx == node2_idx: continue
+        feature_vec = [0.0] * 6
+        if align_type in our_align_map: feature_vec[our_align_map[align_type]] = 1.0
+        alignment_edges.append([[node1_idx, node2_idx], feature_vec])
+
+    for group in layout.get('hierarchical_group_constraints', []):
+        node_indices_in_group = list(set(rect_id_to_node_idx[r_id] for r_id in group if r_id in rect_id_to_node_idx))
+        for i in range(len(node_indices_in_group)):
+            for j in range(i + 1, len(node_indices_in_group)):
+                node1_idx, node2_idx = node_indices_in_group[i], node_indices_in_group[j]
+                if node1_idx == node2_idx: continue
+                group_edges.append([[node1_idx, node2_idx], [1.0]])
+
+    return {
+        "node": p, "target": target,
+        "edges": {
+            "basic_component_edge": basic_component_edges,
+            "align_edge": alignment_edges,
+            "group_edge": group_edges,
+        },
+        "sub_components": [n['sub_components'] for n in node_defs]
+    }
+
+def bench_format(args):
+    """比較舊版與向量化版 format_layout_data 的每樣本耗時，並確認輸出一致。"""
+    from format_for_ml import format_layout_data
+
+    if args.input_dir:
+        datasets = [(f"{args.input_dir} ({args.limit} files)", _load_raw_samples(args.input_dir, args.limit))]
+    else:
+        datasets = [(f"synthetic {n} rects", [make_synthetic_layout(n, seed=n)]) for n in args.sizes]
+
+    print(f"{'dataset':<32} {'legacy ms':>12} {'vectorized ms':>14} {'speedup':>9} {'match':>7}")
+    for name, samples in datasets:
+        args_list = [(s,) for s in samples]
+        legacy_ms, legacy_out = _time_per_call(legacy_format_layout_data, args_list, args.repeat)
+        new_ms, new_out = _time_per_call(format_layout_data, args_list, args.repeat)
+        match = serialization.dumps(legacy_out) == serialization.dumps(new_out)
+        print(f"{name:<32} {legacy_ms:>12.2f} {new_ms:>14.2f} {legacy_ms / new_ms:>8.1f}x {str(match):>7}")
+
+def bench_serialization(args):
+    """量測每個可用 JSON 後端 (緊湊 / 縮排) 的每樣本輸出大小、寫出與讀取耗時。"""
+    import tempfile
+
+    if args.input_dir:
+        samples = _load_raw_samples(args.input_dir, args.limit)
+    else:
+        samples = [make_synthetic_layout(n, seed=n) for n in args.sizes]
+
+    print(f"{len(samples)} samples")
+    print(f"{'backend':<10} {'indent':>6} {'bytes/sample':>14} {'dump ms':>10} {'load ms':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'sample.json')
+        for backend in serialization.BACKENDS:
+            for indent in (None, 2):
+                size = sum(len(serialization.dumps(s, indent=indent or 0, backend=backend)) for s in samples)
+                dump_ms, _ = _time_per_call(lambda s: serialization.dump(s, path, indent or 0, backend),
+                                            [(s,) for s in samples], args.repeat)
+                encoded = [serialization.dumps(s, indent=indent or 0, backend=backend) for s in samples]
+                load_ms, _ = _time_per_call(lambda b: serialization.loads(b, backend), [(b,) for b in encoded], args.repeat)
+                print(f"{backend:<10} {str(indent):>6} {size / len(samples):>14.0f} {dump_ms:>10.2f} {load_ms:>10.2f}")
+
+def legacy_draw_rects_and_pins(ax, rects_data, pins, edges):
+    """舊版逐物件繪製 (每個矩形、引腳與連線各建立一個 artist)，僅供 render 基準比較。"""
+    import matplotlib.patches as patches
+    rect_map = {r['id']: r for r in rects_data}
+    pin_map = {p['id']: p for p in pins}
+    for r in rects_data:
+        ax.add_patch(patches.Rectangle((r['x'] - r['w'] / 2, r['y'] - r['h'] / 2), r['w'], r['h'],
+                                       linewidth=1.5, edgecolor='#42A5F5', facecolor='#BBDEFB', zorder=2))
+        ax.text(r['x'], r['y'], str(r['id']), ha='center', va='center', fontsize=6, zorder=5)
+    for pin1_id, pin2_id in edges:
+        pin1, pin2 = pin_map.get(pin1_id), pin_map.get(pin2_id)
+        if not pin1 or not pin2: continue
+        rect1, rect2 = rect_map.get(pin1['parent_rect_id']), rect_map.get(pin2['parent_rect_id'])
+        if not rect1 or not rect2: continue
+        ax.plot([rect1['x'] + pin1['rel_pos'][0], rect2['x'] + pin2['rel_pos'][0]],
+                [rect1['y'] + pin1['rel_pos'][1], rect2['y'] + pin2['rel_pos'][1]], color='gray', alpha=0.5, linewidth=0.6, zorder=3)
+    for pin in pins:
+        parent_rect = rect_map.get(pin['parent_rect_id'])
+        if parent_rect:
+            ax.plot(parent_rect['x'] + pin['rel_pos'][0], parent_rect['y'] + pin['rel_pos'][1], 'k.', markersize=3, zorder=4)
+
+def bench_render(args):
+    """比較逐物件 matplotlib 繪製、collection 後端與 NumPy 光柵化後端產生一張 PNG 的耗時。"""
+    import io
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from fast_render import layout_arrays, draw_layout, rasterize_layout, encode_png
+
+    def render_matplotlib(layout_data, legacy):
+        fig, ax = plt.subplots(1, figsize=(10, 10))
+        ax.set_xlim(0, layout_data['canvas_width']); ax.set_ylim(layout_data['canvas_height'], 0)
+        if legacy:
+            legacy_draw_rects_and_pins(ax, layout_data['rectangles'], layout_data['pins'], layout_data['netlist_edges'])
+        else:
+            draw_layout(ax, layout_arrays(layout_data), label_fontsize=6)
+        fig.savefig(io.BytesIO(), format='png', dpi=100)
+        plt.close(fig)
+
+    print(f"{'dataset':<24} {'legacy ms':>12} {'collections ms':>15} {'raster ms':>10}")
+    for n in args.sizes:
+        layout_data = make_synthetic_layout(n, seed=n)['layout_data']
+        legacy_ms, _ = _time_per_call(render_matplotlib, [(layout_data, True)], args.repeat)
+        coll_ms, _ = _time_per_call(render_matplotlib, [(layout_data, False)], args.repeat)
+        raster_ms, _ = _time_per_call(lambda d: encode_png(rasterize_layout(layout_arrays(d), args.width)),
+                                      [(layout_data,)], args.repeat)
+        print(f"{f'synthetic {n} rects':<24} {legacy_ms:>12.1f} {coll_ms:>15.1f} {raster_ms:>10.1f}")
+
+class PhaseProfiler:
+    """掛在 LayoutGenerator 的事件上，統計生長迴圈與回退、Shake、In-fill、最終合法化各階段的累積耗時與次數。"""
+    PHASES = ('rollback', 'shake', 'infill', 'legalization')
+
+    def __init__(self):
+        self.seconds, self.counts = defaultdict(float), defaultdict(int)
+        self._iteration_start, self._phase_start, self._nested = None, {}, 0.0
+
+    def attach(self, generator):
+        generator.add_hook('iteration_start', self._on_iteration_start)
+        generator.add_hook('iteration_end', self._on_iteration_end)
+        generator.add_hook('growth_accepted', self._on_growth_accepted)
+        for phase in self.PHASES:
+            generator.add_hook(phase, functools.partial(self._on_phase, phase))
+        return generator
+
+    def _on_iteration_start(self, generator, rects, **_):
+        self._iteration_start, self._nested = time.perf_counter(), 0.0
+
+    def _on_iteration_end(self, generator, rects, **_):
+        self.seconds['growth'] += time.perf_counter() - self._iteration_start - self._nested
+        self.counts['growth'] += 1
+
+    def _on_growth_accepted(self, generator, rects, **_):
+        self.counts['accepted_growths'] += 1
+
+    def _on_phase(self, name, generator, rects, phase, **_):
+        if phase == 'before':
+            self._phase_start[name] = time.perf_counter()
+            return
+        elapsed = time.perf_counter() - self._phase_start.pop(name)
+        self.seconds[name] += elapsed
+        self.counts[name] += 1
+        if name != 'legalization':
+            self._nested += elapsed
+
+def bench_generate(args):
+    """以相同種子分別在無回呼與掛上 PhaseProfiler 的情況下執行生成迴圈，列出總耗時與各階段的耗時分佈。"""
+    import contextlib
+    import io
+    import numpy as np
+    import main as layout_main
+    from config_compiler import compile_config
+    from generator import LayoutGenerator
+
+    base_params = compile_config(layout_main.load_config(args.config)).sample_batch(1, seed=args.seed)[0]
+    if args.num_rects:
+        base_params['NUM_RECTANGLES'] = args.num_rects
+
+    def run(profiler):
+        params = dict(base_params)
+        random.seed(args.seed); np.random.seed(args.seed)
+        params['initial_rects'] = layout_main.place_initial_components(params)[0]
+        generator = LayoutGenerator(params)
+        if profiler:
+            profiler.attach(generator)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            layout = generator.generate()
+            return time.perf_counter() - start, layout
+
+    plain_s, plain_layout = min((run(None) for _ in range(args.repeat)), key=lambda r: r[0])
+    profiler = PhaseProfiler()
+    profiled_s, profiled_layout = run(profiler)
+    geometry = lambda layout: [(r.id, r.x, r.y, r.w, r.h) for r in layout.rectangles]
+    same = geometry(plain_layout) == geometry(profiled_layout)
+    print(f"{base_params['NUM_RECTANGLES']} rects | no hooks: {plain_s:.2f} s | with profiler: {profiled_s:.2f} s | identical layout: {same}")
+    print(f"{'phase':<16} {'seconds':>10} {'share':>8} {'count':>8}")
+    for name in ('growth',) + PhaseProfiler.PHASES:
+        print(f"{name:<16} {profiler.seconds[name]:>10.3f} {profiler.seconds[name] / profiled_s:>8.1%} {profiler.counts[name]:>8}")
+    print(f"accepted growth steps: {profiler.counts['accepted_growths']}")
+
+STARTUP_MODULES = ('main', 'format_for_ml', 'dataset_stats', 'merge_datasets', 'analyze_layout',
+                   'visualize_abstraction', 'demo_generator')
+HEAVY_MODULES = ('matplotlib', 'imageio', 'tqdm', 'yaml')
+
+def bench_startup(args):
+    """在全新的直譯器中匯入每個 CLI 模組，量測啟動耗時並列出被載入的重量級相依套件。"""
+    import subprocess
+    import sys
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    probe = ("import sys, time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t); "
+             "print(','.join(m for m in {heavy!r} if m in sys.modules))")
+
+    def run(code):
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, '-c', code], cwd=here, capture_output=True, text=True, check=True).stdout
+        return time.perf_counter() - start, out.split('\n')
+
+    baseline = min(run('pass')[0] for _ in range(args.repeat))
+    print(f"interpreter baseline: {baseline * 1000:.1f} ms")
+    print(f"{'module':<24} {'wall ms':>10} {'over base':>10} {'import ms':>10}  heavy modules loaded")
+    for module in args.modules:
+        runs = [run(probe.format(module=module, heavy=HEAVY_MODULES)) for _ in range(args.repeat)]
+        wall = min(r[0] for r in runs)
+        import_ms = min(float(r[1][0]) for r in runs) * 1000
+        print(f"{module:<24} {wall * 1000:>10.1f} {(wall - baseline) * 1000:>10.1f} {import_ms:>10.1f}  {runs[0][1][1] or '-'}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the layout generation pipeline.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    p_format = subparsers.add_parser('format', help="Benchmark format_for_ml.format_layout_data against the legacy version.")
+    p_format.add_argument("--input-dir", type=str, default=None, help="Directory of raw layout JSON files. Uses synthetic layouts if omitted.")
+    p_format.add_argument("--limit", type=int, default=50, help="Maximum number of files to load from --input-dir.")
+    p_format.add_argument("--sizes", type=int, nargs='+', default=[250, 2000, 10000], help="Synthetic layout sizes (rectangle counts).")
+    p_format.add_argument("--repeat", type=int, default=3, help="Repetitions; the fastest one is reported.")
+    p_format.set_defaults(func=bench_format)
+
+    p_ser = subparsers.add_parser('serialization', help="Compare bytes and ms per sample for each JSON backend.")
+    p_ser.add_argument("--input-dir", type=str, default=None, help="Directory of raw layout JSON files. Uses synthetic layouts if omitted.")
+    p_ser.add_argument("--limit", type=int, default=50, help="Maximum number of files to load from --input-dir.")
+    p_ser.add_argument("--sizes", type=int, nargs='+', default=[250, 2000], help="Synthetic layout sizes (rectangle counts).")
+    p_ser.add_argument("--repeat", type=int, default=3, help="Repetitions; the fastest one is reported.")
+    p_ser.set_defaults(func=bench_serialization)
+
+    p_render = subparsers.add_parser('render', help="Compare per-artist matplotlib drawing with the fast_render backends.")
+    p_render.add_argument("--sizes", type=int, nargs='+', default=[250, 2000], help="Synthetic layout sizes (rectangle counts).")
+    p_render.add_argument("--width", type=int, default=1000, help="Raster output width in pixels.")
+    p_render.add_argument("--repeat", type=int, default=1, help="Repetitions; the fastest one is reported.")
+    p_render.set_defaults(func=bench_render)
+
+    p_gen = subparsers.add_parser('generate', help="Profile the LayoutGenerator loop phase by phase through its event hooks.")
+    p_gen.add_argument("--config", type=str, default='config.yaml', help="Config file used to draw the generation parameters.")
+    p_gen.add_argument("--seed", type=int, default=0, help="Seed for both the parameters and the generation run.")
+    p_gen.add_argument("--num-rects", type=int, default=None, help="Override NUM_RECTANGLES.")
+    p_gen.add_argument("--repeat", type=int, default=1, help="Repetitions of the hook-free run; the fastest one is reported.")
+    p_gen.set_defaults(func=bench_generate)
+
+    p_startup = subparsers.add_parser('startup', help="Measure fresh-interpreter import time of each CLI module.")
+    p_startup.add_argument("--modules", nargs='+', default=list(STARTUP_MODULES), help="Modules to import.")
+    p_startup.add_argument("--repeat", type=int, default=5, help="Repetitions; the fastest one is reported.")
+    p_startup.set_defaults(func=bench_startup)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
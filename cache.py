@@ -0,0 +1,155 @@
+# cache.py
+
+import hashlib
+import os
+import functools
+import serialization
+
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 會影響生成結果的原始碼；任何一個檔案變動都會使舊的快取失效
+GENERATION_SOURCES = ('main.py', 'generator.py', 'layout.py', 'symmetry.py', 'alignment.py', 'grouper.py', 'occupancy.py',
+                      'config_compiler.py', 'tiled_generator.py', 'parallel_netlist.py', 'metrics.py',
+                      'acceptance.py', 'compaction.py')
+FORMAT_SOURCES = ('format_for_ml.py', 'id_index.py')
+
+# 只影響輸出位置或執行方式、不影響佈局內容的設定區塊，不納入快取鍵
+NON_GENERATION_KEYS = ('path_settings', 'run_settings', 'serialization_settings', 'ml_format_settings',
+                       'cache_settings', 'checkpoint_settings', 'demo_settings', 'sweep_settings', 'augmentation_settings',
+                       'sweep_point', 'initial_rects')
+
+@functools.lru_cache(maxsize=None)
+def code_version(sources=GENERATION_SOURCES):
+    """計算指定原始碼檔案內容的雜湊，作為快取鍵中的程式版本。"""
+    digest = hashlib.sha256()
+    for name in sources:
+        path = os.path.join(MODULE_DIR, name)
+        digest.update(name.encode('utf-8'))
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+def make_key(namespace, payload, sources=GENERATION_SOURCES):
+    """以 (命名空間, 程式版本, 內容) 的正規化 JSON 計算 SHA-256 快取鍵。"""
+    digest = hashlib.sha256()
+    digest.update(namespace.encode('utf-8'))
+    digest.update(code_version(sources).encode('utf-8'))
+    digest.update(serialization.canonical_dumps(payload))
+    return digest.hexdigest()
+
+def layout_cache_key(params):
+    """由解析後的 generation_params (包含 SEED) 計算原始佈局的快取鍵。"""
+    return make_key('layout', {k: v for k, v in params.items() if k not in NON_GENERATION_KEYS})
+
+def patch_cached_layout(data, params):
+    """
+    快取鍵不含 NON_GENERATION_KEYS，但寫入快取的 bytes 內嵌了生成當時的 generation_params。
+    命中時把這些區塊換成目前的值 (輸出位置、執行方式、掃描座標等)，其餘 (包含重試後的 SEED 與 acceptance_retry)
+    沿用快取內容，並依目前的序列化設定重新輸出；鍵的順序與直接生成時相同。
+    """
+    full_data = serialization.loads(data)
+    stored = full_data['generation_params']
+    patched = {k: v if k in NON_GENERATION_KEYS else stored.get(k, v) for k, v in params.items() if k != 'initial_rects'}
+    patched.update({k: v for k, v in stored.items() if k not in patched and k not in NON_GENERATION_KEYS})
+    full_data['generation_params'] = patched
+    return serialization.dumps(full_data)
+
+class ResultCache:
+    """
+    以內容雜湊為鍵的磁碟快取，每個項目為一個檔案。
+    讀取命中時會更新檔案的修改時間，超過 max_entries 或 max_bytes 時依修改時間淘汰最久未使用的項目 (LRU)。
+    寫入使用暫存檔 + os.replace，可同時被多個行程使用。
+    """
+    def __init__(self, directory, max_entries=None, max_bytes=None):
+        self.directory = directory
+        self.max_entries, self.max_bytes = max_entries, max_bytes
+        self.hits = self.misses = self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        # 目前的項目數與總大小在第一次需要判斷淘汰時才掃描目錄取得 (只讀取或未設上限時不掃描)
+        self._num_entries = self._total_bytes = None
+
+    @classmethod
+    def from_settings(cls, settings):
+        """由 config.yaml 的 cache_settings 建立快取；未啟用時回傳 None。"""
+        if not settings or not settings.get('enable', False):
+            return None
+        max_size_mb = settings.get('max_size_mb')
+        return cls(settings.get('directory', '.layout_cache'), settings.get('max_entries'),
+                   int(max_size_mb * 1024 * 1024) if max_size_mb else None)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.bin')
+
+    def _scan(self):
+        entries = []
+        for sub in os.scandir(self.directory):
+            if not sub.is_dir(): continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith('.bin'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def put(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        try:
+            old_size = os.path.getsize(path)
+        except FileNotFoundError:
+            old_size = None
+        os.replace(tmp_path, path)
+        if self.max_entries is None and self.max_bytes is None:
+            return
+        if self._num_entries is None:
+            self._rescan()
+        else:
+            self._num_entries += old_size is None
+            self._total_bytes += len(data) - (old_size or 0)
+        self._evict_if_needed()
+
+    def _rescan(self):
+        entries = sorted(self._scan())
+        self._num_entries = len(entries)
+        self._total_bytes = sum(size for _, size, _ in entries)
+        return entries
+
+    def _evict_if_needed(self):
+        over_entries = self.max_entries is not None and self._num_entries > self.max_entries
+        over_bytes = self.max_bytes is not None and self._total_bytes > self.max_bytes
+        if not (over_entries or over_bytes):
+            return
+        # 重新掃描以取得包含其他行程寫入的實際狀態，再由最舊的項目開始淘汰
+        entries = self._rescan()
+        for _, size, path in entries:
+            if (self.max_entries is None or self._num_entries <= self.max_entries) and \
+               (self.max_bytes is None or self._total_bytes <= self.max_bytes):
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._num_entries -= 1
+            self._total_bytes -= size
+            self.evictions += 1
+
+    def summary(self):
+        return f"快取命中 {self.hits} 次，未命中 {self.misses} 次，淘汰 {self.evictions} 個項目"
@@ -0,0 +1,150 @@
+# compaction.py
+
+import copy
+import numpy as np
+from metrics import overlapping_pairs
+
+EPS = 1e-9
+MIN_SIZE = 1.0
+# 每個方向最多以多少個不同的搜尋距離重建約束圖 (距離只會變大，通常 1~2 次就穩定)
+MAX_REACH_ROUNDS = 8
+
+def _longest_path(order, pred, succ, size, low, high, start):
+    """
+    在依 order 排序 (即拓撲順序) 的約束圖上求位置：先由前往後、由後往前做兩次最長路徑得到每個元件的可行區間
+    [L, R]，再依拓撲順序讓每個元件盡量留在原位 start，同時不小於前驅的右緣、不超過 R。
+    """
+    n = len(order)
+    preds, succs = [[] for _ in range(n)], [[] for _ in range(n)]
+    for a, b in zip(pred.tolist(), succ.tolist()):
+        preds[b].append(a)
+        succs[a].append(b)
+    order = order.tolist()
+    size, low, high, start = size.tolist(), low.tolist(), high.tolist(), start.tolist()
+
+    right = list(high)
+    for v in reversed(order):
+        for b in succs[v]:
+            right[v] = min(right[v], right[b] - size[v])
+    pos = list(start)
+    for v in order:
+        lower = max([low[v]] + [pos[a] + size[a] for a in preds[v]])
+        pos[v] = max(min(max(start[v], lower), right[v]), low[v]) if low[v] < high[v] else start[v]
+    return np.array(pos)
+
+def compact_axis(boxes, fixed, extent, axis, forced=False, eps=EPS):
+    """
+    沿 axis (0: 水平, 1: 垂直) 做一次約束圖壓縮，原地改寫 boxes (n, 4) 的 (cx, cy, w, h) 中該方向的中心座標。
+    約束邊連接垂直方向區間重疊的元件對：已沿此方向分開 (間距小於搜尋距離) 的元件對保持順序，目前重疊的元件對
+    在此方向的重疊量較小 (或 forced) 時指派到此方向分開。邊的方向依中心座標，排序後的順序就是拓撲順序。
+    搜尋距離至少為實際最大位移的兩倍，因此未列入約束圖的元件對不會因這次移動而產生新的重疊。回傳最大位移。
+    """
+    center, size = boxes[:, axis], boxes[:, 2 + axis]
+    start = center - size / 2
+    low = np.where(fixed, start, 0.0)
+    high = np.where(fixed, start, np.maximum(extent - size, 0.0))
+    order = np.argsort(center, kind='stable')
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    # 初始搜尋距離取目前最深的重疊量
+    i, j = overlapping_pairs(boxes, eps=eps)
+    depth = np.minimum((boxes[i, 2] + boxes[j, 2]) / 2 - np.abs(boxes[i, 0] - boxes[j, 0]),
+                       (boxes[i, 3] + boxes[j, 3]) / 2 - np.abs(boxes[i, 1] - boxes[j, 1]))
+    reach, moved, pos = float(depth.max(initial=0.0)) + eps, 0.0, start
+
+    for _ in range(MAX_REACH_ROUNDS):
+        expanded = boxes.copy()
+        expanded[:, 2 + axis] += reach
+        i, j = overlapping_pairs(expanded, eps=eps)
+        # 兩個方向的重疊量 (負值代表間距)
+        gap = np.abs(center[i] - center[j]) - (size[i] + size[j]) / 2
+        other_gap = np.abs(boxes[i, 1 - axis] - boxes[j, 1 - axis]) - (boxes[i, 3 - axis] + boxes[j, 3 - axis]) / 2
+        overlapping = gap < -eps
+        keep = ~overlapping | forced | (-gap <= -other_gap)
+        keep &= ~(fixed[i] & fixed[j])
+        i, j = i[keep], j[keep]
+        swap = rank[i] > rank[j]
+        pred, succ = np.where(swap, j, i), np.where(swap, i, j)
+        pos = _longest_path(order, pred, succ, size, low, high, start)
+        moved = float(np.abs(pos - start).max(initial=0.0))
+        if 2 * moved <= reach:
+            break
+        reach = 2 * moved + eps
+    boxes[:, axis] = pos + size / 2
+    return moved
+
+def _shrink_option(boxes, fixed, v, other, axis):
+    """縮小元件 v 使其沿 axis 與 other 分開：回傳 (損失的面積, 新的中心, 新的尺寸)；無法保持最小尺寸時回傳 None。"""
+    if fixed[v]:
+        return None
+    c, s = boxes[v, axis], boxes[v, 2 + axis]
+    lo, hi = c - s / 2, c + s / 2
+    o_lo, o_hi = boxes[other, axis] - boxes[other, 2 + axis] / 2, boxes[other, axis] + boxes[other, 2 + axis] / 2
+    # 保留 other 左 (下) 側或右 (上) 側的部分，取較大者
+    lo, hi = max(((lo, min(hi, o_lo)), (max(lo, o_hi), hi)), key=lambda span: span[1] - span[0])
+    if hi - lo < MIN_SIZE:
+        return None
+    return (s - (hi - lo)) * boxes[v, 3 - axis], (lo + hi) / 2, hi - lo
+
+def shrink_overlaps(boxes, fixed, eps=EPS, max_area_loss=None, max_removed=None):
+    """
+    最後手段：壓縮後仍重疊的元件對 (約束鏈長於畫布時) 以縮小其中一個可移動元件消除，選擇損失面積最小的方向；
+    縮小只會讓元件佔據的區域變小，不會產生新的重疊。縮到最小尺寸仍無法分開時 (例如完全被包住) 移除該可移動元件。
+    損失的面積 (佔可移動元件總面積的比例) 超過 max_area_loss 或移除數超過 max_removed 時立即停止 (None 代表不限制)。
+    回傳 (保留的遮罩, 縮小的次數, 損失面積比例, 是否超過上限)；未超過上限時只有兩個 fixed 元件互相重疊才可能仍有重疊。
+    """
+    keep, shrunk, lost = np.ones(len(boxes), dtype=bool), 0, 0.0
+    movable_area = float((boxes[~fixed, 2] * boxes[~fixed, 3]).sum()) or 1.0
+    for a, b in zip(*(p.tolist() for p in overlapping_pairs(boxes, eps=eps))):
+        dx = (boxes[a, 2] + boxes[b, 2]) / 2 - abs(boxes[a, 0] - boxes[b, 0])
+        dy = (boxes[a, 3] + boxes[b, 3]) / 2 - abs(boxes[a, 1] - boxes[b, 1])
+        if not (keep[a] and keep[b]) or dx <= eps or dy <= eps:
+            continue  # 先前的縮小或移除已經消除了這個重疊
+        options = [(option, v, axis) for v, other in ((a, b), (b, a)) for axis in (0, 1)
+                   for option in [_shrink_option(boxes, fixed, v, other, axis)] if option]
+        if options:
+            (loss, center, size), v, axis = min(options, key=lambda item: item[0][0])
+            boxes[v, axis], boxes[v, 2 + axis] = center, size
+            shrunk += 1
+        elif not (fixed[a] and fixed[b]):
+            movable = [v for v in (a, b) if not fixed[v]]
+            v = min(movable, key=lambda v: boxes[v, 2] * boxes[v, 3])
+            keep[v], loss = False, boxes[v, 2] * boxes[v, 3]
+        else:
+            continue
+        lost += float(loss) / movable_area
+        if (max_area_loss is not None and lost > max_area_loss) or \
+           (max_removed is not None and int((~keep).sum()) > max_removed):
+            return keep, shrunk, lost, True
+    return keep, shrunk, lost, False
+
+def legalize_boxes(boxes, fixed, canvas, passes=4, eps=EPS, max_area_loss=None, max_removed=None):
+    """
+    交替做水平 / 垂直壓縮 (最多 passes 次)，每次都是 O((n + 約束邊數) log n)。前兩次只把重疊的元件對指派到重疊量
+    較小的方向，之後的每次把所有剩餘重疊都指派到當次的方向。完全重疊消除後提前結束；仍有剩餘時以 shrink_overlaps 收尾。
+    原地改寫 boxes，回傳 (保留的遮罩, {"passes", "max_shift", "shrunk", "removed", "area_lost", "exceeded"})；
+    exceeded 為 True 代表收尾超過 max_area_loss / max_removed 而中止，此時 boxes 仍可能重疊，呼叫端應改用其他方式。
+    """
+    stats = {"passes": 0, "max_shift": 0.0, "shrunk": 0, "removed": 0, "area_lost": 0.0, "exceeded": False}
+    for k in range(passes):
+        if not len(overlapping_pairs(boxes, eps=eps)[0]):
+            break
+        moved = compact_axis(boxes, fixed, canvas[k % 2], k % 2, forced=k >= 2, eps=eps)
+        stats["passes"], stats["max_shift"] = k + 1, max(stats["max_shift"], moved)
+    keep, stats["shrunk"], stats["area_lost"], stats["exceeded"] = shrink_overlaps(boxes, fixed, eps, max_area_loss, max_removed)
+    stats["removed"] = int((~keep).sum())
+    return keep, stats
+
+def compact_rects(rects, canvas_width, canvas_height, passes=4, max_area_loss=None, max_removed=None):
+    """
+    以約束圖壓縮合法化 Rectangle 串列，回傳 (深複製後的新串列, 統計)；與 Shake 相同，不修改傳入的元件。
+    fixed 元件 (對稱 / 對齊群組) 不會移動、縮小或移除。統計的 exceeded 為 True 時結果不可用 (見 legalize_boxes)。
+    """
+    rects = copy.deepcopy(rects)
+    boxes = np.array([(r.x, r.y, r.w, r.h) for r in rects], dtype=float).reshape(-1, 4)
+    fixed = np.array([r.fixed for r in rects], dtype=bool)
+    keep, stats = legalize_boxes(boxes, fixed, (canvas_width, canvas_height), passes,
+                                 max_area_loss=max_area_loss, max_removed=max_removed)
+    for r, (x, y, w, h) in zip(rects, boxes.tolist()):
+        r.x, r.y, r.w, r.h = x, y, w, h
+    return [r for r, kept in zip(rects, keep.tolist()) if kept], stats
@@ -0,0 +1,202 @@
+# config_compiler.py
+
+import random
+import zlib
+import numpy as np
+
+# 生成流程一定會用到的參數，必須出現在 base_params 或 randomize_params 中
+REQUIRED_PARAMS = (
+    'CANVAS_WIDTH', 'CANVAS_HEIGHT', 'MAX_ITERATIONS', 'GROWTH_STEP', 'STAGNATION_LIMIT', 'SHAKE_TRIGGER_THRESHOLD',
+    'ROLLBACK_STEPS', 'SHAKE_ITERATIONS', 'SHAKE_STRENGTH', 'INFILL_TRIGGER_AFTER_N_SHAKES', 'INFILL_COMPONENT_COUNT',
+    'INFILL_GRID_DENSITY', 'INFILL_MAX_TRIGGERS', 'NUM_RECTANGLES', 'TARGET_DENSITY', 'MAX_ASPECT_RATIO',
+    'PIN_DENSITY_K', 'RENT_EXPONENT_P', 'EDGE_P_MAX', 'EDGE_DECAY_RATE', 'MAX_WIRELENGTH_LIMIT', 'EDGE_K_NEAREST_NEIGHBORS',
+)
+# 每個樣本只抽一次的巢狀規則 (在編譯階段就批次抽好)；其餘巢狀規則 (例如 components_per_set、items_per_group)
+# 在放置每個集合/群組時才抽取，只在編譯時驗證
+PER_SAMPLE_RULES = {
+    'alignment_settings': ('num_sets',),
+    'analog_symmetry_settings': ('num_groups',),
+    'grouping_settings': ('num_groups_to_create',),
+}
+# randomize_params 中會改寫 component_types 的衍生參數
+COMPONENT_OVERRIDES = {
+    'MACRO_GROWTH_PROB_RANGE': ('macro', 'growth_prob_range'),
+    'STD_CELL_GROWTH_PROB_RANGE': ('std_cell', 'growth_prob_range'),
+}
+COMPONENT_KEYS = ('MACRO_RATIO', *COMPONENT_OVERRIDES)
+# base_params.LEGALIZER 可用的最終合法化方式
+LEGALIZERS = ('shake', 'compaction')
+
+class ConfigError(ValueError):
+    """設定檔內容不合法；訊息中會一次列出所有問題。"""
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _check_randint(rule):
+    if not (isinstance(rule.get('low'), int) and isinstance(rule.get('high'), int)):
+        return "randint 的 low / high 必須是整數"
+    return None if rule['low'] <= rule['high'] else "randint 需要 low <= high"
+
+def _check_uniform(rule):
+    if not (_is_number(rule.get('low')) and _is_number(rule.get('high'))):
+        return "uniform 的 low / high 必須是數值"
+    return None if rule['low'] <= rule['high'] else "uniform 需要 low <= high"
+
+def _check_uniform_pair(rule):
+    low, high = rule.get('low'), rule.get('high')
+    if not all(isinstance(v, (list, tuple)) and len(v) == 2 and all(map(_is_number, v)) for v in (low, high)):
+        return "uniform_pair 的 low / high 必須是兩個數值組成的串列"
+    if not (low[0] <= low[1] <= high[0] <= high[1]):
+        return "uniform_pair 需要 low[0] <= low[1] <= high[0] <= high[1] (下界一定不大於上界)"
+    return None
+
+def _sample_randint(rule, rng, n):
+    return rng.integers(rule['low'], rule['high'], size=n, endpoint=True)
+
+def _sample_uniform(rule, rng, n):
+    return rng.uniform(rule['low'], rule['high'], size=n)
+
+def _sample_uniform_pair(rule, rng, n):
+    """下界取自 [low[0], low[1]]、上界取自 [high[0], high[1]]，回傳 (n, 2) 的 [下界, 上界] 範圍。"""
+    return rng.uniform((rule['low'][0], rule['high'][0]), (rule['low'][1], rule['high'][1]), size=(n, 2))
+
+# 規則類型 -> (驗證函式, 向量化抽樣函式)
+RULE_TYPES = {
+    'randint': (_check_randint, _sample_randint),
+    'uniform': (_check_uniform, _sample_uniform),
+    'uniform_pair': (_check_uniform_pair, _sample_uniform_pair),
+}
+
+def is_rule(value):
+    return isinstance(value, dict) and 'type' in value
+
+def draw_int(value):
+    """放置階段使用：value 可以是已解析的整數，或尚未抽取的 randint 規則 (以 random 模組抽取)。"""
+    if is_rule(value):
+        return random.randint(value['low'], value['high'])
+    return int(value)
+
+def _rule_rng(seed, name):
+    """每條規則使用以 (seed, 規則名稱) 衍生的獨立亂數流，因此第 i 個樣本的值與批次大小及規則順序無關。"""
+    return np.random.default_rng(np.random.SeedSequence([seed, zlib.crc32(name.encode('utf-8'))]))
+
+class CompiledConfig:
+    """
+    驗證一次 config.yaml，並把 randomize_params 與各設定區塊中的巢狀規則編譯成向量化抽樣器。
+    sample_columns(n) 一次抽出 n 個樣本的所有參數 (每個參數一個 NumPy 陣列)，
+    sample_batch(n) 則進一步組成 n 份可直接交給生成流程的參數字典。
+    """
+    def __init__(self, config):
+        self.config = config
+        errors = []
+        if not isinstance(config.get('base_params'), dict):
+            raise ConfigError("設定檔缺少 base_params 區塊")
+        self.base_params = config['base_params']
+        self.sections = {key: value for key, value in config.items() if isinstance(value, dict) and key != 'base_params'}
+
+        # 頂層規則: randomize_params；巢狀規則: 各區塊中帶有 type 欄位的字典
+        self.rules = {}
+        for key, rule in config.get('randomize_params', {}).items():
+            self._compile_rule(key, rule, errors)
+        for section, values in self.sections.items():
+            for key, rule in values.items():
+                if not is_rule(rule) or section == 'randomize_params':
+                    continue
+                if key in PER_SAMPLE_RULES.get(section, ()):
+                    self._compile_rule(f"{section}.{key}", rule, errors)
+                else:
+                    self._check_rule(f"{section}.{key}", rule, errors)
+
+        missing = [key for key in REQUIRED_PARAMS if key not in self.base_params and key not in config.get('randomize_params', {})]
+        if missing:
+            errors.append(f"缺少必要參數: {', '.join(missing)}")
+        if self.base_params.get('LEGALIZER', 'shake') not in LEGALIZERS:
+            errors.append(f"LEGALIZER: 不支援的合法化方式 '{self.base_params['LEGALIZER']}'，可用的方式: {LEGALIZERS}")
+        self._validate_component_types(errors)
+        if errors:
+            raise ConfigError("設定檔驗證失敗:\n  - " + "\n  - ".join(errors))
+
+    def _check_rule(self, name, rule, errors):
+        if not is_rule(rule):
+            errors.append(f"{name}: 規則必須是含有 type 欄位的字典")
+            return False
+        if rule['type'] not in RULE_TYPES:
+            errors.append(f"{name}: 不支援的規則類型 '{rule['type']}'，可用的類型: {tuple(RULE_TYPES)}")
+            return False
+        problem = RULE_TYPES[rule['type']][0](rule)
+        if problem:
+            errors.append(f"{name}: {problem}")
+        return problem is None
+
+    def _compile_rule(self, name, rule, errors):
+        if self._check_rule(name, rule, errors):
+            self.rules[name] = rule
+
+    def _validate_component_types(self, errors):
+        component_types = self.sections.get('component_types', {})
+        for type_name, definition in component_types.items():
+            for key in ('width_range', 'height_range', 'growth_prob_range'):
+                value = definition.get(key)
+                if not (isinstance(value, (list, tuple)) and len(value) == 2 and all(map(_is_number, value)) and value[0] <= value[1]):
+                    errors.append(f"component_types.{type_name}.{key}: 必須是 [下界, 上界] 且下界不大於上界")
+            if not 0 <= definition.get('proportion', 0) <= 1:
+                errors.append(f"component_types.{type_name}.proportion: 必須介於 0 與 1 之間")
+        if sum(definition.get('proportion', 0) for definition in component_types.values()) > 1 + 1e-9:
+            errors.append("component_types 的 proportion 總和不可超過 1")
+
+        overrides = [key for key in COMPONENT_KEYS if key in self.rules or key in self.base_params]
+        if overrides and not {'macro', 'std_cell'} <= set(component_types):
+            errors.append(f"{', '.join(overrides)} 需要 component_types 中同時定義 macro 與 std_cell")
+        ratio = self.rules.get('MACRO_RATIO')
+        if ratio and ratio['type'] == 'uniform' and not 0 <= ratio['low'] <= ratio['high'] <= 1:
+            errors.append("MACRO_RATIO: 必須介於 0 與 1 之間")
+
+    def sample_columns(self, n, seed=None):
+        """向量化抽出 n 個樣本的所有規則與每個樣本的 SEED；seed 相同時第 i 個樣本的值固定 (與 n 無關)。"""
+        seed = int(np.random.SeedSequence().entropy if seed is None else seed)
+        columns = {name: RULE_TYPES[rule['type']][1](rule, _rule_rng(seed, name), n) for name, rule in self.rules.items()}
+        columns['SEED'] = _rule_rng(seed, 'SEED').integers(0, 2**32 - 1, size=n, endpoint=True)
+        return columns
+
+    def has_param(self, name):
+        """name 是否為可覆寫的參數：頂層參數 (base_params / randomize_params) 或 '區塊.鍵' 形式的巢狀設定。"""
+        if '.' in name:
+            section, key = name.split('.', 1)
+            return key in self.sections.get(section, {})
+        return name in self.base_params or name in self.config.get('randomize_params', {})
+
+    def build_params(self, columns, index, overrides=None):
+        """
+        由抽樣結果組出第 index 個樣本的參數字典 (base_params + 各設定區塊的副本 + 抽出的值)。
+        overrides 會在抽樣值之後套用 (例如參數掃描的座標)，鍵的格式與 has_param 相同。
+        """
+        params = dict(self.base_params)
+        for key, value in self.sections.items():
+            params.setdefault(key, value.copy())
+        values = [(name, column[index].tolist()) for name, column in columns.items()]
+        for name, value in values + list((overrides or {}).items()):
+            if '.' in name:
+                section, key = name.split('.', 1)
+                params[section][key] = value
+            else:
+                params[name] = value
+
+        if not any(key in params for key in COMPONENT_KEYS):
+            return params
+        # 只複製會被改寫的元件類型定義，其餘內容與設定檔共用
+        component_types = params['component_types'] = {name: dict(definition) for name, definition in params['component_types'].items()}
+        if 'MACRO_RATIO' in params:
+            component_types['macro']['proportion'] = params['MACRO_RATIO']
+            component_types['std_cell']['proportion'] = 1 - params['MACRO_RATIO']
+        for name, (type_name, key) in COMPONENT_OVERRIDES.items():
+            if name in params:
+                component_types[type_name][key] = list(params[name])
+        return params
+
+    def sample_batch(self, n, seed=None):
+        columns = self.sample_columns(n, seed)
+        return [self.build_params(columns, i) for i in range(n)]
+
+def compile_config(config):
+    return CompiledConfig(config)
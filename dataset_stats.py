@@ -0,0 +1,206 @@
+# dataset_stats.py
+
+import os
+import argparse
+import contextlib
+import multiprocessing
+import time
+import numpy as np
+import serialization
+from merge_datasets import list_layout_files
+from metrics import geometry_metrics, raw_geometry
+
+SCALAR_METRICS = ('num_rects', 'num_pins', 'num_edges', 'density', 'overlap_count',
+                  'wl_total', 'wl_mean', 'wl_p50', 'wl_p90', 'wl_p99',
+                  'hpwl_total', 'hpwl_mean', 'degree_mean', 'degree_max')
+
+# 固定分箱的直方圖，各工作行程只需回傳計數即可合併；線長以畫布對角線長度正規化
+MAX_DEGREE_BIN = 64
+HISTOGRAM_BINS = {
+    'wirelength': np.linspace(0.0, 1.0, 41),
+    'degree': np.arange(0, MAX_DEGREE_BIN + 2) - 0.5,
+    'density': np.linspace(0.0, 1.0, 21),
+}
+
+def _ml_geometry(data):
+    """
+    由 ML-ready 資料還原絕對座標：畫布大小由節點絕對尺寸 / 正規化尺寸推回，
+    引腳取自 basic_component_edge 的端點 (只包含有連線的引腳，相同座標視為同一引腳)，度數以節點計算。
+    """
+    node = np.array(data['node'], dtype=float).reshape(-1, 2)
+    target = np.array(data['target'], dtype=float).reshape(-1, 2)
+    subs = data['sub_components']
+    node_of = np.repeat(np.arange(len(subs)), [len(s) for s in subs])
+    offsets = np.array([c['offset'] for s in subs for c in s], dtype=float).reshape(-1, 2)
+    dims = np.array([c['dims'] for s in subs for c in s], dtype=float).reshape(-1, 2)
+    if len(node) == 0:
+        return {"canvas": (1.0, 1.0), "boxes": np.zeros((0, 4)), "pin_pos": np.zeros((0, 2)),
+                "pin_rect": np.zeros(0, dtype=np.int64), "src": np.zeros(0, dtype=np.int64), "dst": np.zeros(0, dtype=np.int64)}
+
+    starts = np.searchsorted(node_of, np.arange(len(subs)))
+    extent = np.maximum.reduceat(offsets + dims / 2, starts) - np.minimum.reduceat(offsets - dims / 2, starts)
+    k = np.argmax(node, axis=0)
+    canvas = (extent[k[0], 0] / node[k[0], 0], extent[k[1], 1] / node[k[1], 1])
+    scale = np.array(canvas)
+    centers = (target + 1) / 2 * scale
+    boxes = np.concatenate([centers[node_of] + offsets, dims], axis=1)
+
+    edge_list = data['edges']['basic_component_edge']
+    pairs = np.array([e[0] for e in edge_list], dtype=np.int64).reshape(-1, 2)
+    feats = np.array([e[1] for e in edge_list], dtype=float).reshape(-1, 4)
+    endpoints = np.concatenate([centers[pairs[:, 0]] + feats[:, :2] * scale, centers[pairs[:, 1]] + feats[:, 2:] * scale])
+    endpoint_node = np.concatenate([pairs[:, 0], pairs[:, 1]])
+    keys = np.round(np.concatenate([endpoints, endpoint_node[:, None]], axis=1), 6)
+    unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    return {"canvas": canvas, "boxes": boxes, "pin_pos": unique_keys[:, :2],
+            "pin_rect": unique_keys[:, 2].astype(np.int64), "src": inverse[:len(pairs)], "dst": inverse[len(pairs):]}
+
+def compute_sample_metrics(data, workers=1):
+    """
+    計算單一樣本 (原始或 ML-ready 格式) 的指標，回傳 (純量指標 dict, 直方圖計數 dict)。
+    netlist_edges 中每條連線都是一個兩引腳 net，其 HPWL 即為兩引腳的曼哈頓距離。
+    workers > 1 時重疊檢查以共享記憶體的行程池處理 (適用於單一的大型佈局)。
+    """
+    geometry = _ml_geometry(data) if 'node' in data else raw_geometry(data['layout_data'])
+    canvas_w, canvas_h = geometry['canvas']
+    metrics, per_item = geometry_metrics(geometry, workers=workers)
+    wirelengths, degree, density = per_item['wirelength'], per_item['degree'], metrics['density']
+    histograms = {
+        "wirelength": np.histogram(np.clip(wirelengths / np.hypot(canvas_w, canvas_h), 0.0, 1.0), HISTOGRAM_BINS['wirelength'])[0],
+        "degree": np.bincount(np.minimum(degree, MAX_DEGREE_BIN), minlength=MAX_DEGREE_BIN + 1),
+        "density": np.histogram([min(density, 1.0)], HISTOGRAM_BINS['density'])[0],
+    }
+    return metrics, histograms
+
+def _iter_samples(path):
+    """逐一產生檔案中的 (樣本名稱, 資料)；支援單一 JSON 與 format_for_ml --aggregate 的 JSON Lines。"""
+    if path.endswith('.jsonl'):
+        for record in serialization.iter_json_lines(path):
+            yield record.get('source', os.path.basename(path)), record.get('data', record)
+    else:
+        yield os.path.basename(path), serialization.load(path)
+
+def analyze_file_batch(paths, intra_workers=1):
+    """子行程工作：分析一批檔案，回傳 (每個樣本的指標列, 合併後的直方圖計數, 錯誤列表)。"""
+    rows, errors = [], []
+    histograms = {name: np.zeros(len(bins) - 1, dtype=np.int64) for name, bins in HISTOGRAM_BINS.items()}
+    for path in paths:
+        try:
+            for sample, data in _iter_samples(path):
+                metrics, sample_hist = compute_sample_metrics(data, intra_workers)
+                metrics['sample'] = sample
+                rows.append(metrics)
+                for name, counts in sample_hist.items():
+                    histograms[name] += counts
+        except Exception as e:
+            errors.append((os.path.basename(path), f"{type(e).__name__}: {e}"))
+    return rows, histograms, errors
+
+def list_sample_files(directory):
+    """
+    列出資料夾中所有原始、ML-ready 或彙整後的樣本檔案 (含虛擬合併清單所指向的檔案)。
+    各工具寫出的清單檔 (merge / sweep / augment 的 *_manifest.jsonl) 不是樣本，會被略過。
+    """
+    paths = {path for _, path in list_layout_files(directory)}
+    paths.update(os.path.join(directory, f) for f in os.listdir(directory)
+                 if (f.endswith('.json') or f.endswith('.jsonl')) and not f.endswith('_manifest.jsonl'))
+    return sorted(paths)
+
+def summarize(columns):
+    """由每個指標的樣本值計算摘要統計 (數量、平均、標準差、最小、P5、P50、P95、最大)。"""
+    summary = {}
+    for name in SCALAR_METRICS:
+        values = np.asarray(columns[name], dtype=float)
+        if values.size == 0:
+            continue
+        p5, p50, p95 = np.percentile(values, [5, 50, 95])
+        summary[name] = {"count": int(values.size), "mean": float(values.mean()), "std": float(values.std()),
+                         "min": float(values.min()), "p5": float(p5), "p50": float(p50), "p95": float(p95),
+                         "max": float(values.max())}
+    return summary
+
+def print_summary(summary, histograms):
+    print(f"\n{'指標':<16}{'樣本數':>8}{'平均':>12}{'標準差':>12}{'最小':>12}{'P5':>12}{'P50':>12}{'P95':>12}{'最大':>12}")
+    for name, s in summary.items():
+        print(f"{name:<16}{s['count']:>8d}" + "".join(f"{s[k]:>12.4g}" for k in ('mean', 'std', 'min', 'p5', 'p50', 'p95', 'max')))
+
+    total_degree = max(1, int(histograms['degree'].sum()))
+    print("\n元件度數分佈 (最後一格為 >= {}):".format(MAX_DEGREE_BIN))
+    nonzero = np.flatnonzero(histograms['degree'])
+    print("  " + ", ".join(f"{d}: {histograms['degree'][d] / total_degree:.1%}" for d in nonzero[:20]))
+    total_wl = max(1, int(histograms['wirelength'].sum()))
+    edges = HISTOGRAM_BINS['wirelength']
+    print("線長 / 畫布對角線分佈:")
+    for i in np.flatnonzero(histograms['wirelength'])[:20]:
+        share = histograms['wirelength'][i] / total_wl
+        print(f"  [{edges[i]:.3f}, {edges[i + 1]:.3f}) {share:6.1%} {'#' * int(round(share * 50))}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless dataset-level statistics for raw or ML-ready layout files.")
+    parser.add_argument("input_dir", nargs='?', default=None,
+                        help="Dataset directory. Defaults to path_settings.raw_output_directory.")
+    parser.add_argument("--config", type=str, default='config.yaml', help="Path to the YAML config file.")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(), help="Number of worker processes.")
+    parser.add_argument("--chunksize", type=int, default=0, help="Files per worker task. 0 picks a size automatically.")
+    parser.add_argument("--intra-workers", type=int, default=1,
+                        help="Parallelize inside each sample over shared memory instead of across files (for a few huge layouts).")
+    parser.add_argument("--output", type=str, default=None, help="Write the summary and histograms to this JSON file.")
+    parser.add_argument("--per-sample", type=str, default=None, help="Stream per-sample metrics to this JSON Lines file.")
+    args = parser.parse_args()
+
+    input_dir = args.input_dir
+    if input_dir is None:
+        import yaml
+        with open(args.config, 'r', encoding='utf-8') as f:
+            config = yaml.safe_load(f)
+        serialization.configure(**config.get('serialization_settings', {}))
+        input_dir = config['path_settings']['raw_output_directory']
+    if not os.path.isdir(input_dir):
+        print(f"錯誤：輸入目錄 '{input_dir}' 不存在。")
+        return
+
+    files = list_sample_files(input_dir)
+    workers = max(1, args.workers)
+    chunksize = args.chunksize if args.chunksize > 0 else max(1, min(64, len(files) // (workers * 4)))
+    batches = [files[i:i + chunksize] for i in range(0, len(files), chunksize)]
+    print(f"在 '{input_dir}' 找到 {len(files)} 個檔案 (workers={workers}, chunksize={chunksize})。")
+
+    # 只保留每個樣本的純量指標與固定大小的直方圖，記憶體用量不隨線網規模成長
+    columns = {name: [] for name in SCALAR_METRICS}
+    histograms = None
+    num_samples, start_time = 0, time.perf_counter()
+    per_sample_writer = serialization.JsonLinesWriter(args.per_sample) if args.per_sample else contextlib.nullcontext()
+    # --intra-workers 時逐一在主行程分析檔案，平行化發生在每個樣本之內
+    intra_workers = max(1, args.intra_workers)
+    pool_context = multiprocessing.Pool(processes=workers) if intra_workers == 1 else contextlib.nullcontext()
+    with per_sample_writer as per_sample, pool_context as pool:
+        if pool:
+            results = pool.imap_unordered(analyze_file_batch, batches)
+        else:
+            results = (analyze_file_batch(batch, intra_workers) for batch in batches)
+        for rows, batch_hist, errors in results:
+            for row in rows:
+                for name in SCALAR_METRICS:
+                    columns[name].append(row[name])
+                if per_sample:
+                    per_sample.write(row)
+            num_samples += len(rows)
+            histograms = batch_hist if histograms is None else {k: histograms[k] + v for k, v in batch_hist.items()}
+            for filename, message in errors:
+                print(f"--- 檔案分析失敗: {filename}: {message}")
+    if histograms is None:
+        print("沒有可分析的樣本。")
+        return
+
+    summary = summarize(columns)
+    print(f"\n共分析 {num_samples} 個樣本，耗時 {time.perf_counter() - start_time:.2f} 秒。")
+    print_summary(summary, histograms)
+    if args.output:
+        serialization.dump({"num_samples": num_samples, "summary": summary,
+                            "histograms": {name: {"bin_edges": HISTOGRAM_BINS[name], "counts": counts}
+                                           for name, counts in histograms.items()}}, args.output)
+        print(f"\n統計結果已儲存至 '{args.output}'")
+
+if __name__ == '__main__':
+    main()
@@ -3,227 +3,143 @@
 import random
 import numpy as np
 import yaml
-import os
 import time
-import shutil
-import imageio
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
+import functools
+import multiprocessing
 from generator import LayoutGenerator
-from layout import Layout, Rectangle
-from symmetry import SymmetricGenerator
-from alignment import AlignmentGenerator
 from grouper import LayoutGrouper
-
-FRAME_DIR = "_frames_for_gif"
-frame_files = []
-frame_counter = 0
+from fast_render import category_of, draw_layout, rasterize_layout
+from config_compiler import compile_config
+from main import place_constrained_groups, place_random_components
 
 def load_config(path='config.yaml'):
     """載入設定檔"""
     with open(path, 'r', encoding='utf-8') as f:
         return yaml.safe_load(f)
 
-def get_randomized_params(config):
-    """從設定檔中獲取一組隨機參數"""
-    params = config['base_params'].copy()
-    for key, value in config.items():
-        if isinstance(value, dict):
-            params.setdefault(key, value.copy())
-    for key, rule in config.get('randomize_params', {}).items():
-        if rule['type'] == 'randint':
-            params[key] = random.randint(rule['low'], rule['high'])
-        elif rule['type'] == 'uniform':
-            params[key] = random.uniform(rule['low'], rule['high'])
-    return params
-
-def save_frame(rects, params, title, is_final=False):
-    """將目前的佈局狀態繪製並儲存為一張圖片。"""
-    global frame_counter
-    
-    fig, ax = plt.subplots(1, figsize=(10, 10))
-    ax.set_xlim(0, params['CANVAS_WIDTH'])
-    ax.set_ylim(params['CANVAS_HEIGHT'], 0)
+class FrameRecorder:
+    """
+    生成過程中只記錄輕量的佈局快照 (x0, y0, w, h 與配色類別陣列)，不做任何繪圖。
+    與上一張內容相同的影格不會重複記錄，而是延長上一張的顯示時間。
+    """
+    def __init__(self, canvas_w, canvas_h, sample_every=15, dedup_titles=True):
+        self.canvas = (canvas_w, canvas_h)
+        self.sample_every = sample_every
+        self.dedup_titles = dedup_titles
+        self.frames = []
+
+    def capture(self, rects, title, is_final=False):
+        boxes = np.array([(r.x - r.w / 2, r.y - r.h / 2, r.w, r.h) for r in rects], dtype=float).reshape(-1, 4)
+        category = np.array([category_of(r.constraints, r.component_type) for r in rects], dtype=np.int64)
+        hold = 5 if is_final else 1
+        last = self.frames[-1] if self.frames else None
+        if (last is not None and np.array_equal(last['boxes'], boxes) and np.array_equal(last['category'], category)
+                and (not self.dedup_titles or last['title'] == title)):
+            last['hold'] += hold
+            print(f"  [=] Frame unchanged, extended Frame {len(self.frames) - 1}: {title}")
+            return
+        self.frames.append({"title": title, "boxes": boxes, "category": category, "hold": hold})
+        print(f"  [+] Captured Frame {len(self.frames) - 1}: {title}")
+
+    def attach(self, generator):
+        """把快照記錄掛到 LayoutGenerator 的事件上，展示與正式生成共用同一個迴圈。"""
+        generator.add_hook('iteration_end', self._on_iteration_end)
+        generator.add_hook('rollback', self._on_rollback)
+        generator.add_hook('shake', self._on_shake)
+        generator.add_hook('infill', self._on_infill)
+        generator.add_hook('legalization', self._on_legalization)
+        return generator
+
+    def _on_iteration_end(self, generator, rects, iteration, density, **_):
+        if iteration % self.sample_every == 0:
+            self.capture(rects, f"Iteration {iteration} | Density: {density:.2%}")
+
+    def _on_rollback(self, generator, rects, phase, **_):
+        if phase == 'before':
+            self.capture(rects, "Stagnation Limit Hit! Rolling back...", is_final=True)
+        else:
+            self.capture(rects, "After Rollback")
+
+    def _on_shake(self, generator, rects, phase, **_):
+        self.capture(rects, f"Light Shake: {phase.capitalize()}", is_final=True)
+
+    def _on_infill(self, generator, rects, phase, success=False, **_):
+        if phase == 'before':
+            self.capture(rects, "Triggering In-fill...", is_final=True)
+        elif success:
+            self.capture(rects, "After In-fill")
+
+    def _on_legalization(self, generator, rects, phase, **_):
+        self.capture(rects, f"Final Legalization: {phase.capitalize()}", is_final=True)
+
+def render_frame(frame, canvas, renderer='matplotlib', width=1200):
+    """在子行程中把一張快照繪製成 RGB 陣列；'raster' 直接以 NumPy 光柵化 (不含標題)，速度快得多。"""
+    arrays = {"canvas": canvas, "boxes": frame['boxes'], "category": frame['category'],
+              "ids": np.arange(len(frame['boxes'])), "pins": np.zeros((0, 2)), "segments": np.zeros((0, 2, 2))}
+    if renderer == 'raster':
+        return rasterize_layout(arrays, width, draw_edges=False, draw_pins=False)
+
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(1, figsize=(10, 10), dpi=width / 10)
+    ax.set_xlim(0, canvas[0])
+    ax.set_ylim(canvas[1], 0)
     ax.set_aspect('equal', adjustable='box')
     ax.set_facecolor('white')
-    plt.title(title, fontsize=16, color='black', pad=20)
+    ax.set_title(frame['title'], fontsize=16, color='black', pad=20)
     ax.grid(True, linestyle='--', alpha=0.6)
-    
-    for r in rects:
-        x, y, w, h = r.x - r.w/2, r.y - r.h/2, r.w, r.h
-        
-        constraints = r.constraints
-        component_type = r.component_type
-
-        if 'grouping_id' in constraints:
-            face_color, edge_color = '#E1BEE7', '#6A1B9A'
-        elif 'symmetry_id' in constraints:
-            face_color, edge_color = '#C8E6C9', '#2E7D32'
-        elif 'alignment_id' in constraints:
-            face_color, edge_color = '#FFECB3', '#FF8F00'
-        elif component_type == 'macro':
-            face_color, edge_color = '#2196F3', '#0D47A1'
-        elif component_type == 'std_cell':
-            face_color, edge_color = '#BBDEFB', '#42A5F5'
-        else:
-            face_color, edge_color = '#CFD8DC', '#37474F'
-
-        rect_patch = patches.Rectangle((x, y), w, h, linewidth=1.5, edgecolor=edge_color, facecolor=face_color, alpha=0.9)
-        ax.add_patch(rect_patch)
-
-    filepath = os.path.join(FRAME_DIR, f"frame_{frame_counter:05d}.png")
-    plt.savefig(filepath, dpi=120, bbox_inches='tight', pad_inches=0.2, facecolor='white')
+    draw_layout(ax, arrays, alpha=0.9)
+    fig.canvas.draw()
+    image = np.asarray(fig.canvas.buffer_rgba())[..., :3].copy()
     plt.close(fig)
-    
-    duration_multiplier = 5 if is_final else 1
-    for _ in range(duration_multiplier):
-        frame_files.append(filepath)
-        
-    frame_counter += 1
-    print(f"  [+] Saved Frame {frame_counter-1}: {title}")
-
-
-class DemoLayoutGenerator(LayoutGenerator):
-    """繼承自 LayoutGenerator，並在關鍵函式中插入儲存影格的邏輯。"""
-    def _rollback_growth(self, rects):
-        save_frame(rects, self.params, "Stagnation Limit Hit! Rolling back...", is_final=True)
-        result = super()._rollback_growth(rects)
-        save_frame(result, self.params, "After Rollback", is_final=False)
-        return result
-
-    def _shake_components(self, rects, legalize=False):
-        title_prefix = "Final Legalization" if legalize else "Light Shake"
-        save_frame(rects, self.params, f"{title_prefix}: Before", is_final=True)
-        result = super()._shake_components(rects, legalize)
-        save_frame(result, self.params, f"{title_prefix}: After", is_final=True)
-        return result
-
-    def _infill_empty_spaces(self, rects):
-        save_frame(rects, self.params, "Triggering In-fill...", is_final=True)
-        result, success = super()._infill_empty_spaces(rects)
-        if success:
-            save_frame(result, self.params, "After In-fill", is_final=False)
-        return result, success
-
-    def generate(self):
-        p = self.params
-        print("\n[DEMO] Starting Generation Loop...")
-        rects = p.get('initial_rects', [])
-        
-        stagnation_counter, shakes_since_last_infill, infill_triggered_count = 0, 0, 0
-
-        for i in range(p['MAX_ITERATIONS']):
-            changed_this_iteration = False
-            movable_rects = [r for r in rects if not r.fixed]
-            random.shuffle(movable_rects)
-
-            for r in movable_rects:
-                if random.random() > r.growth_prob: continue
-                original_x, original_y, original_w, original_h = r.x, r.y, r.w, r.h
-                direction = random.choice(['right', 'left', 'down', 'up'])
-                
-                if direction == 'right': r.w += p['GROWTH_STEP']; r.x += p['GROWTH_STEP'] / 2
-                elif direction == 'left': r.w += p['GROWTH_STEP']; r.x -= p['GROWTH_STEP'] / 2
-                elif direction == 'down': r.h += p['GROWTH_STEP']; r.y += p['GROWTH_STEP'] / 2
-                else: r.h += p['GROWTH_STEP']; r.y -= p['GROWTH_STEP'] / 2
-                
-                if (r.w / r.h > p['MAX_ASPECT_RATIO']) or (r.h / r.w > p['MAX_ASPECT_RATIO']):
-                    r.x, r.y, r.w, r.h = original_x, original_y, original_w, original_h; continue
-                if not (0 <= r.x - r.w/2 and r.x + r.w/2 <= p['CANVAS_WIDTH'] and 0 <= r.y - r.h/2 and r.y + r.h/2 <= p['CANVAS_HEIGHT']):
-                    r.x, r.y, r.w, r.h = original_x, original_y, original_w, original_h; continue
-                
-                if any(r.intersects(other_r) for other_r in rects if r.id != other_r.id):
-                    r.x, r.y, r.w, r.h = original_x, original_y, original_w, original_h
-                else:
-                    changed_this_iteration = True
-            
-            current_density = sum(r.w * r.h for r in rects) / (p['CANVAS_WIDTH'] * p['CANVAS_HEIGHT'])
-            if (i + 1) % 15 == 0:
-                save_frame(rects, p, f"Iteration {i+1} | Density: {current_density:.2%}")
-
-            if current_density >= p['TARGET_DENSITY']: print(f"\nTarget density reached {p['TARGET_DENSITY']:.2%}"); break
-
-            stagnation_counter = 0 if changed_this_iteration else stagnation_counter + 1
-            if stagnation_counter >= p['SHAKE_TRIGGER_THRESHOLD']:
-                if stagnation_counter >= p['STAGNATION_LIMIT']: print(f"\nStagnation limit exceeded {p['STAGNATION_LIMIT']} iterations..."); break
-                if shakes_since_last_infill >= p['INFILL_TRIGGER_AFTER_N_SHAKES'] and infill_triggered_count < p['INFILL_MAX_TRIGGERS']:
-                    rects, success = self._infill_empty_spaces(rects)
-                    if success: infill_triggered_count += 1; shakes_since_last_infill = 0
-                else:
-                    rects = self._rollback_growth(rects); rects = self._shake_components(rects)
-                    shakes_since_last_infill += 1
-                stagnation_counter = 0
-                
-        print("\n[DEMO] Generation loop finished. Performing final legalization...")
-        final_rects = self._shake_components(rects, legalize=True)
-                
-        final_layout = Layout(p['CANVAS_WIDTH'], p['CANVAS_HEIGHT'])
-        final_layout.rectangles = final_rects
-        return final_layout
+    return image
+
+def write_gif(recorder, gif_path, renderer='matplotlib', width=1200, frame_duration=0.2, workers=None):
+    """
+    以多行程依序繪製所有快照，並直接串流寫入 GIF 編碼器 (不產生暫存圖檔)。
+    frame_duration 以秒為單位；imageio 的 pillow GIF 後端以毫秒為單位，因此每張影格寫入 hold * frame_duration * 1000。
+    """
+    import imageio
+
+    durations = [frame['hold'] * frame_duration * 1000 for frame in recorder.frames]
+    worker_func = functools.partial(render_frame, canvas=recorder.canvas, renderer=renderer, width=width)
+    with multiprocessing.Pool(processes=workers) as pool, \
+            imageio.get_writer(gif_path, mode='I', duration=durations, loop=0) as writer:
+        for image in pool.imap(worker_func, recorder.frames):
+            writer.append_data(image)
 
 def main():
-    global frame_files, frame_counter
-    
     print("--- Setting up Demo Generation ---")
-    if os.path.exists(FRAME_DIR): shutil.rmtree(FRAME_DIR)
-    os.makedirs(FRAME_DIR)
-    
     config = load_config('config.yaml')
-    params = get_randomized_params(config)
+    params = compile_config(config).sample_batch(1)[0]
+    demo_settings = config.get('demo_settings', {})
+    renderer = demo_settings.get('renderer', 'matplotlib')
+    recorder = FrameRecorder(params['CANVAS_WIDTH'], params['CANVAS_HEIGHT'],
+                             demo_settings.get('sample_every_n_iterations', 15), dedup_titles=renderer != 'raster')
     
-    seed = random.randint(0, 2**32 - 1)
-    params['SEED'] = seed
+    seed = params['SEED']
     random.seed(seed); np.random.seed(seed)
     print(f"Parameters loaded. Using SEED: {seed}")
     
     placed_rects = []
-    last_id, last_pin_id = -1, 0
-    
     print("\n--- Phase 1: Generating Pre-constrained Groups ---")
-    if params.get('analog_symmetry_settings', {}).get('enable', False):
-        sym_gen = SymmetricGenerator(params)
-        _, last_id, last_pin_id = sym_gen.generate_analog_groups(0, last_pin_id, placed_rects)
-        
-    if params.get('alignment_settings', {}).get('enable', False):
-        align_gen = AlignmentGenerator(params)
-        _, _, last_id = align_gen.generate_aligned_sets(last_id + 1, placed_rects)
-    save_frame(placed_rects, params, "Phase 1: Pre-constrained Groups Placed", is_final=True)
+    _, last_id, last_pin_id = place_constrained_groups(params, placed_rects)
+    recorder.capture(placed_rects, "Phase 1: Pre-constrained Groups Placed", is_final=True)
 
     print("\n--- Phase 2: Placing Initial Random Components ---")
-    component_definitions = params.get('component_types', {})
-    types_to_generate = []
-    total_random_rects = params['NUM_RECTANGLES']
-    for type_name, definition in component_definitions.items():
-        count = int(total_random_rects * definition.get('proportion', 0))
-        types_to_generate.extend([type_name] * count)
-    while len(types_to_generate) < total_random_rects:
-        types_to_generate.append('std_cell')
-    random.shuffle(types_to_generate)
-
-    for component_type in types_to_generate:
-        type_def = component_definitions.get(component_type)
-        if not type_def: continue
-        for _ in range(500):
-            w, h = random.uniform(*type_def['width_range']), random.uniform(*type_def['height_range'])
-            prob = random.uniform(*type_def['growth_prob_range'])
-            rand_x, rand_y = random.uniform(w/2, params['CANVAS_WIDTH'] - w/2), random.uniform(h/2, params['CANVAS_HEIGHT'] - h/2)
-            temp_rect = Rectangle(None, rand_x, rand_y, w, h)
-            if not any(temp_rect.intersects(r) for r in placed_rects):
-                last_id += 1
-                placed_rects.append(Rectangle(last_id, rand_x, rand_y, w, h, prob, component_type))
-                break
-    save_frame(placed_rects, params, "Phase 2: Initial Random Components Placed", is_final=True)
+    place_random_components(params, placed_rects, last_id)
+    recorder.capture(placed_rects, "Phase 2: Initial Random Components Placed", is_final=True)
     
     print("\n--- Phase 3: Growth and Optimization ---")
     params['initial_rects'] = placed_rects
-    demo_generator = DemoLayoutGenerator(params)
-    final_layout = demo_generator.generate()
+    final_layout = recorder.attach(LayoutGenerator(params)).generate()
 
     print("\n--- Phase 4: Applying Post-Placement Grouping ---")
     if params.get('grouping_settings', {}).get('enable', False):
         grouper = LayoutGrouper(final_layout, params)
         final_layout = grouper.create_hierarchical_groups()
-    save_frame(final_layout.rectangles, params, "Phase 4: Hierarchical Groups Formed", is_final=True)
+    recorder.capture(final_layout.rectangles, "Phase 4: Hierarchical Groups Formed", is_final=True)
     
     print("\n--- Phase 5: Generating Pins and Edges ---")
     final_layout.generate_pins(
@@ -236,19 +152,14 @@ def main():
     )
     
     final_layout_with_nets = final_layout
-    save_frame(final_layout_with_nets.rectangles, params, "Final Layout with Pins & Edges", is_final=True)
-
-    print("\n--- Phase 6: Compiling GIF ---")
-    gif_path = "layout_generation_demo.gif"
-    with imageio.get_writer(gif_path, mode='I', duration=0.2, loop=0) as writer:
-        for filename in frame_files:
-            image = imageio.v2.imread(filename)
-            writer.append_data(image)
-    print(f"Success! GIF saved to: {gif_path}")
+    recorder.capture(final_layout_with_nets.rectangles, "Final Layout with Pins & Edges", is_final=True)
 
-    print("\n--- Phase 7: Cleaning up temporary files ---")
-    shutil.rmtree(FRAME_DIR)
-    print("Done.")
+    print(f"\n--- Phase 6: Rendering {len(recorder.frames)} Frames and Compiling GIF ({renderer}) ---")
+    gif_path = demo_settings.get('output_gif', "layout_generation_demo.gif")
+    start_time = time.time()
+    write_gif(recorder, gif_path, renderer, demo_settings.get('frame_width', 1200),
+              demo_settings.get('frame_duration', 0.2), demo_settings.get('render_workers'))
+    print(f"Success! GIF saved to: {gif_path} (rendered in {time.time() - start_time:.2f} s)")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
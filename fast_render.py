@@ -0,0 +1,250 @@
+# fast_render.py
+
+import os
+import argparse
+import functools
+import multiprocessing
+import struct
+import zlib
+import numpy as np
+import serialization
+from id_index import index_of
+from merge_datasets import list_layout_files
+
+CATEGORIES = ('grouping', 'symmetry', 'alignment', 'macro', 'std_cell', 'default')
+
+# 與 analyze_layout / demo_generator 相同的配色
+DEFAULT_COLORS = {
+    'grouping':     {'face': '#E1BEE7', 'edge': '#6A1B9A'},
+    'symmetry':     {'face': '#C8E6C9', 'edge': '#2E7D32'},
+    'alignment':    {'face': '#FFECB3', 'edge': '#FF8F00'},
+    'macro':        {'face': '#2196F3', 'edge': '#0D47A1'},
+    'std_cell':     {'face': '#BBDEFB', 'edge': '#42A5F5'},
+    'default':      {'face': '#CFD8DC', 'edge': '#37474F'}
+}
+
+def category_of(constraints, component_type):
+    """決定元件配色的類別索引 (對應 CATEGORIES)，優先順序為：群組 > 對稱 > 對齊 > 元件類型。"""
+    if 'grouping_id' in constraints: return 0
+    if 'symmetry_id' in constraints: return 1
+    if 'alignment_id' in constraints: return 2
+    if component_type == 'macro': return 3
+    if component_type == 'std_cell': return 4
+    return 5
+
+def layout_arrays(layout_data):
+    """
+    把原始佈局的 layout_data 轉成繪圖用的陣列：矩形左上角與尺寸 (n, 4)、類別索引、ID、
+    引腳絕對座標 (p, 2) 與連線端點 (m, 2, 2)。之後所有繪圖都只需處理這些陣列。
+    """
+    rects = layout_data['rectangles']
+    rect_ids = np.array([r['id'] for r in rects], dtype=np.int64)
+    xywh = np.array([(r['x'], r['y'], r['w'], r['h']) for r in rects], dtype=float).reshape(-1, 4)
+    boxes = np.column_stack([xywh[:, 0] - xywh[:, 2] / 2, xywh[:, 1] - xywh[:, 3] / 2, xywh[:, 2], xywh[:, 3]])
+
+    pins = layout_data.get('pins', [])
+    pin_ids = np.array([pin['id'] for pin in pins], dtype=np.int64)
+    pin_rect = index_of(rect_ids, np.array([pin['parent_rect_id'] for pin in pins], dtype=np.int64))
+    pin_rel = np.array([pin['rel_pos'] for pin in pins], dtype=float).reshape(-1, 2)
+    # 找不到父矩形 (-1) 的引腳不參與座標計算，以免負索引取到最後一個矩形或在沒有矩形時越界
+    pin_valid = pin_rect >= 0
+    pin_pos = np.zeros((len(pins), 2))
+    pin_pos[pin_valid] = xywh[pin_rect[pin_valid], :2] + pin_rel[pin_valid]
+
+    edges = np.array(layout_data.get('netlist_edges', []), dtype=np.int64).reshape(-1, 2)
+    src, dst = index_of(pin_ids, edges[:, 0]), index_of(pin_ids, edges[:, 1])
+    valid = (src >= 0) & (dst >= 0)
+    src, dst = src[valid], dst[valid]
+    valid = pin_valid[src] & pin_valid[dst]
+    return {
+        "canvas": (layout_data.get('canvas_width'), layout_data.get('canvas_height')),
+        "ids": rect_ids, "boxes": boxes, "category": np.array([category_of(r.get('constraints', {}), r.get('component_type')) for r in rects], dtype=np.int64),
+        "pins": pin_pos[pin_valid], "segments": np.stack([pin_pos[src[valid]], pin_pos[dst[valid]]], axis=1),
+    }
+
+# ---------------------------------------------------------------------------
+# 後端 1：matplotlib collection，每種圖元只建立一個 artist
+# ---------------------------------------------------------------------------
+
+def draw_layout(ax, arrays, palette=DEFAULT_COLORS, linewidth=1.5, alpha=1.0, label_fontsize=None,
+                edge_alpha=0.5, pin_radius=None):
+    """
+    以 PolyCollection / LineCollection / 散佈圖一次畫出所有矩形、連線與引腳。
+    pin_radius 為資料座標中的引腳半徑 (None 則畫成固定大小的點)；label_fontsize 不為 None 時才逐一標註 ID。
+    """
+    from matplotlib.collections import PolyCollection, LineCollection, EllipseCollection
+
+    boxes, category = arrays['boxes'], arrays['category']
+    x0, y0, w, h = boxes.T
+    verts = np.stack([np.column_stack([x0, y0]), np.column_stack([x0 + w, y0]),
+                      np.column_stack([x0 + w, y0 + h]), np.column_stack([x0, y0 + h])], axis=1)
+    faces = np.array([palette[name]['face'] for name in CATEGORIES], dtype=object)[category]
+    edges = np.array([palette[name]['edge'] for name in CATEGORIES], dtype=object)[category]
+    ax.add_collection(PolyCollection(verts, facecolors=list(faces), edgecolors=list(edges),
+                                     linewidths=linewidth, alpha=alpha, zorder=2))
+    if len(arrays['segments']):
+        ax.add_collection(LineCollection(arrays['segments'], colors='gray', linewidths=0.6, alpha=edge_alpha, zorder=3))
+    if len(arrays['pins']):
+        if pin_radius is None:
+            ax.scatter(arrays['pins'][:, 0], arrays['pins'][:, 1], s=4, c='black', marker='.', linewidths=0, zorder=4)
+        else:
+            ax.add_collection(EllipseCollection(2 * pin_radius, 2 * pin_radius, 0, units='xy', offsets=arrays['pins'],
+                                                offset_transform=ax.transData, facecolors='black', zorder=4))
+    if label_fontsize:
+        for rect_id, (bx, by, bw, bh) in zip(arrays['ids'].tolist(), boxes.tolist()):
+            ax.text(bx + bw / 2, by + bh / 2, str(rect_id), ha='center', va='center', fontsize=label_fontsize, zorder=5)
+
+def render_collections(arrays, path, size_inches=10, dpi=100, palette=DEFAULT_COLORS):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    canvas_w, canvas_h = arrays['canvas']
+    fig, ax = plt.subplots(1, figsize=(size_inches, size_inches * canvas_h / canvas_w))
+    ax.set_xlim(0, canvas_w); ax.set_ylim(canvas_h, 0)
+    ax.set_aspect('equal', adjustable='box')
+    draw_layout(ax, arrays, palette)
+    fig.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+
+# ---------------------------------------------------------------------------
+# 後端 2：直接以 NumPy 光柵化成 RGB 影像，不需要 matplotlib
+# ---------------------------------------------------------------------------
+
+def _rgb(hex_color):
+    hex_color = hex_color.lstrip('#')
+    return np.array([int(hex_color[i:i + 2], 16) for i in (0, 2, 4)], dtype=np.uint8)
+
+def _draw_segments(image, p0, p1, color, alpha=1.0):
+    """把 (m, 2) 像素座標的線段一次取樣成像素點後寫入影像；alpha < 1 時與背景混合 (重疊處只混合一次)。"""
+    if len(p0) == 0:
+        return
+    height, width, _ = image.shape
+    delta = p1 - p0
+    steps = np.ceil(np.abs(delta).max(axis=1)).astype(np.int64) + 1
+    seg = np.repeat(np.arange(len(p0)), steps)
+    t = (np.arange(steps.sum()) - np.repeat(np.cumsum(steps) - steps, steps)) / np.repeat(np.maximum(steps - 1, 1), steps)
+    points = p0[seg] + delta[seg] * t[:, None]
+    cols = np.clip(np.round(points[:, 0]).astype(np.int64), 0, width - 1)
+    rows = np.clip(np.round(points[:, 1]).astype(np.int64), 0, height - 1)
+    if alpha >= 1.0:
+        image[rows, cols] = color
+        return
+    mask = np.zeros((height, width), dtype=bool)
+    mask[rows, cols] = True
+    image[mask] = (image[mask] * (1 - alpha) + color * alpha).astype(np.uint8)
+
+def rasterize_layout(arrays, width=1024, palette=DEFAULT_COLORS, draw_edges=True, draw_pins=True, edge_alpha=0.5):
+    """
+    以畫布寬度 width 像素光柵化佈局，回傳 (高, 寬, 3) 的 uint8 影像 (y 軸向下，與其他視覺化一致)。
+    每個類別的填色以二維差分陣列 + 前綴和一次完成，外框與連線以向量化取樣的線段繪製。
+    """
+    canvas_w, canvas_h = arrays['canvas']
+    scale = width / canvas_w
+    height = max(1, int(round(canvas_h * scale)))
+    image = np.full((height, width, 3), 255, dtype=np.uint8)
+
+    boxes, category = arrays['boxes'] * scale, arrays['category']
+    c0 = np.clip(np.round(boxes[:, 0]).astype(np.int64), 0, width)
+    r0 = np.clip(np.round(boxes[:, 1]).astype(np.int64), 0, height)
+    c1 = np.clip(np.round(boxes[:, 0] + boxes[:, 2]).astype(np.int64), 0, width)
+    r1 = np.clip(np.round(boxes[:, 1] + boxes[:, 3]).astype(np.int64), 0, height)
+    for cat_idx, name in enumerate(CATEGORIES):
+        members = np.flatnonzero(category == cat_idx)
+        if members.size == 0:
+            continue
+        diff = np.zeros((height + 1, width + 1), dtype=np.int32)
+        np.add.at(diff, (r0[members], c0[members]), 1)
+        np.add.at(diff, (r0[members], c1[members]), -1)
+        np.add.at(diff, (r1[members], c0[members]), -1)
+        np.add.at(diff, (r1[members], c1[members]), 1)
+        image[diff.cumsum(axis=0).cumsum(axis=1)[:height, :width] > 0] = _rgb(palette[name]['face'])
+
+    if draw_edges and len(arrays['segments']):
+        segments = arrays['segments'] * scale
+        _draw_segments(image, segments[:, 0], segments[:, 1], np.array([128, 128, 128]), edge_alpha)
+
+    x0, y0, x1, y1 = boxes[:, 0], boxes[:, 1], boxes[:, 0] + boxes[:, 2] - 1, boxes[:, 1] + boxes[:, 3] - 1
+    for cat_idx, name in enumerate(CATEGORIES):
+        m = category == cat_idx
+        if not m.any():
+            continue
+        corners = [np.column_stack(c) for c in ((x0[m], y0[m]), (x1[m], y0[m]), (x1[m], y1[m]), (x0[m], y1[m]))]
+        starts = np.concatenate(corners)
+        ends = np.concatenate(corners[1:] + corners[:1])
+        _draw_segments(image, starts, ends, _rgb(palette[name]['edge']))
+
+    if draw_pins and len(arrays['pins']):
+        pins = arrays['pins'] * scale
+        cols = np.clip(np.round(pins[:, 0]).astype(np.int64), 0, width - 1)
+        rows = np.clip(np.round(pins[:, 1]).astype(np.int64), 0, height - 1)
+        image[rows, cols] = 0
+    return image
+
+def encode_png(image):
+    """把 (高, 寬, 3) 的 uint8 影像編碼成 PNG bytes (只使用標準函式庫的 zlib)。"""
+    height, width, _ = image.shape
+    raw = np.concatenate([np.zeros((height, 1), dtype=np.uint8), image.reshape(height, width * 3)], axis=1).tobytes()
+
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)) +
+            chunk(b'IDAT', zlib.compress(raw, 6)) + chunk(b'IEND', b''))
+
+def render_file(json_path, output_path, backend='raster', width=1024):
+    """把一個原始佈局檔繪製成 PNG。"""
+    arrays = layout_arrays(serialization.load(json_path)['layout_data'])
+    if backend == 'collections':
+        render_collections(arrays, output_path, dpi=width / 10)
+    else:
+        with open(output_path, 'wb') as f:
+            f.write(encode_png(rasterize_layout(arrays, width)))
+
+def _render_thumbnail(sample, output_dir, width):
+    name, json_path = sample
+    try:
+        render_file(json_path, os.path.join(output_dir, name.replace('.json', '.png')), 'raster', width)
+        return name, "Success"
+    except Exception as e:
+        return name, f"Error: {type(e).__name__}: {e}"
+
+def render_thumbnails(input_dir, output_dir, width=256, workers=None):
+    """以多行程將資料集 (含虛擬合併清單) 中的每個樣本光柵化為縮圖，回傳失敗的 (檔名, 訊息) 列表。"""
+    os.makedirs(output_dir, exist_ok=True)
+    samples = list_layout_files(input_dir)
+    worker_func = functools.partial(_render_thumbnail, output_dir=output_dir, width=width)
+    chunksize = max(1, min(64, len(samples) // ((workers or multiprocessing.cpu_count()) * 4)))
+    with multiprocessing.Pool(processes=workers) as pool:
+        results = list(pool.imap_unordered(worker_func, samples, chunksize=chunksize))
+    failures = [(name, status) for name, status in results if status != "Success"]
+    print(f"已產生 {len(results) - len(failures)} 張縮圖至 '{output_dir}'，失敗 {len(failures)} 張。")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Fast layout rendering with matplotlib collections or a NumPy rasterizer.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    p_render = subparsers.add_parser('render', help="Render one raw layout JSON file to PNG.")
+    p_render.add_argument("layout_json", help="Path to a raw layout_*.json file.")
+    p_render.add_argument("output_image", help="Output PNG path.")
+    p_render.add_argument("--backend", choices=['raster', 'collections'], default='raster',
+                          help="raster writes pixels directly with NumPy; collections uses matplotlib collections.")
+    p_render.add_argument("--width", type=int, default=1024, help="Output width in pixels.")
+
+    p_thumbs = subparsers.add_parser('thumbnails', help="Rasterize every sample of a dataset directory to PNG thumbnails.")
+    p_thumbs.add_argument("input_dir", help="Raw dataset directory (physical files or a virtual merge manifest).")
+    p_thumbs.add_argument("output_dir", help="Directory for the thumbnails.")
+    p_thumbs.add_argument("--width", type=int, default=256, help="Thumbnail width in pixels.")
+    p_thumbs.add_argument("--workers", type=int, default=multiprocessing.cpu_count(), help="Number of worker processes.")
+    args = parser.parse_args()
+
+    if args.command == 'render':
+        render_file(args.layout_json, args.output_image, args.backend, args.width)
+        print(f"佈局圖已儲存至: {args.output_image}")
+    else:
+        for name, status in render_thumbnails(args.input_dir, args.output_dir, args.width, args.workers):
+            print(f"--- 縮圖產生失敗: {name}: {status}")
+
+if __name__ == '__main__':
+    main()
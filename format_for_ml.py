@@ -1,140 +1,238 @@
 # format_for_ml.py
 
-import json
+import serialization
 import os
 import argparse
-from tqdm import tqdm
 import multiprocessing
 from collections import defaultdict
-import yaml
 import functools
+import itertools
+import numpy as np
+import time
+import hashlib
+from cache import ResultCache, make_key, FORMAT_SOURCES
+from merge_datasets import list_layout_files
+from id_index import index_of
+
+# 子行程內的快取實例，由 _init_worker 依 cache_settings 建立；None 代表不使用快取
+_worker_cache = None
 
 def load_config(path='config.yaml'):
     """載入 YAML 設定檔。"""
+    import yaml
     with open(path, 'r', encoding='utf-8') as f:
         return yaml.safe_load(f)
 
-def get_node_definition(rects_in_node, node_idx):
-    """根據一組矩形計算抽象節點的屬性。"""
-    if not rects_in_node:
-        return None
-    min_x = min(r['x'] - r['w']/2 for r in rects_in_node)
-    max_x = max(r['x'] + r['w']/2 for r in rects_in_node)
-    min_y = min(r['y'] - r['h']/2 for r in rects_in_node)
-    max_y = max(r['y'] + r['h']/2 for r in rects_in_node)
+OUR_ALIGN_MAP = {"left": 0, "right": 1, "top": 2, "bottom": 3, "h_center": 4, "v_center": 5}
+
+def _align_feature(align_type):
+    feature_vec = [0.0] * 6
+    if align_type in OUR_ALIGN_MAP: feature_vec[OUR_ALIGN_MAP[align_type]] = 1.0
+    return feature_vec
+
+def _pack_hyperedges(member_lists, features=None):
+    """將多個成員列表壓縮成 CSR 形式 (offsets + 扁平 members)。"""
+    offsets = [0]
+    for members in member_lists:
+        offsets.append(offsets[-1] + len(members))
+    packed = {"offsets": offsets, "members": [m for members in member_lists for m in members]}
+    if features is not None:
+        packed["features"] = features
+    return packed
+
+def expand_hyperedges(data, align_mode='chain'):
+    """
+    將 constraint_encoding='hyperedge' 的 ML-ready 資料就地展開成 align_edge / group_edge 邊列表。
+    group 以完整 clique 展開；align 預設以相鄰成員相連 (與 clique 編碼的輸出一致)，
+    align_mode='clique' 時則展開為兩兩相連。已是 clique 編碼的資料原樣回傳。
+    """
+    if data.get("constraint_encoding") != "hyperedge":
+        return data
+    edges = data["edges"]
+    align, group = edges.pop("align_hyperedge"), edges.pop("group_hyperedge")
+
+    align_edges = []
+    for k, feature_vec in enumerate(align["features"]):
+        members = align["members"][align["offsets"][k]:align["offsets"][k + 1]]
+        pairs = zip(members, members[1:]) if align_mode == 'chain' else itertools.combinations(members, 2)
+        align_edges.extend([[list(pair), list(feature_vec)] for pair in pairs])
+
+    group_edges = []
+    for k in range(len(group["offsets"]) - 1):
+        members = group["members"][group["offsets"][k]:group["offsets"][k + 1]]
+        group_edges.extend([[list(pair), [1.0]] for pair in itertools.combinations(members, 2)])
+
+    edges["align_edge"], edges["group_edge"] = align_edges, group_edges
+    data["constraint_encoding"] = "clique"
+    return data
+
+def load_ml_sample(json_path, expand=True, align_mode='chain'):
+    """讀取一個 ML-ready 檔案；expand=True 時會把 hyperedge 編碼展開成邊列表。"""
+    data = serialization.load(json_path)
+    return expand_hyperedges(data, align_mode) if expand else data
 
+def format_layout_data(raw_data, constraint_encoding='clique'):
+    """
+    將一份原始佈局資料 (main.py 輸出的 JSON 內容) 轉換為 ML-ready 的字典。
+    節點邊界框以分組歸約計算，引腳 -> 元件 -> 節點的對應以陣列索引一次完成。
+    constraint_encoding='hyperedge' 時，對齊與階層群組約束改以群組成員索引 (CSR) 儲存，
+    儲存量隨成員數線性成長，需要時再以 expand_hyperedges 展開成邊。
+    """
+    layout = raw_data['layout_data']
+    canvas_w, canvas_h = layout['canvas_width'], layout['canvas_height']
+
+    rects_data = sorted(layout['rectangles'], key=lambda r: r['id'])
+    num_rects = len(rects_data)
+    rect_ids = np.array([r['id'] for r in rects_data], dtype=np.int64)
+    rect_xywh = np.array([(r['x'], r['y'], r['w'], r['h']) for r in rects_data], dtype=float).reshape(-1, 4)
+    xs, ys, ws, hs = rect_xywh.T
+
+    # 對稱群組依首次出現的順序成為前面的節點，其餘元件依 ID 順序各自成為一個節點
+    symmetry_groups = defaultdict(list)
+    for idx, r in enumerate(rects_data):
+        sym_id = r.get('constraints', {}).get('symmetry_id')
+        if sym_id is not None:
+            symmetry_groups[sym_id].append(idx)
+    rect_node = np.full(num_rects, -1, dtype=np.int64)
+    for node_idx, members in enumerate(symmetry_groups.values()):
+        rect_node[members] = node_idx
+    singles = np.flatnonzero(rect_node < 0)
+    rect_node[singles] = len(symmetry_groups) + np.arange(len(singles))
+    num_nodes = len(symmetry_groups) + len(singles)
+
+    order = np.argsort(rect_node, kind='stable')
+    starts = np.searchsorted(rect_node[order], np.arange(num_nodes))
+    if num_rects:
+        min_x = np.minimum.reduceat((xs - ws/2)[order], starts)
+        max_x = np.maximum.reduceat((xs + ws/2)[order], starts)
+        min_y = np.minimum.reduceat((ys - hs/2)[order], starts)
+        max_y = np.maximum.reduceat((ys + hs/2)[order], starts)
+    else:
+        min_x = max_x = min_y = max_y = np.zeros(0)
     node_w, node_h = max_x - min_x, max_y - min_y
-    node_center_x, node_center_y = min_x + node_w / 2, min_y + node_h / 2
-    
-    sub_components = []
-    for r in rects_in_node:
-        offset_x = r['x'] - node_center_x
-        offset_y = r['y'] - node_center_y
-        sub_components.append({ "offset": [offset_x, offset_y], "dims": [r['w'], r['h']] })
-        
+    center_x, center_y = min_x + node_w / 2, min_y + node_h / 2
+
+    offsets = np.stack([xs - center_x[rect_node], ys - center_y[rect_node]], axis=1).tolist()
+    # dims 保留原始 JSON 的數值型別 (整數寬高仍輸出為整數)，offset 與舊版相同皆為浮點數
+    dims = [[r['w'], r['h']] for r in rects_data]
+    sub_components = [[] for _ in range(num_nodes)]
+    for idx in order.tolist():
+        sub_components[rect_node[idx]].append({"offset": offsets[idx], "dims": dims[idx]})
+
+    p = np.stack([node_w / canvas_w, node_h / canvas_h], axis=1).tolist()
+    target = np.stack([(center_x / canvas_w * 2) - 1, (center_y / canvas_h * 2) - 1], axis=1).tolist()
+
+    # --- Netlist 邊: pin ID -> pin 索引 -> 元件索引 -> 節點索引 ---
+    pins = layout.get('pins', [])
+    pin_ids = np.array([pin['id'] for pin in pins], dtype=np.int64)
+    pin_parent = np.array([pin['parent_rect_id'] for pin in pins], dtype=np.int64)
+    pin_rel = np.array([pin['rel_pos'] for pin in pins], dtype=float).reshape(-1, 2)
+    edges = np.array(layout.get('netlist_edges', []), dtype=np.int64).reshape(-1, 2)
+
+    src_pin, dst_pin = index_of(pin_ids, edges[:, 0]), index_of(pin_ids, edges[:, 1])
+    valid = (src_pin >= 0) & (dst_pin >= 0)
+    src_pin, dst_pin = src_pin[valid], dst_pin[valid]
+    src_rect, dst_rect = index_of(rect_ids, pin_parent[src_pin]), index_of(rect_ids, pin_parent[dst_pin])
+    valid = (pin_parent[src_pin] != pin_parent[dst_pin]) & (src_rect >= 0) & (dst_rect >= 0)
+    src_pin, dst_pin, src_rect, dst_rect = src_pin[valid], dst_pin[valid], src_rect[valid], dst_rect[valid]
+    src_node, dst_node = rect_node[src_rect], rect_node[dst_rect]
+    valid = src_node != dst_node
+    src_pin, dst_pin, src_rect, dst_rect = src_pin[valid], dst_pin[valid], src_rect[valid], dst_rect[valid]
+    src_node, dst_node = src_node[valid], dst_node[valid]
+
+    features = np.stack([
+        (xs[src_rect] + pin_rel[src_pin, 0] - center_x[src_node]) / canvas_w,
+        (ys[src_rect] + pin_rel[src_pin, 1] - center_y[src_node]) / canvas_h,
+        (xs[dst_rect] + pin_rel[dst_pin, 0] - center_x[dst_node]) / canvas_w,
+        (ys[dst_rect] + pin_rel[dst_pin, 1] - center_y[dst_node]) / canvas_h,
+    ], axis=1)
+    node_pairs = np.stack([src_node, dst_node], axis=1)
+    basic_component_edges = list(map(list, zip(node_pairs.tolist(), features.tolist())))
+
+    rect_id_to_node_idx = dict(zip(rect_ids.tolist(), rect_node.tolist()))
+    align_chains, group_members = [], []
+    current_chain = None
+    for id1, id2, align_type in layout.get('alignment_constraints', []):
+        node1_idx, node2_idx = rect_id_to_node_idx.get(id1), rect_id_to_node_idx.get(id2)
+        if node1_idx is None or node2_idx is None or node1_idx == node2_idx:
+            current_chain = None
+            continue
+        if current_chain and current_chain[0] == align_type and current_chain[1][-1] == node1_idx:
+            current_chain[1].append(node2_idx)
+        else:
+            current_chain = (align_type, [node1_idx, node2_idx])
+            align_chains.append(current_chain)
+
+    for group in layout.get('hierarchical_group_constraints', []):
+        node_indices_in_group = list(set(rect_id_to_node_idx[r_id] for r_id in group if r_id in rect_id_to_node_idx))
+        if len(node_indices_in_group) >= 2:
+            group_members.append(node_indices_in_group)
+
+    if constraint_encoding == 'hyperedge':
+        edges = {
+            "basic_component_edge": basic_component_edges,
+            "align_hyperedge": _pack_hyperedges([m for _, m in align_chains], [_align_feature(t) for t, _ in align_chains]),
+            "group_hyperedge": _pack_hyperedges(group_members),
+        }
+        return {"node": p, "target": target, "edges": edges,
+                "sub_components": sub_components, "constraint_encoding": "hyperedge"}
+
+    alignment_edges, group_edges = [], []
+    for align_type, members in align_chains:
+        feature_vec = _align_feature(align_type)
+        alignment_edges.extend([[[a, b], list(feature_vec)] for a, b in zip(members, members[1:])])
+    for members in group_members:
+        group_edges.extend([[list(pair), [1.0]] for pair in itertools.combinations(members, 2)])
+
     return {
-        'node_idx': node_idx, 'center_x': node_center_x, 'center_y': node_center_y,
-        'w': node_w, 'h': node_h, 'sub_components': sub_components,
-        'contained_rect_ids': [r['id'] for r in rects_in_node]
+        "node": p, "target": target,
+        "edges": {
+            "basic_component_edge": basic_component_edges,
+            "align_edge": alignment_edges,
+            "group_edge": group_edges,
+        },
+        "sub_components": sub_components
     }
 
-def format_one_file(json_path, output_dir):
+def _init_worker(backend=None, indent=None, cache_settings=None):
+    """子行程初始化：套用序列化設定並開啟共用的結果快取。"""
+    global _worker_cache
+    serialization.configure(backend, indent)
+    _worker_cache = ResultCache.from_settings(cache_settings)
+
+def _format_to_bytes(json_path, constraint_encoding='clique', indent=None):
+    """
+    讀取原始佈局檔並回傳 ML-ready 結果序列化後的 bytes。
+    啟用快取時，以 (原始檔內容雜湊, 編碼方式, 縮排, format_for_ml.py 版本) 為鍵，命中則略過格式化。
+    """
+    with open(json_path, 'rb') as f:
+        raw = f.read()
+    indent = serialization.get_settings()['indent'] if indent is None else indent
+    key = None
+    if _worker_cache is not None:
+        key = make_key('ml_format', {"raw_sha256": hashlib.sha256(raw).hexdigest(),
+                                     "constraint_encoding": constraint_encoding, "indent": indent}, FORMAT_SOURCES)
+        cached = _worker_cache.get(key)
+        if cached is not None:
+            return cached
+    data = serialization.dumps(format_layout_data(serialization.loads(raw), constraint_encoding), indent=indent)
+    if key is not None:
+        _worker_cache.put(key, data)
+    return data
+
+def format_one_file(json_path, output_dir, constraint_encoding='clique', filename=None):
     """
     處理單一檔案，並直接將結果寫入輸出目錄。
+    filename 為樣本名稱 (虛擬合併的資料集中可能與實際檔名不同)，預設取 json_path 的檔名。
     回傳一個元組 (檔名, 狀態訊息)。
     """
-    filename = os.path.basename(json_path)
+    filename = filename or os.path.basename(json_path)
     output_path = os.path.join(output_dir, filename.replace('layout_', 'formatted_'))
     
     try:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            raw_data = json.load(f)
-
-        layout = raw_data['layout_data']
-        canvas_w, canvas_h = layout['canvas_width'], layout['canvas_height']
-        
-        rects_data = sorted(layout['rectangles'], key=lambda r: r['id'])
-        rect_map = {r['id']: r for r in rects_data}
-        pins_map = {p['id']: p for p in layout.get('pins', [])}
-
-        node_defs, rect_id_to_node_idx, processed_rect_ids = [], {}, set()
-        node_idx_counter = 0
-
-        constraint_map = defaultdict(lambda: defaultdict(list))
-        for r in rects_data:
-            constraints = r.get('constraints', {})
-            if 'symmetry_id' in constraints:
-                constraint_map['symmetry_id'][constraints['symmetry_id']].append(r)
-        
-        if 'symmetry_id' in constraint_map:
-            for rects_in_group in constraint_map['symmetry_id'].values():
-                node_def = get_node_definition(rects_in_group, node_idx_counter)
-                if not node_def: continue
-                node_defs.append(node_def)
-                for r_id in node_def['contained_rect_ids']:
-                    rect_id_to_node_idx[r_id] = node_idx_counter
-                    processed_rect_ids.add(r_id)
-                node_idx_counter += 1
-
-        for r in rects_data:
-            if r['id'] not in processed_rect_ids:
-                node_def = get_node_definition([r], node_idx_counter)
-                if not node_def: continue
-                node_defs.append(node_def)
-                rect_id_to_node_idx[r['id']] = node_idx_counter
-                processed_rect_ids.add(r['id'])
-                node_idx_counter += 1
-        
-        node_idx_to_def = {n['node_idx']: n for n in node_defs}
-
-        p = [[n['w'] / canvas_w, n['h'] / canvas_h] for n in node_defs]
-        target = [[(n['center_x'] / canvas_w * 2) - 1, (n['center_y'] / canvas_h * 2) - 1] for n in node_defs]
-        
-        basic_component_edges, alignment_edges, group_edges = [], [], []
-
-        for pin1_id, pin2_id in layout.get('netlist_edges', []):
-            pin1, pin2 = pins_map.get(pin1_id), pins_map.get(pin2_id)
-            if not pin1 or not pin2: continue
-            src_rect_id, dst_rect_id = pin1['parent_rect_id'], pin2['parent_rect_id']
-            if src_rect_id == dst_rect_id: continue
-            src_node_idx, dst_node_idx = rect_id_to_node_idx.get(src_rect_id), rect_id_to_node_idx.get(dst_rect_id)
-            if src_node_idx is None or dst_node_idx is None or src_node_idx == dst_node_idx: continue
-            src_node_def, dst_node_def = node_idx_to_def[src_node_idx], node_idx_to_def[dst_node_idx]
-            src_rect, dst_rect = rect_map[src_rect_id], rect_map[dst_rect_id]
-            pin1_abs_x, pin1_abs_y = src_rect['x'] + pin1['rel_pos'][0], src_rect['y'] + pin1['rel_pos'][1]
-            pin2_abs_x, pin2_abs_y = dst_rect['x'] + pin2['rel_pos'][0], dst_rect['y'] + pin2['rel_pos'][1]
-            sx, sy = (pin1_abs_x - src_node_def['center_x']) / canvas_w, (pin1_abs_y - src_node_def['center_y']) / canvas_h
-            dx, dy = (pin2_abs_x - dst_node_def['center_x']) / canvas_w, (pin2_abs_y - dst_node_def['center_y']) / canvas_h
-            basic_component_edges.append([[src_node_idx, dst_node_idx], [sx, sy, dx, dy]])
-
-        our_align_map = {"left": 0, "right": 1, "top": 2, "bottom": 3, "h_center": 4, "v_center": 5}
-        for id1, id2, align_type in layout.get('alignment_constraints', []):
-            node1_idx, node2_idx = rect_id_to_node_idx.get(id1), rect_id_to_node_idx.get(id2)
-            if node1_idx is None or node2_idx is None or node1_idx == node2_idx: continue
-            feature_vec = [0.0] * 6
-            if align_type in our_align_map: feature_vec[our_align_map[align_type]] = 1.0
-            alignment_edges.append([[node1_idx, node2_idx], feature_vec])
-
-        for group in layout.get('hierarchical_group_constraints', []):
-            node_indices_in_group = list(set(rect_id_to_node_idx[r_id] for r_id in group if r_id in rect_id_to_node_idx))
-            for i in range(len(node_indices_in_group)):
-                for j in range(i + 1, len(node_indices_in_group)):
-                    node1_idx, node2_idx = node_indices_in_group[i], node_indices_in_group[j]
-                    if node1_idx == node2_idx: continue
-                    group_edges.append([[node1_idx, node2_idx], [1.0]])
-
-        result_data = {
-            "node": p, "target": target,
-            "edges": {
-                "basic_component_edge": basic_component_edges,
-                "align_edge": alignment_edges,
-                "group_edge": group_edges,
-            },
-            "sub_components": [n['sub_components'] for n in node_defs]
-        }
-    
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(result_data, f, ensure_ascii=False, indent=2)
+        data = _format_to_bytes(json_path, constraint_encoding)
+        with open(output_path, 'wb') as f:
+            f.write(data)
 
         return filename, "Success"
     
@@ -143,13 +241,56 @@ def format_one_file(json_path, output_dir):
         error_message = f"Error: {e}\n{traceback.format_exc()}"
         return filename, error_message
 
+def format_file_batch(batch, output_dir, aggregate=False, constraint_encoding='clique'):
+    """
+    在子行程中處理一整批檔案，攤平每個任務的排程與序列化開銷。
+    batch 為 (批次編號, [(樣本檔名, 檔案路徑)] 列表)。aggregate=True 時，整批結果寫入單一 JSON Lines 檔
+    (每行為 {"source": 原始檔名, "data": ML-ready 資料})，否則每個檔案各自寫出。
+    回傳 (每個檔案的 (檔名, 狀態) 列表, 行程 ID, 處理耗時秒數)。
+    """
+    batch_idx, samples = batch
+    start_time = time.perf_counter()
+    if not aggregate:
+        results = [format_one_file(path, output_dir, constraint_encoding, filename) for filename, path in samples]
+        return results, os.getpid(), time.perf_counter() - start_time
+
+    results = []
+    output_path = os.path.join(output_dir, f"formatted_batch_{batch_idx:05d}.jsonl")
+    with serialization.JsonLinesWriter(output_path) as out:
+        for filename, json_path in samples:
+            try:
+                data = _format_to_bytes(json_path, constraint_encoding, indent=0)
+                out.write_bytes(b'{"source":' + serialization.dumps(filename, indent=0) + b',"data":' + data + b'}')
+                results.append((filename, "Success"))
+            except Exception as e:
+                import traceback
+                results.append((filename, f"Error: {e}\n{traceback.format_exc()}"))
+    return results, os.getpid(), time.perf_counter() - start_time
+
 def main():
-    config = load_config()
+    parser = argparse.ArgumentParser(description="Convert raw layout JSON files into the ML-ready graph format.")
+    parser.add_argument("--config", type=str, default='config.yaml', help="Path to the YAML config file.")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(), help="Number of worker processes.")
+    parser.add_argument("--chunksize", type=int, default=0,
+                        help="Files per worker task. 0 picks a size from the file and worker counts.")
+    parser.add_argument("--aggregate", action='store_true',
+                        help="Write one JSON Lines file per chunk instead of one file per layout.")
+    parser.add_argument("--constraint-encoding", choices=['clique', 'hyperedge'], default=None,
+                        help="Encoding of alignment/group constraints. Defaults to ml_format_settings.constraint_encoding.")
+    parser.add_argument("--no-cache", action='store_true', help="Ignore cache_settings and always re-format every file.")
+    args = parser.parse_args()
+    # 進度列只在主行程使用，子行程匯入本模組時不需載入
+    from tqdm import tqdm
+
+    config = load_config(args.config)
+    serialization_options = serialization.configure(**config.get('serialization_settings', {}))
     path_settings = config['path_settings']
+    constraint_encoding = args.constraint_encoding or config.get('ml_format_settings', {}).get('constraint_encoding', 'clique')
     input_dir = path_settings['raw_output_directory']
     output_dir = path_settings['ml_ready_output_directory']
+    cache_settings = None if args.no_cache else config.get('cache_settings')
     
-    print(f"讀取設定檔: '{os.path.abspath('config.yaml')}'")
+    print(f"讀取設定檔: '{os.path.abspath(args.config)}'")
     print(f"輸入目錄 (raw layouts): '{input_dir}'")
     print(f"輸出目錄 (ML-ready): '{output_dir}'")
     
@@ -160,29 +301,46 @@ def main():
         print("請先執行 main.py 來生成原始佈局檔案。")
         return
 
-    json_files = [os.path.join(input_dir, f) for f in os.listdir(input_dir) if f.endswith('.json')]
+    # 與舊版相同處理資料夾中所有的 *.json (另外包含虛擬合併清單指向的樣本)
+    json_files = list_layout_files(input_dir, include_other_json=True)
+    workers = max(1, args.workers)
+    chunksize = args.chunksize if args.chunksize > 0 else max(1, min(256, len(json_files) // (workers * 4)))
+    batches = [(idx, json_files[i:i + chunksize]) for idx, i in enumerate(range(0, len(json_files), chunksize))]
     
-    print(f"\n找到 {len(json_files)} 個原始佈局檔案。開始預處理...")
-    worker_func = functools.partial(format_one_file, output_dir=output_dir)
+    print(f"\n找到 {len(json_files)} 個原始佈局檔案。開始預處理 (workers={workers}, chunksize={chunksize})...")
+    print(f"約束編碼方式: {constraint_encoding}, JSON 後端: {serialization.resolve_backend()}")
+    worker_func = functools.partial(format_file_batch, output_dir=output_dir, aggregate=args.aggregate,
+                                    constraint_encoding=constraint_encoding)
 
     success_count = 0
     fail_count = 0
+    worker_stats = defaultdict(lambda: [0, 0, 0.0])
+    start_time = time.perf_counter()
     
-    with multiprocessing.Pool(processes=multiprocessing.cpu_count()) as pool:
-        results = tqdm(pool.imap_unordered(worker_func, json_files), total=len(json_files))
-        
+    with multiprocessing.Pool(processes=workers, initializer=_init_worker,
+                              initargs=(serialization_options['backend'], serialization_options['indent'], cache_settings)) as pool, \
+            tqdm(total=len(json_files)) as progress:
         print("\n預處理與寫入已在子行程中同步進行...")
-        for filename, status in results:
-            if status == "Success":
-                success_count += 1
-            else:
-                fail_count += 1
-                print(f"--- 檔案處理失敗: {filename} ---\n{status}\n--------------------")
+        for results, pid, elapsed in pool.imap_unordered(worker_func, batches):
+            stats = worker_stats[pid]
+            stats[0] += 1; stats[1] += len(results); stats[2] += elapsed
+            for filename, status in results:
+                if status == "Success":
+                    success_count += 1
+                else:
+                    fail_count += 1
+                    print(f"--- 檔案處理失敗: {filename} ---\n{status}\n--------------------")
+            progress.update(len(results))
+    wall_time = time.perf_counter() - start_time
 
     print(f"\n處理完成。")
     print(f"成功: {success_count} 個檔案")
     print(f"失敗: {fail_count} 個檔案")
+    print(f"總耗時: {wall_time:.2f} 秒 ({wall_time / max(1, len(json_files)) * 1000:.2f} ms/檔案)")
+    print("各工作行程統計:")
+    for pid, (num_batches, num_files, busy) in sorted(worker_stats.items()):
+        print(f"  - PID {pid}: {num_batches} 批, {num_files} 個檔案, 處理 {busy:.2f} 秒 ({busy / max(1, num_files) * 1000:.2f} ms/檔案)")
     print(f"所有格式化資料已儲存至 '{output_dir}'")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
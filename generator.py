@@ -4,8 +4,15 @@ import random
 import copy
 import math
 import time
+import os
+import pickle
+import numpy as np
 from layout import Rectangle, Layout
 
+CHECKPOINT_VERSION = 1
+# 可註冊的生成迴圈事件；回呼的簽名為 callback(generator, rects, **info)
+HOOK_EVENTS = ('iteration_start', 'iteration_end', 'growth_accepted', 'rollback', 'shake', 'infill', 'legalization')
+
 class QuadTree:
     def __init__(self, boundary, capacity=4):
         self.boundary = boundary
@@ -45,8 +52,75 @@ class QuadTree:
         return found
 
 class LayoutGenerator:
-    def __init__(self, params):
+    def __init__(self, params, checkpoint_path=None, checkpoint_every=0, checkpoint_extra=None):
+        """
+        checkpoint_path / checkpoint_every: 每完成 N 輪迭代就把迴圈狀態寫入檢查點檔案 (0 代表不寫)。
+        checkpoint_extra: 呼叫端需要一併保存的額外資料 (例如 main.py 的對齊約束與引腳編號)。
+        """
         self.params = params
+        self.checkpoint_path, self.checkpoint_every = checkpoint_path, checkpoint_every
+        self.checkpoint_extra = checkpoint_extra or {}
+        self._resume_state = None
+        self.hooks = {event: [] for event in HOOK_EVENTS}
+        if checkpoint_path and checkpoint_every:
+            self.add_hook('iteration_end', self._checkpoint_hook)
+
+    def add_hook(self, event, callback):
+        """
+        註冊生成迴圈事件的回呼 callback(generator, rects, **info)，info 中的 iteration 為已開始/完成的輪數 (從 1 起算)。
+        rollback / shake / infill / legalization 會在動作前後各觸發一次 (phase='before' / 'after')；
+        未註冊任何回呼時，迴圈中只多出一次空串列判斷。
+        """
+        if event not in self.hooks:
+            raise ValueError(f"未知的事件 '{event}'，可用的事件: {HOOK_EVENTS}")
+        self.hooks[event].append(callback)
+        return callback
+
+    def remove_hook(self, event, callback):
+        self.hooks[event].remove(callback)
+
+    def _emit(self, event, rects, **info):
+        for callback in self.hooks[event]:
+            callback(self, rects, **info)
+
+    def _checkpoint_hook(self, generator, rects, iteration, stagnation_counter, shakes_since_last_infill, infill_triggered_count,
+                         finished=False, **_):
+        # 迴圈在這一輪提前結束時不寫檢查點：從這裡接續會多跑下一輪，與未中斷的結果不同
+        if not finished and iteration % self.checkpoint_every == 0:
+            self.save_checkpoint(rects, iteration, stagnation_counter, shakes_since_last_infill, infill_triggered_count)
+
+    def save_checkpoint(self, rects, iteration, stagnation_counter, shakes_since_last_infill, infill_triggered_count):
+        """以暫存檔 + os.replace 原子地寫出檢查點，中途中斷也不會留下損壞的檔案。"""
+        state = {
+            "version": CHECKPOINT_VERSION,
+            "params": {k: v for k, v in self.params.items() if k != 'initial_rects'},
+            "rects": rects, "iteration": iteration,
+            "stagnation_counter": stagnation_counter,
+            "shakes_since_last_infill": shakes_since_last_infill,
+            "infill_triggered_count": infill_triggered_count,
+            "random_state": random.getstate(), "np_random_state": np.random.get_state(),
+            "extra": self.checkpoint_extra,
+        }
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    @classmethod
+    def resume(cls, checkpoint_path, checkpoint_every=0):
+        """
+        由檢查點重建生成器，之後呼叫 generate() 會從中斷的迭代繼續，
+        並還原亂數狀態，使結果與未中斷的執行完全相同。
+        """
+        with open(checkpoint_path, 'rb') as f:
+            state = pickle.load(f)
+        if state.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"檢查點版本不符: {state.get('version')} (預期 {CHECKPOINT_VERSION})")
+        params = state["params"]
+        params['initial_rects'] = state["rects"]
+        generator = cls(params, checkpoint_path, checkpoint_every, state["extra"])
+        generator._resume_state = state
+        return generator
 
     def _rollback_growth(self, rects):
         print(f"--- 觸發回退！所有元件縮小 {self.params['ROLLBACK_STEPS']} 步... ---")
@@ -109,6 +183,30 @@ class LayoutGenerator:
         
         return current_rects
 
+    def _legalize(self, rects):
+        """
+        最終合法化：LEGALIZER 為 shake (預設) 時使用強制 Shake，為 compaction 時使用約束圖壓縮 (compaction.py)。
+        壓縮的收尾步驟縮小 / 移除的元件超過 COMPACTION_MAX_AREA_LOSS (可移動元件面積的比例) 或 COMPACTION_MAX_REMOVED
+        時放棄壓縮結果，改用強制 Shake，避免悄悄改變元件數與尺寸分布。
+        """
+        p = self.params
+        if p.get('LEGALIZER', 'shake') != 'compaction':
+            return self._shake_components(rects, legalize=True)
+        from compaction import compact_rects
+        print("--- 執行最終合法化 (水平 / 垂直約束圖壓縮)... ---")
+        final_rects, stats = compact_rects(rects, p['CANVAS_WIDTH'], p['CANVAS_HEIGHT'], p.get('COMPACTION_PASSES', 4),
+                                           p.get('COMPACTION_MAX_AREA_LOSS', 0.02), p.get('COMPACTION_MAX_REMOVED', 0))
+        if stats['exceeded']:
+            print(f"--- 壓縮後仍有重疊，收尾需縮小 {stats['shrunk']} 次、移除 {stats['removed']} 個元件 "
+                  f"(損失面積已達 {stats['area_lost']:.2%})，超過上限，改用強制 Shake。 ---")
+            return self._shake_components(rects, legalize=True)
+        if stats['passes'] == 0:
+            print("--- 壓縮前已無重疊。 ---")
+        else:
+            print(f"--- 壓縮在 {stats['passes']} 輪後完成 (最大位移 {stats['max_shift']:.2f})，"
+                  f"縮小 {stats['shrunk']} 次、移除 {stats['removed']} 個元件 (損失面積 {stats['area_lost']:.2%})，已無重疊。 ---")
+        return final_rects
+
     def _infill_empty_spaces(self, rects):
         num_to_add = self.params['INFILL_COMPONENT_COUNT']
         print(f"--- 觸發 In-fill！正在尋找 {num_to_add} 個空白點... ---")
@@ -141,16 +239,46 @@ class LayoutGenerator:
         print(f"--- 成功加入 {len(new_points)} 個新元件！ ---")
         return rects, True
 
+    def _density(self, rects):
+        """
+        生長迴圈的停止條件使用的密度。預設為全部元件面積 / 畫布面積；params 中有 DENSITY_REGION (x0, y0, x1, y1) 時
+        只計算元件落在該區域內的面積 / 區域面積 (分塊生成時每個區塊只以自己的核心區域衡量，邊界帶由鄰近區塊負責)。
+        """
+        p = self.params
+        region = p.get('DENSITY_REGION')
+        if region is None:
+            return sum(r.w * r.h for r in rects) / (p['CANVAS_WIDTH'] * p['CANVAS_HEIGHT'])
+        x0, y0, x1, y1 = region
+        covered = sum(max(0.0, min(x1, r.x + r.w / 2) - max(x0, r.x - r.w / 2)) *
+                      max(0.0, min(y1, r.y + r.h / 2) - max(y0, r.y - r.h / 2)) for r in rects)
+        return covered / ((x1 - x0) * (y1 - y0))
+
     def generate(self):
         p = self.params
-        print("開始生成佈局...")
+        state, self._resume_state = self._resume_state, None
+        if state is None:
+            print("開始生成佈局...")
+            rects = p.get('initial_rects', [])
+            start_iteration, stagnation_counter, shakes_since_last_infill, infill_triggered_count = 0, 0, 0, 0
+        else:
+            print(f"從檢查點恢復生成 (自第 {state['iteration'] + 1} 輪繼續)...")
+            rects, start_iteration = state['rects'], state['iteration']
+            stagnation_counter = state['stagnation_counter']
+            shakes_since_last_infill = state['shakes_since_last_infill']
+            infill_triggered_count = state['infill_triggered_count']
+            random.setstate(state['random_state']); np.random.set_state(state['np_random_state'])
         start_time = time.time()
+        hooks = self.hooks
+        on_iteration_start, on_iteration_end, on_growth = hooks['iteration_start'], hooks['iteration_end'], hooks['growth_accepted']
+
+        def emit_iteration_end(iteration, density, finished=False):
+            # finished=True 代表迴圈在這一輪因達到目標密度或停滯而提前結束
+            self._emit('iteration_end', rects, iteration=iteration, density=density, stagnation_counter=stagnation_counter,
+                       shakes_since_last_infill=shakes_since_last_infill, infill_triggered_count=infill_triggered_count,
+                       finished=finished)
         
-        rects = p.get('initial_rects', [])
-        
-        stagnation_counter, shakes_since_last_infill, infill_triggered_count = 0, 0, 0
-        
-        for i in range(p['MAX_ITERATIONS']):
+        for i in range(start_iteration, p['MAX_ITERATIONS']):
+            if on_iteration_start: self._emit('iteration_start', rects, iteration=i + 1)
             changed_this_iteration = False
             movable_rects = [r for r in rects if not r.fixed]
             random.shuffle(movable_rects)
@@ -174,24 +302,42 @@ class LayoutGenerator:
                     r.x, r.y, r.w, r.h = original_x, original_y, original_w, original_h
                 else:
                     changed_this_iteration = True
+                    if on_growth: self._emit('growth_accepted', rects, iteration=i + 1, rect=r, direction=direction)
             
-            current_density = sum(r.w * r.h for r in rects) / (p['CANVAS_WIDTH'] * p['CANVAS_HEIGHT'])
+            current_density = self._density(rects)
             if (i + 1) % 50 == 0: print(f"迭代 {i+1} | 密度: {current_density:.3%} | ...")
-            if current_density >= p['TARGET_DENSITY']: print(f"\n已達到目標密度 {p['TARGET_DENSITY']:.2%}"); break
+            if current_density >= p['TARGET_DENSITY']:
+                print(f"\n已達到目標密度 {p['TARGET_DENSITY']:.2%}")
+                if on_iteration_end: emit_iteration_end(i + 1, current_density, finished=True)
+                break
 
             stagnation_counter = 0 if changed_this_iteration else stagnation_counter + 1
             if stagnation_counter >= p['SHAKE_TRIGGER_THRESHOLD']:
-                if stagnation_counter >= p['STAGNATION_LIMIT']: print(f"\n系統停滯超過 {p['STAGNATION_LIMIT']} 輪..."); break
+                if stagnation_counter >= p['STAGNATION_LIMIT']:
+                    print(f"\n系統停滯超過 {p['STAGNATION_LIMIT']} 輪...")
+                    if on_iteration_end: emit_iteration_end(i + 1, current_density, finished=True)
+                    break
                 if shakes_since_last_infill >= p['INFILL_TRIGGER_AFTER_N_SHAKES'] and infill_triggered_count < p['INFILL_MAX_TRIGGERS']:
+                    self._emit('infill', rects, phase='before', iteration=i + 1)
                     rects, success = self._infill_empty_spaces(rects)
                     if success: infill_triggered_count += 1; shakes_since_last_infill = 0
+                    self._emit('infill', rects, phase='after', iteration=i + 1, success=success)
                 else:
-                    rects = self._rollback_growth(rects); rects = self._shake_components(rects)
+                    self._emit('rollback', rects, phase='before', iteration=i + 1)
+                    rects = self._rollback_growth(rects)
+                    self._emit('rollback', rects, phase='after', iteration=i + 1)
+                    self._emit('shake', rects, phase='before', iteration=i + 1)
+                    rects = self._shake_components(rects)
+                    self._emit('shake', rects, phase='after', iteration=i + 1)
                     shakes_since_last_infill += 1
                 stagnation_counter = 0
+
+            if on_iteration_end: emit_iteration_end(i + 1, current_density)
                 
         print("\n生成迴圈結束，執行最後的合法化整理...")
-        final_rects = self._shake_components(rects, legalize=True)
+        self._emit('legalization', rects, phase='before')
+        final_rects = self._legalize(rects)
+        self._emit('legalization', final_rects, phase='after')
                 
         end_time = time.time()
         final_layout = Layout(p['CANVAS_WIDTH'], p['CANVAS_HEIGHT'])
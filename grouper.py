@@ -3,6 +3,8 @@
 import random
 import math
 from collections import defaultdict
+import numpy as np
+from config_compiler import draw_int
 
 class LayoutGrouper:
     def __init__(self, layout, params):
@@ -46,12 +48,16 @@ class LayoutGrouper:
         return items
 
     def create_hierarchical_groups(self):
-        if self.config['method'] != 'proximity':
-            return self.layout
+        method = self.config['method']
+        if method == 'proximity':
+            return self._create_proximity_groups()
+        if method == 'grid_hierarchy':
+            return self._create_grid_hierarchy_groups()
+        return self.layout
 
+    def _create_proximity_groups(self):
         items = self._get_placeable_items()
-        num_groups_config = self.config['num_groups_to_create']
-        num_groups_to_create = random.randint(num_groups_config['low'], num_groups_config['high'])
+        num_groups_to_create = draw_int(self.config['num_groups_to_create'])
         max_radius = self.config.get('max_search_radius', float('inf'))
 
         grouped_item_indices = set()
@@ -65,8 +71,7 @@ class LayoutGrouper:
             seed_idx = random.choice(available_indices)
             seed_item = items[seed_idx]
             
-            items_per_group_config = self.config['items_per_group']
-            items_per_group = random.randint(items_per_group_config['low'], items_per_group_config['high'])
+            items_per_group = draw_int(self.config['items_per_group'])
             num_neighbors_to_find = items_per_group - 1
             if num_neighbors_to_find <= 0: continue
 
@@ -104,4 +109,75 @@ class LayoutGrouper:
         
         self.layout.hierarchical_group_constraints = hierarchical_group_constraints
         print("--- Hierarchical grouping complete. ---")
-        return self.layout
\ No newline at end of file
+        return self.layout
+
+    def _create_grid_hierarchy_groups(self):
+        """
+        以網格分桶一次建立所有群組，並逐層放大網格形成多層階層。
+        每一層中，落在同一格且數量達到門檻的單元會合併為一個群組，
+        未被合併的單元原樣帶到下一層繼續參與分桶。
+        上層群組的約束只列出各子群組的一個代表元件 (加上直接併入的物件)，父子關係只編碼一次，
+        不會在每一層為相同的元件重複產生完整的群組連線；完整的成員關係由各元件的 grouping_path 記錄。
+        """
+        items = self._get_placeable_items()
+        if len(items) < 2:
+            return self.layout
+
+        cell_size = float(self.config.get('grid_cell_size', self.config.get('max_search_radius', 150.0)))
+        num_levels = int(self.config.get('num_levels', 1))
+        level_scale = float(self.config.get('level_scale', 2.0))
+        min_units = max(2, int(self.config.get('min_units_per_group', 2)))
+
+        item_centers = np.array([item['center'] for item in items], dtype=float)
+        rect_ids = np.array([r_id for item in items for r_id in item['rect_ids']])
+        rect_item = np.repeat(np.arange(len(items)), [len(item['rect_ids']) for item in items])
+
+        # 仍代表所屬單元出現在上層群組約束中的元件；子群組形成後只保留其第一個元件
+        rect_active = np.ones(len(rect_ids), dtype=bool)
+        item_unit = np.arange(len(items))
+        unit_centers = item_centers
+        hierarchical_group_constraints = []
+        rect_group_paths = defaultdict(list)
+        print(f"\nBuilding grid hierarchy groups (cell={cell_size:.1f}, levels={num_levels})...")
+
+        for level in range(num_levels):
+            size = cell_size * (level_scale ** level)
+            offset = np.array([random.uniform(0, size), random.uniform(0, size)])
+            cells = np.floor((unit_centers + offset) / size).astype(np.int64)
+            _, unit_cell, cell_counts = np.unique(cells, axis=0, return_inverse=True, return_counts=True)
+            unit_cell = unit_cell.ravel()
+            unit_grouped = cell_counts[unit_cell] >= min_units
+            if not unit_grouped.any():
+                break
+
+            # 被合併的單元以格子編號為新標籤，其餘單元保留自己的標籤
+            labels = np.where(unit_grouped, unit_cell, len(cell_counts) + np.arange(len(unit_cell)))
+            _, unit_next = np.unique(labels, return_inverse=True)
+            item_unit = unit_next[item_unit]
+            unit_sizes = np.bincount(item_unit)
+            unit_centers = np.stack([np.bincount(item_unit, weights=item_centers[:, 0]),
+                                     np.bincount(item_unit, weights=item_centers[:, 1])], axis=1) / unit_sizes[:, None]
+
+            group_units = np.unique(unit_next[unit_grouped])
+            rect_unit = item_unit[rect_item]
+            order = np.argsort(rect_unit, kind='stable')
+            bounds = np.searchsorted(rect_unit[order], [group_units, group_units + 1])
+            for k, (lo, hi) in enumerate(zip(*bounds)):
+                group_id = f"h_group_L{level}_{k}"
+                members = order[lo:hi]
+                active = members[rect_active[members]]
+                hierarchical_group_constraints.append(rect_ids[active].tolist())
+                rect_active[active[1:]] = False
+                for r_id in rect_ids[members].tolist():
+                    rect_group_paths[r_id].append(group_id)
+            print(f"  - Level {level}: {len(group_units)} groups (cell={size:.1f})")
+
+        for r in self.layout.rectangles:
+            path = rect_group_paths.get(r.id)
+            if path:
+                r.constraints['grouping_id'] = path[0]
+                r.constraints['grouping_path'] = path
+
+        self.layout.hierarchical_group_constraints = hierarchical_group_constraints
+        print(f"--- Hierarchical grouping complete ({len(hierarchical_group_constraints)} groups). ---")
+        return self.layout
@@ -0,0 +1,21 @@
+# id_index.py
+
+import numpy as np
+
+def index_of(keys, queries):
+    """
+    回傳 queries 中每個值在 keys 中的位置，找不到的位置為 -1。
+    ID 為稠密非負整數時直接以查表完成，否則退回排序後的二分搜尋。
+    keys 有重複時取最後一次出現的位置，與以 dict 建立 ID 對應表的結果相同。
+    """
+    if len(keys) == 0:
+        return np.full(len(queries), -1, dtype=np.int64)
+    lo, hi = keys.min(), keys.max()
+    if lo >= 0 and hi < 4 * len(keys) + 1024:
+        table = np.full(hi + 1, -1, dtype=np.int64)
+        table[keys] = np.arange(len(keys))
+        in_range = (queries >= 0) & (queries <= hi)
+        return np.where(in_range, table[np.clip(queries, 0, hi)], -1)
+    order = np.argsort(keys, kind='stable')
+    idx = np.maximum(np.searchsorted(keys[order], queries, side='right') - 1, 0)
+    return np.where(keys[order][idx] == queries, order[idx], -1)
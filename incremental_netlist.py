@@ -0,0 +1,252 @@
+# incremental_netlist.py
+
+import math
+import random
+import numpy as np
+
+class PinGrid:
+    """以均勻網格索引引腳位置的空間雜湊：每個格子記錄其中的引腳索引，支援移動、環狀最近鄰搜尋與半徑查詢。"""
+    def __init__(self, pos, cell_size):
+        self.cell = float(cell_size)
+        self.cells = {}
+        self.key_of = [None] * len(pos)
+        self.bounds = [math.inf, math.inf, -math.inf, -math.inf]
+        for i, (x, y) in enumerate(pos.tolist()):
+            self.insert(i, x, y)
+
+    def _key(self, x, y):
+        return (int(math.floor(x / self.cell)), int(math.floor(y / self.cell)))
+
+    def insert(self, i, x, y):
+        key = self.key_of[i] = self._key(x, y)
+        self.cells.setdefault(key, []).append(i)
+        b = self.bounds
+        b[0], b[1], b[2], b[3] = min(b[0], key[0]), min(b[1], key[1]), max(b[2], key[0]), max(b[3], key[1])
+
+    def move(self, i, x, y):
+        if self._key(x, y) == self.key_of[i]:
+            return
+        members = self.cells[self.key_of[i]]
+        members.remove(i)
+        if not members:
+            del self.cells[self.key_of[i]]
+        self.insert(i, x, y)
+
+    def ring(self, cx, cy, r):
+        """與 (cx, cy) 的切比雪夫距離恰為 r 的格子中的引腳。"""
+        if r == 0:
+            return list(self.cells.get((cx, cy), ()))
+        found = []
+        for dx in range(-r, r + 1):
+            found.extend(self.cells.get((cx + dx, cy - r), ()))
+            found.extend(self.cells.get((cx + dx, cy + r), ()))
+        for dy in range(-r + 1, r):
+            found.extend(self.cells.get((cx - r, cy + dy), ()))
+            found.extend(self.cells.get((cx + r, cy + dy), ()))
+        return found
+
+    def max_ring(self, cx, cy):
+        b = self.bounds
+        return int(max(cx - b[0], b[2] - cx, cy - b[1], b[3] - cy, 0))
+
+    def within(self, x, y, radius):
+        """所在格子與 (x, y) 的距離可能不超過 radius 的所有引腳 (呼叫端再精確過濾)。"""
+        cx, cy = self._key(x, y)
+        reach = min(int(math.ceil(radius / self.cell)), self.max_ring(cx, cy))
+        return [i for dx in range(-reach, reach + 1) for dy in range(-reach, reach + 1)
+                for i in self.cells.get((cx + dx, cy + dy), ())]
+
+class IncrementalNetlist:
+    """
+    佈局完成後的局部 Netlist 更新。建立時以空間網格索引所有引腳，並推得每個引腳的最近鄰 (階段 1)
+    與 K-最近鄰候選 (階段 2，依 (距離, 索引) 排序，與 Layout.generate_edges 的定義相同)。
+    update(moved_rects) 只查詢受影響的引腳，成本與變動的規模成正比：
+      - 移動元件的引腳的所有連線都會移除，再依新位置重新建立 (階段 2 重新抽取亂數)；
+      - 最近鄰改變的引腳補上新的最近鄰連線，不再有任何依據的舊最近鄰連線會被移除；
+      - 候選清單改變的引腳，對新進入的候選抽取一次亂數，對離開且雙方都不再列為候選的階段 2 連線則移除。
+    """
+    def __init__(self, layout, p_max, decay_rate, max_length_limit, k_neighbors, cell_size=None):
+        self.layout = layout
+        self.p_max, self.decay_rate = p_max, decay_rate
+        self.max_length, self.k = max_length_limit, k_neighbors
+        self.pins = [pin for r in layout.rectangles for pin in r.pins]
+        self.index_of = {pin.id: i for i, pin in enumerate(self.pins)}
+        self.pos = np.array([pin.get_absolute_pos() for pin in self.pins], dtype=float).reshape(-1, 2)
+        self.rect = np.array([pin.parent_rect.id for pin in self.pins], dtype=np.int64)
+        if cell_size is None:
+            # 平均每格約 4 個引腳
+            cell_size = 2 * math.sqrt(layout.canvas_width * layout.canvas_height / max(len(self.pins), 1))
+        self.grid = PinGrid(self.pos, cell_size)
+
+        num_pins = len(self.pins)
+        self.nn = np.full(num_pins, -1, dtype=np.int64)
+        self.nn_dist = np.full(num_pins, math.inf)
+        self.topk = [[] for _ in range(num_pins)]
+        self.kth = np.full(num_pins, float(max_length_limit))
+        self.nn_rev = {}
+        self.topk_rev = {}
+        for i in range(num_pins):
+            self._set_nn(i, *self._nearest(i))
+            self._set_topk(i, self._candidates(i))
+        self.max_nn = float(self.nn_dist[np.isfinite(self.nn_dist)].max()) if np.isfinite(self.nn_dist).any() else 0.0
+
+        # 既有連線中屬於候選關係的視為階段 2 連線；其餘 (最近鄰或外部加入的) 只在端點移動時才會被移除
+        self.adjacency = {i: set() for i in range(num_pins)}
+        self.edge_set, self.knn_edges = set(), set()
+        for a_id, b_id in layout.edges:
+            a, b = self.index_of.get(a_id), self.index_of.get(b_id)
+            if a is None or b is None:
+                continue
+            self._link(a, b)
+            if b in self.topk[a] or a in self.topk[b]:
+                self.knn_edges.add(self._pair(a, b))
+
+    @classmethod
+    def from_params(cls, layout, params, cell_size=None):
+        return cls(layout, params['EDGE_P_MAX'], params['EDGE_DECAY_RATE'], params['MAX_WIRELENGTH_LIMIT'],
+                   params['EDGE_K_NEAREST_NEIGHBORS'], cell_size)
+
+    # --- 空間查詢 ---
+    def _search(self, i, k, metric, limit):
+        """以網格由內向外逐環搜尋，回傳 (距離, 索引) 排序後的前 k 個、距離 < limit 的其他元件引腳。"""
+        cx, cy = self.grid.key_of[i]
+        max_ring = self.grid.max_ring(cx, cy)
+        found, best = [], []
+        for r in range(max_ring + 1):
+            ring = self.grid.ring(cx, cy, r)
+            if ring:
+                found.extend(ring)
+                js = np.array(found, dtype=np.int64)
+                js = js[self.rect[js] != self.rect[i]]
+                d = self._distance(i, js, metric)
+                keep = d < limit
+                js, d = js[keep], d[keep]
+                order = np.lexsort((js, d))[:k]
+                best = list(zip(d[order].tolist(), js[order].tolist()))
+            # 網格外圈的引腳與 i 的距離一定大於 r * cell
+            reach = r * self.grid.cell
+            if (len(best) >= k and best[-1][0] <= reach) or reach >= limit:
+                break
+        return best
+
+    def _distance(self, i, js, metric):
+        dx = self.pos[i, 0] - self.pos[js, 0]
+        dy = self.pos[i, 1] - self.pos[js, 1]
+        return np.hypot(dx, dy) if metric == 'euclidean' else np.abs(dx) + np.abs(dy)
+
+    def _nearest(self, i):
+        best = self._search(i, 1, 'euclidean', math.inf)
+        return (best[0][1], best[0][0]) if best else (-1, math.inf)
+
+    def _candidates(self, i):
+        return self._search(i, self.k, 'manhattan', self.max_length) if self.k > 0 else []
+
+    def _affected(self, i, values, metric, radius):
+        """移動後的引腳 i 會擠進哪些引腳的最近鄰 / 候選範圍：距離小於該引腳目前的門檻值 values[p]。"""
+        x, y = self.pos[i].tolist()
+        js = np.array(self.grid.within(x, y, radius), dtype=np.int64)
+        if len(js) == 0:
+            return []
+        js = js[self.rect[js] != self.rect[i]]
+        return js[self._distance(i, js, metric) <= values[js]].tolist()
+
+    # --- 狀態維護 ---
+    def _set_nn(self, i, j, dist):
+        old = int(self.nn[i])
+        if old >= 0:
+            self.nn_rev[old].discard(i)
+        self.nn[i], self.nn_dist[i] = j, dist
+        if j >= 0:
+            self.nn_rev.setdefault(j, set()).add(i)
+        return old
+
+    def _set_topk(self, i, best):
+        old = self.topk[i]
+        for j in old:
+            self.topk_rev[j].discard(i)
+        self.topk[i] = [j for _, j in best]
+        for j in self.topk[i]:
+            self.topk_rev.setdefault(j, set()).add(i)
+        self.kth[i] = best[-1][0] if len(best) >= self.k else self.max_length
+        return old
+
+    @staticmethod
+    def _pair(a, b):
+        return (a, b) if a < b else (b, a)
+
+    def _link(self, a, b):
+        if b in self.adjacency[a]:
+            return False
+        self.adjacency[a].add(b); self.adjacency[b].add(a)
+        self.edge_set.add(tuple(sorted((self.pins[a].id, self.pins[b].id))))
+        return True
+
+    def _unlink(self, a, b):
+        if b not in self.adjacency[a]:
+            return False
+        self.adjacency[a].discard(b); self.adjacency[b].discard(a)
+        self.edge_set.discard(tuple(sorted((self.pins[a].id, self.pins[b].id))))
+        self.knn_edges.discard(self._pair(a, b))
+        return True
+
+    def _justified(self, a, b):
+        if self.nn[a] == b or self.nn[b] == a:
+            return True
+        return self._pair(a, b) in self.knn_edges and (b in self.topk[a] or a in self.topk[b])
+
+    # --- 公開介面 ---
+    def update(self, moved_rects):
+        """
+        在 moved_rects 的位置已改變 (引腳的相對位置不變) 之後更新連線，並寫回 layout.edges。
+        回傳 {"moved_pins", "touched_pins", "added", "removed"} 統計。
+        """
+        moved = sorted(self.index_of[pin.id] for r in moved_rects for pin in r.pins)
+        moved_set = set(moved)
+        removed = added = 0
+        for i in moved:
+            self.pos[i] = self.pins[i].get_absolute_pos()
+            self.grid.move(i, *self.pos[i].tolist())
+        for i in moved:
+            for j in list(self.adjacency[i]):
+                removed += self._unlink(i, j)
+
+        # 受影響的引腳：移動的引腳、以它們為最近鄰 / 候選的引腳，以及被它們的新位置擠進範圍的引腳
+        dirty_nn, dirty_knn = set(moved), set(moved)
+        for i in moved:
+            dirty_nn.update(self.nn_rev.get(i, ()))
+            dirty_knn.update(self.topk_rev.get(i, ()))
+            dirty_nn.update(self._affected(i, self.nn_dist, 'euclidean', self.max_nn))
+            dirty_knn.update(self._affected(i, self.kth, 'manhattan', self.max_length))
+
+        # 階段 1：重新計算最近鄰，補上新的最近鄰連線，移除失去依據的舊連線
+        stale = []
+        for i in sorted(dirty_nn):
+            j, dist = self._nearest(i)
+            old = self._set_nn(i, j, dist)
+            if dist < math.inf:
+                self.max_nn = max(self.max_nn, dist)
+            if j >= 0:
+                added += self._link(i, j)
+            if old >= 0 and old != j:
+                stale.append((i, old))
+
+        # 階段 2：新進入候選清單 (或端點移動過) 的候選對抽取一次亂數；離開清單的階段 2 連線失去依據時移除
+        for i in sorted(dirty_knn):
+            best = self._candidates(i)
+            old = self._set_topk(i, best)
+            if i in moved_set:
+                old = []  # 移動的引腳已沒有任何連線，所有候選都重新抽取
+            for dist, j in best:
+                if j in old and j not in moved_set:
+                    continue
+                if random.random() < self.p_max * math.exp(-self.decay_rate * dist):
+                    added += self._link(i, j)
+                    self.knn_edges.add(self._pair(i, j))
+            stale.extend((i, j) for j in old if j not in self.topk[i])
+
+        for a, b in stale:
+            if b in self.adjacency[a] and not self._justified(a, b):
+                removed += self._unlink(a, b)
+
+        self.layout.edges = list(self.edge_set)
+        return {"moved_pins": len(moved), "touched_pins": len(dirty_nn | dirty_knn), "added": added, "removed": removed}
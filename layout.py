@@ -2,6 +2,8 @@
 
 import random
 import math
+import numpy as np
+from parallel_netlist import knn_candidates, nearest_neighbors, pin_arrays, sample_pin_offsets
 
 class Pin:
     def __init__(self, pin_id, parent_rect, rel_pos):
@@ -32,10 +34,26 @@ class Layout:
     def get_density(self):
         return sum(r.w * r.h for r in self.rectangles) / (self.canvas_width * self.canvas_height)
 
-    def generate_pins(self, k, p, start_pin_id=0, pin_edge_margin_ratio=0.1):
+    def generate_pins(self, k, p, start_pin_id=0, pin_edge_margin_ratio=0.1, chunk_size=None, workers=1):
+        """
+        為尚無引腳的元件取樣引腳。chunk_size 為 None 時逐一以 random 模組取樣；
+        否則改用分塊的向量化取樣 (亂數流由 random 模組抽出的種子衍生，結果與 workers 無關)。
+        """
         print(f"\n為剩餘元件生成引腳 (k={k:.3f}, p={p:.3f})...")
         pin_global_id = start_pin_id
         new_pins_count = 0
+        if chunk_size:
+            todo = [r for r in self.rectangles if not r.pins]
+            sizes = np.array([(r.w, r.h) for r in todo], dtype=float).reshape(-1, 2)
+            counts, offsets = sample_pin_offsets(sizes, k, p, pin_edge_margin_ratio, random.getrandbits(64), chunk_size, workers)
+            offsets = offsets.tolist()
+            for r, count in zip(todo, counts.tolist()):
+                for rel_pos in offsets[new_pins_count:new_pins_count + count]:
+                    r.pins.append(Pin(pin_global_id, r, tuple(rel_pos)))
+                    pin_global_id += 1
+                new_pins_count += count
+            print(f"為剩餘元件生成了 {new_pins_count} 個新引腳。")
+            return
         for r in self.rectangles:
             if r.pins: continue
             area = r.w * r.h
@@ -55,49 +73,37 @@ class Layout:
                 new_pins_count += 1
         print(f"為剩餘元件生成了 {new_pins_count} 個新引腳。")
 
-    def generate_edges(self, p_max, decay_rate, max_length_limit, k_neighbors):
-        """採用兩階段+K最近鄰策略生成引腳之間的連線。"""
+    def generate_edges(self, p_max, decay_rate, max_length_limit, k_neighbors, workers=1, backend='thread'):
+        """
+        採用兩階段+K最近鄰策略生成引腳之間的連線。距離搜尋以 NumPy 分塊計算 (workers > 1 時分給執行緒池，
+        backend='process' 時改用共享記憶體的行程池)，
+        機率性連接的亂數仍依引腳順序抽取，因此結果與 workers 無關。
+        """
         print(f"\n開始生成 Netlist 連線 (K={k_neighbors})...")
         all_pins = [pin for r in self.rectangles for pin in r.pins]
         if len(all_pins) < 2:
             self.edges = []
             return
+        pos, parent = pin_arrays(all_pins)
+        pin_ids = [pin.id for pin in all_pins]
 
         edge_set = set()
         print("  - 階段 1: 最近鄰連接...")
-        for i, pin1 in enumerate(all_pins):
-            min_dist, nearest_pin = float('inf'), None
-            for j, pin2 in enumerate(all_pins):
-                if i == j or pin1.parent_rect.id == pin2.parent_rect.id: continue
-                pos1, pos2 = pin1.get_absolute_pos(), pin2.get_absolute_pos()
-                distance = math.hypot(pos1[0] - pos2[0], pos1[1] - pos2[1])
-                if distance < min_dist:
-                    min_dist, nearest_pin = distance, pin2
-            if nearest_pin:
-                edge_set.add(tuple(sorted((pin1.id, nearest_pin.id))))
+        for i, j in enumerate(nearest_neighbors(pos, parent, workers, backend).tolist()):
+            if j >= 0:
+                edge_set.add(tuple(sorted((pin_ids[i], pin_ids[j]))))
 
         initial_edge_count = len(edge_set)
         print(f"  - 階段 1 完成，生成了 {initial_edge_count} 條基礎連線。")
         
         print(f"  - 階段 2: K-最近鄰機率性連接 (K={k_neighbors})...")
-        for pin1 in all_pins:
-            neighbors = []
-            for pin2 in all_pins:
-                if pin1.id == pin2.id or pin1.parent_rect.id == pin2.parent_rect.id:
-                    continue
-                pos1 = pin1.get_absolute_pos()
-                pos2 = pin2.get_absolute_pos()
-                distance = abs(pos1[0] - pos2[0]) + abs(pos1[1] - pos2[1])
-                if distance < max_length_limit:
-                    neighbors.append((distance, pin2))
-            
-            neighbors.sort(key=lambda x: x[0])
-            
-            for dist, pin2 in neighbors[:k_neighbors]:
+        candidates = knn_candidates(pos, parent, max_length_limit, k_neighbors, workers, backend)
+        for i, (distances, neighbors) in enumerate(candidates):
+            for dist, j in zip(distances, neighbors):
                 prob = p_max * math.exp(-decay_rate * dist)
                 if random.random() < prob:
-                    edge_set.add(tuple(sorted((pin1.id, pin2.id))))
+                    edge_set.add(tuple(sorted((pin_ids[i], pin_ids[j]))))
 
         self.edges = list(edge_set)
         print(f"  - 階段 2 完成，新增了 {len(self.edges) - initial_edge_count} 條增補連線。")
-        print(f"Netlist 生成完畢，總共 {len(self.edges)} 條連線。")
\ No newline at end of file
+        print(f"Netlist 生成完畢，總共 {len(self.edges)} 條連線。")
@@ -4,30 +4,23 @@ import random
 import numpy as np
 import yaml
 import os
-import json
+import serialization
 import time
+from cache import ResultCache, layout_cache_key, patch_cached_layout
+from config_compiler import ConfigError, compile_config
 from generator import LayoutGenerator
 from layout import Layout, Rectangle
 from symmetry import SymmetricGenerator
 from alignment import AlignmentGenerator
 from grouper import LayoutGrouper
+from occupancy import OccupancyMap
+from parallel_netlist import resolve_workers
+from acceptance import AcceptanceStats, check_netlist, check_placement, retry_seed
 
 def load_config(path='config.yaml'):
     with open(path, 'r', encoding='utf-8') as f:
         return yaml.safe_load(f)
 
-def get_randomized_params(config):
-    params = config['base_params'].copy()
-    for key, value in config.items():
-        if isinstance(value, dict):
-            params.setdefault(key, value.copy())
-    for key, rule in config.get('randomize_params', {}).items():
-        if rule['type'] == 'randint':
-            params[key] = random.randint(rule['low'], rule['high'])
-        elif rule['type'] == 'uniform':
-            params[key] = random.uniform(rule['low'], rule['high'])
-    return params
-
 def save_layout_to_json(layout, params, filepath):
     layout_data = {
         "canvas_width": layout.canvas_width, "canvas_height": layout.canvas_height,
@@ -44,16 +37,197 @@ def save_layout_to_json(layout, params, filepath):
     if 'initial_rects' in params:
         del params['initial_rects']
     full_data = { "generation_params": params, "layout_data": layout_data }
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(full_data, f, ensure_ascii=False, indent=2)
+    data = serialization.dumps(full_data)
+    with open(filepath, 'wb') as f:
+        f.write(data)
+    return data
+
+def place_constrained_groups(params, placed_rects, occupancy=None):
+    """放置預先約束的群組 (對稱、對齊)，回傳 (對齊約束, 最後的元件編號, 最後的引腳編號)。"""
+    alignment_constraints = []
+    last_id, last_pin_id = -1, 0
+    if occupancy is None:
+        occupancy = OccupancyMap(params['CANVAS_WIDTH'], params['CANVAS_HEIGHT'], params.get('OCCUPANCY_CELL_SIZE', 4.0))
+    
+    if params.get('analog_symmetry_settings', {}).get('enable', False):
+        sym_gen = SymmetricGenerator(params)
+        _, last_id, last_pin_id = sym_gen.generate_analog_groups(
+            start_id=0, start_pin_id=0, existing_rects=placed_rects, occupancy=occupancy)
+    
+    if params.get('alignment_settings', {}).get('enable', False):
+        align_gen = AlignmentGenerator(params)
+        _, new_constraints, last_id = align_gen.generate_aligned_sets(
+            start_id=last_id + 1, existing_rects=placed_rects, occupancy=occupancy)
+        alignment_constraints.extend(new_constraints)
+    return alignment_constraints, last_id, last_pin_id
+
+def place_random_components(params, placed_rects, last_id, region=None):
+    """
+    依 component_types 的比例隨機放置 NUM_RECTANGLES 個不重疊的元件，回傳最後的元件編號。
+    region (x0, y0, x1, y1) 限制元件中心的範圍 (例如分塊生成時只放在區塊的核心區域)，預設為整個畫布。
+    """
+    print(f"\n--- 開始生成 {params['NUM_RECTANGLES']} 個隨機 Macro 和 Standard Cell ---")
+    component_definitions = params.get('component_types', {})
+    types_to_generate = []
+    total_random_rects = params['NUM_RECTANGLES']
+    for type_name, definition in component_definitions.items():
+        count = int(total_random_rects * definition.get('proportion', 0))
+        types_to_generate.extend([type_name] * count)
+    while len(types_to_generate) < total_random_rects:
+        types_to_generate.append('std_cell')
+    random.shuffle(types_to_generate)
+
+    x_lo, y_lo, x_hi, y_hi = region if region else (0, 0, params['CANVAS_WIDTH'], params['CANVAS_HEIGHT'])
+    for component_type in types_to_generate:
+        type_def = component_definitions.get(component_type)
+        if not type_def: continue
+        for _ in range(500):
+            w, h = random.uniform(*type_def['width_range']), random.uniform(*type_def['height_range'])
+            prob = random.uniform(*type_def['growth_prob_range'])
+            rand_x = random.uniform(max(x_lo, w/2), min(x_hi, params['CANVAS_WIDTH'] - w/2))
+            rand_y = random.uniform(max(y_lo, h/2), min(y_hi, params['CANVAS_HEIGHT'] - h/2))
+            temp_rect = Rectangle(None, rand_x, rand_y, w, h)
+            if not any(temp_rect.intersects(r) for r in placed_rects):
+                last_id += 1
+                placed_rects.append(Rectangle(rect_id=last_id, x=rand_x, y=rand_y, w=w, h=h, growth_prob=prob, component_type=component_type))
+                break
+    return last_id
+
+def place_initial_components(params):
+    """放置預先約束的群組 (對稱、對齊) 與隨機元件，回傳 (初始矩形, 對齊約束, 最後的引腳編號)。"""
+    placed_rects = []
+    alignment_constraints, last_id, last_pin_id = place_constrained_groups(params, placed_rects)
+    place_random_components(params, placed_rects, last_id)
+    return placed_rects, alignment_constraints, last_pin_id
+
+def complete_layout(final_layout, params, alignment_constraints, last_pin_id):
+    """生長完成後的步驟：附上對齊約束、建立階層群組，並生成引腳與連線。"""
+    if not final_layout:
+        return final_layout
+    final_layout.alignment_constraints = alignment_constraints
+    if params.get('grouping_settings', {}).get('enable', False):
+        grouper = LayoutGrouper(final_layout, params)
+        final_layout = grouper.create_hierarchical_groups()
+
+    intra = params.get('intra_sample_settings', {})
+    workers = resolve_workers(intra.get('workers')) if intra.get('enable', False) else 1
+    final_layout.generate_pins(
+        k=params['PIN_DENSITY_K'], 
+        p=params['RENT_EXPONENT_P'], 
+        start_pin_id=last_pin_id,
+        pin_edge_margin_ratio=params.get('PIN_EDGE_MARGIN_RATIO', 0.1),
+        chunk_size=intra.get('chunk_size', 4096) if intra.get('enable', False) else None,
+        workers=workers
+    )
+    final_layout.generate_edges(
+        p_max=params['EDGE_P_MAX'], 
+        decay_rate=params['EDGE_DECAY_RATE'],
+        max_length_limit=params['MAX_WIRELENGTH_LIMIT'],
+        k_neighbors=params['EDGE_K_NEAREST_NEIGHBORS'],
+        workers=workers,
+        backend=intra.get('backend', 'thread')
+    )
+    return final_layout
+
+def start_generator(params, checkpoint_path=None, checkpoint_every=0):
+    """以 params['SEED'] 放置初始元件並建立生長器 (非分塊模式)；對齊約束與最後的引腳編號存放在 checkpoint_extra。"""
+    random.seed(params['SEED']); np.random.seed(params['SEED'])
+    placed_rects, alignment_constraints, last_pin_id = place_initial_components(params)
+    params['initial_rects'] = placed_rects
+    return LayoutGenerator(params, checkpoint_path, checkpoint_every,
+                           {"alignment_constraints": alignment_constraints, "last_pin_id": last_pin_id})
+
+def generate_placement(params, generator=None):
+    """
+    執行到生長與最終合法化結束 (尚未生成引腳與連線)，回傳 (佈局, 對齊約束, 最後的引腳編號)。
+    generator 為已建立或由檢查點接續的 LayoutGenerator，未提供時以 params['SEED'] 從頭開始。
+    tiling_settings.enable 時改用 TiledLayoutGenerator：只在全域放置預置群組，隨機元件由各區塊自行放置與生長。
+    """
+    if generator is None and params.get('tiling_settings', {}).get('enable', False):
+        from tiled_generator import TiledLayoutGenerator
+        random.seed(params['SEED']); np.random.seed(params['SEED'])
+        placed_rects = []
+        alignment_constraints, last_id, last_pin_id = place_constrained_groups(params, placed_rects)
+        return TiledLayoutGenerator(params).generate(placed_rects, last_id), alignment_constraints, last_pin_id
+    generator = generator or start_generator(params)
+    extra = generator.checkpoint_extra
+    return generator.generate(), extra['alignment_constraints'], extra['last_pin_id']
+
+def generate_layout(params):
+    """以 params['SEED'] 從頭執行一個樣本的完整生成流程 (不含檢查點與篩選)，回傳最終佈局。"""
+    final_layout, alignment_constraints, last_pin_id = generate_placement(params)
+    return complete_layout(final_layout, params, alignment_constraints, last_pin_id)
+
+def generate_accepted(params, acceptance=None, stats=None, generator=None, checkpoint_path=None, checkpoint_every=0):
+    """
+    生成一個樣本並套用 acceptance_settings：generate() 結束後先檢查元件數 / 密度 / 重疊，
+    未通過時直接以 retry_seed 衍生的新 SEED 重新生成，不進入引腳與連線階段；連線建立後再檢查線長範圍。
+    重試的 SEED 與次數記錄在 params['acceptance_retry']。最多重試 max_retries 次，用完仍未通過時回傳 None。
+    """
+    retry = params.get('acceptance_retry', {})
+    original_seed, attempt = retry.get('original_seed', params['SEED']), retry.get('attempt', 0)
+    while True:
+        final_layout, alignment_constraints, last_pin_id = generate_placement(params, generator)
+        if not final_layout or not acceptance:
+            return complete_layout(final_layout, params, alignment_constraints, last_pin_id)
+        rejected = check_placement(final_layout, acceptance)
+        if not rejected:
+            final_layout = complete_layout(final_layout, params, alignment_constraints, last_pin_id)
+            rejected = check_netlist(final_layout, acceptance)
+        if not rejected:
+            stats.finish(attempt + 1, accepted=True)
+            return final_layout
+        stats.reject(rejected[0])
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        if attempt >= acceptance.get('max_retries', 5):
+            print(f"--- 未通過篩選 ({rejected[1]})，已達重試上限 {attempt} 次，放棄此樣本 ---")
+            stats.finish(attempt + 1, accepted=False)
+            return None
+        attempt += 1
+        params['SEED'] = retry_seed(original_seed, attempt)
+        params['acceptance_retry'] = {"original_seed": original_seed, "attempt": attempt}
+        print(f"--- 未通過篩選 ({rejected[1]})，以新的 SEED {params['SEED']} 重試 (第 {attempt} 次) ---")
+        generator = None if params.get('tiling_settings', {}).get('enable', False) else start_generator(params, checkpoint_path, checkpoint_every)
+
+def first_attempt_params(params):
+    """還原重試前的參數 (原始 SEED)，使重試過的樣本與檢查點接續時仍使用相同的快取鍵。"""
+    retry = params.get('acceptance_retry')
+    if not retry:
+        return params
+    return {**{k: v for k, v in params.items() if k != 'acceptance_retry'}, 'SEED': retry['original_seed']}
 
 def main():
     config = load_config('config.yaml')
+    serialization.configure(**config.get('serialization_settings', {}))
     run_settings = config['run_settings']
     path_settings = config['path_settings']
     
     num_samples = run_settings['num_samples_to_generate']
+    try:
+        compiled_config = compile_config(config)
+    except ConfigError as e:
+        print(f"錯誤：{e}")
+        return
+    # 一次抽出所有樣本的參數與 SEED；設定 base_seed 時第 i 個樣本的參數只由 (base_seed, i) 決定
+    param_columns = compiled_config.sample_columns(num_samples, run_settings.get('base_seed'))
+    cache = ResultCache.from_settings(config.get('cache_settings'))
+    checkpoint_settings = config.get('checkpoint_settings', {})
+    checkpoint_every = checkpoint_settings.get('every_n_iterations', 0) if checkpoint_settings.get('enable', False) else 0
+    checkpoint_dir = checkpoint_settings.get('directory', 'checkpoints')
+    # 啟用檢查點時重新執行視為接續上次的執行：已寫出且沒有檢查點的樣本代表已完成，直接略過
+    skip_finished = checkpoint_settings.get('enable', False)
+    tiled = config.get('tiling_settings', {}).get('enable', False)
+    if tiled and checkpoint_every:
+        print("警告：分塊生成模式不支援檢查點，已停用 checkpoint_settings。")
+        checkpoint_every = 0
+    if checkpoint_every:
+        os.makedirs(checkpoint_dir, exist_ok=True)
     
+    acceptance = config.get('acceptance_settings', {})
+    acceptance = acceptance if acceptance.get('enable', False) else None
+    stats = AcceptanceStats() if acceptance else None
+
     output_dir = path_settings['raw_output_directory']
     os.makedirs(output_dir, exist_ok=True)
     print(f"原始佈局檔案將儲存至: '{output_dir}'")
@@ -62,74 +236,43 @@ def main():
         start_time, sample_id = time.time(), i + 1
         print(f"\n--- [樣本 {sample_id}/{num_samples}] 開始生成 ---")
 
-        params = get_randomized_params(config)
-        seed = random.randint(0, 2**32 - 1); params['SEED'] = seed
-        random.seed(seed); np.random.seed(seed)
-        
-        placed_rects, alignment_constraints = [], []
-        last_id, last_pin_id = -1, 0
-        
-        if params.get('analog_symmetry_settings', {}).get('enable', False):
-            sym_gen = SymmetricGenerator(params)
-            _, last_id, last_pin_id = sym_gen.generate_analog_groups(
-                start_id=0, start_pin_id=0, existing_rects=placed_rects)
-        
-        if params.get('alignment_settings', {}).get('enable', False):
-            align_gen = AlignmentGenerator(params)
-            _, new_constraints, last_id = align_gen.generate_aligned_sets(
-                start_id=last_id + 1, existing_rects=placed_rects)
-            alignment_constraints.extend(new_constraints)
-
-        print(f"\n--- 開始生成 {params['NUM_RECTANGLES']} 個隨機 Macro 和 Standard Cell ---")
-        component_definitions = params.get('component_types', {})
-        types_to_generate = []
-        total_random_rects = params['NUM_RECTANGLES']
-        for type_name, definition in component_definitions.items():
-            count = int(total_random_rects * definition.get('proportion', 0))
-            types_to_generate.extend([type_name] * count)
-        while len(types_to_generate) < total_random_rects:
-            types_to_generate.append('std_cell')
-        random.shuffle(types_to_generate)
-
-        for component_type in types_to_generate:
-            type_def = component_definitions.get(component_type)
-            if not type_def: continue
-            for _ in range(500):
-                w, h = random.uniform(*type_def['width_range']), random.uniform(*type_def['height_range'])
-                prob = random.uniform(*type_def['growth_prob_range'])
-                rand_x, rand_y = random.uniform(w/2, params['CANVAS_WIDTH'] - w/2), random.uniform(h/2, params['CANVAS_HEIGHT'] - h/2)
-                temp_rect = Rectangle(None, rand_x, rand_y, w, h)
-                if not any(temp_rect.intersects(r) for r in placed_rects):
-                    last_id += 1
-                    placed_rects.append(Rectangle(rect_id=last_id, x=rand_x, y=rand_y, w=w, h=h, growth_prob=prob, component_type=component_type))
-                    break
-        
-        params['initial_rects'] = placed_rects
-        
-        generator = LayoutGenerator(params)
-        final_layout = generator.generate()
+        output_filepath = os.path.join(output_dir, f"layout_{sample_id}.json")
+        checkpoint_path = os.path.join(checkpoint_dir, f"layout_{sample_id}.ckpt") if checkpoint_every else None
+
+        if skip_finished and os.path.exists(output_filepath) and not (checkpoint_path and os.path.exists(checkpoint_path)):
+            print(f"--- [樣本 {sample_id}] 輸出檔案已存在且沒有檢查點，略過 ---")
+            continue
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            # 上次執行在此樣本中斷：直接從檢查點接續，參數與亂數狀態都取自檢查點
+            generator = LayoutGenerator.resume(checkpoint_path, checkpoint_every)
+            params = generator.params
+            cache_key = layout_cache_key(first_attempt_params(params)) if cache else None
+        else:
+            params = compiled_config.build_params(param_columns, i)
+
+            cache_key = layout_cache_key(params) if cache else None
+            cached = cache.get(cache_key) if cache else None
+            if cached is not None:
+                with open(output_filepath, 'wb') as f:
+                    f.write(patch_cached_layout(cached, params))
+                print(f"--- [樣本 {sample_id}] 命中快取，直接寫出 (耗時: {time.time() - start_time:.2f} 秒) ---")
+                continue
+            # 分塊模式的完整流程由 generate_placement 執行
+            generator = None if tiled else start_generator(params, checkpoint_path, checkpoint_every)
+        final_layout = generate_accepted(params, acceptance, stats, generator, checkpoint_path, checkpoint_every)
         
         if final_layout:
-            final_layout.alignment_constraints = alignment_constraints
-            if params.get('grouping_settings', {}).get('enable', False):
-                grouper = LayoutGrouper(final_layout, params)
-                final_layout = grouper.create_hierarchical_groups()
-
-            final_layout.generate_pins(
-                k=params['PIN_DENSITY_K'], 
-                p=params['RENT_EXPONENT_P'], 
-                start_pin_id=last_pin_id,
-                pin_edge_margin_ratio=params.get('PIN_EDGE_MARGIN_RATIO', 0.1)
-            )
-            final_layout.generate_edges(
-                p_max=params['EDGE_P_MAX'], 
-                decay_rate=params['EDGE_DECAY_RATE'],
-                max_length_limit=params['MAX_WIRELENGTH_LIMIT'],
-                k_neighbors=params['EDGE_K_NEAREST_NEIGHBORS']
-            )
-            output_filepath = os.path.join(output_dir, f"layout_{sample_id}.json")
-            save_layout_to_json(final_layout, params, output_filepath)
+            data = save_layout_to_json(final_layout, params, output_filepath)
+            if cache:
+                cache.put(cache_key, data)
+            if checkpoint_path and os.path.exists(checkpoint_path):
+                os.remove(checkpoint_path)
             print(f"--- [樣本 {sample_id}] 生成完畢 (耗時: {time.time() - start_time:.2f} 秒) ---")
 
+    if stats:
+        print(f"\n{stats.summary()}")
+    if cache:
+        print(f"\n{cache.summary()}")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
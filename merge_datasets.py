@@ -3,64 +3,139 @@
 import os
 import shutil
 import argparse
-from tqdm import tqdm
+import serialization
 
-def merge_datasets(dir1, dir2, output_dir):
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+MANIFEST_NAME = 'merge_manifest.jsonl'
+MERGE_MODES = ('copy', 'hardlink', 'reflink', 'virtual')
+FICLONE = 0x40049409  # Linux ioctl：在支援的檔案系統 (Btrfs、XFS 等) 上建立共享資料區塊的複本
+
+def _layout_index(filename):
+    """由 layout_<N>.json 取出編號 N；格式不符時回傳 None。"""
+    if not (filename.startswith('layout_') and filename.endswith('.json')):
+        return None
+    stem = filename[len('layout_'):-len('.json')]
+    return int(stem) if stem.isdigit() else None
+
+def list_layout_files(directory, include_other_json=False):
+    """
+    列出資料集中的所有樣本，回傳依編號排序的 [(樣本檔名, 實際檔案路徑)]。
+    除了資料夾中實體的 layout_<N>.json，也包含虛擬合併清單 (merge_manifest.jsonl) 所指向的樣本。
+    include_other_json=True 時，資料夾中其他的 *.json 也列入 (依檔名排在編號樣本之後)。
+    """
+    samples = {}
+    for filename in os.listdir(directory):
+        if _layout_index(filename) is not None or (include_other_json and filename.endswith('.json')):
+            samples[filename] = os.path.join(directory, filename)
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        for entry in serialization.iter_json_lines(manifest_path):
+            samples.setdefault(entry['name'], os.path.join(entry['source'], entry['file']))
+    def sort_key(item):
+        index = _layout_index(item[0])
+        return (index is None, index or 0, item[0])
+    return sorted(samples.items(), key=sort_key)
+
+def _hardlink(src_path, dst_path):
+    if os.path.lexists(dst_path):
+        os.remove(dst_path)
+    os.link(src_path, dst_path)
+
+def _reflink(src_path, dst_path):
+    if fcntl is None:
+        raise OSError("此平台不支援 reflink")
+    with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    shutil.copystat(src_path, dst_path)
+
+LINKERS = {'copy': shutil.copy2, 'hardlink': _hardlink, 'reflink': _reflink}
+
+def merge_datasets(source_dirs, output_dir, mode='copy'):
     """
-    合併兩個生成的資料集資料夾到一個新的輸出資料夾。
+    將多個生成的資料集資料夾依序合併到輸出資料夾。與兩個來源的舊版相同，第一個來源保留原本的檔名
+    (輸出資料夾中同名的樣本會被覆寫)，其後的來源接續在目前最大編號之後重新編號。
 
     Args:
-        dir1 (str): 第一個資料來源資料夾的路徑。
-        dir2 (str): 第二個資料來源資料夾的路徑。
-        output_dir (str): 合併後要儲存的新資料夾路徑。
+        source_dirs (list[str]): 資料來源資料夾路徑 (可以是先前虛擬合併的結果)。
+        output_dir (str): 合併後的資料夾路徑。
+        mode (str): 'copy' 複製檔案；'hardlink' 建立硬連結；'reflink' 建立寫入時複製的複本；
+                    'virtual' 不建立任何樣本檔案，只寫出全域樣本編號 -> (來源資料夾, 檔名) 的清單。
+                    hardlink / reflink 無法使用時 (例如跨檔案系統) 會退回複製。
     """
+    from tqdm import tqdm
+
+    if mode not in MERGE_MODES:
+        raise ValueError(f"不支援的合併模式 '{mode}'，可用的模式: {MERGE_MODES}")
     os.makedirs(output_dir, exist_ok=True)
     print(f"輸出資料夾 '{output_dir}' 已建立。")
 
     try:
-        files1 = sorted([f for f in os.listdir(dir1) if f.startswith('layout_') and f.endswith('.json')])
-        files2 = sorted([f for f in os.listdir(dir2) if f.startswith('layout_') and f.endswith('.json')])
-        print(f"找到來源 A ('{dir1}') 中 {len(files1)} 個檔案。")
-        print(f"找到來源 B ('{dir2}') 中 {len(files2)} 個檔案。")
+        sources = [(source_dir, list_layout_files(source_dir)) for source_dir in source_dirs]
     except FileNotFoundError as e:
         print(f"錯誤：找不到指定的資料夾。請檢查路徑是否正確。 {e}")
         return
+    for source_dir, samples in sources:
+        print(f"找到來源 '{source_dir}' 中 {len(samples)} 個檔案。")
+
+    # 只在開始時掃描一次輸出資料夾，之後的編號都在記憶體中遞增
+    existing = list_layout_files(output_dir)
+    names = {name for name, _ in existing} | {name for _, samples in sources[:1] for name, _ in samples}
+    next_index = max((_layout_index(name) for name in names), default=0) + 1
+    print(f"第一個來源保留原檔名，其餘檔案將從索引 {next_index} 開始編號 (模式: {mode})。")
+
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest_entries = {}
+    if mode == 'virtual' and os.path.exists(manifest_path):
+        manifest_entries = {entry['name']: entry for entry in serialization.iter_json_lines(manifest_path)}
+    link, fallback_count = LINKERS.get(mode), 0
+
+    for source_idx, (source_dir, samples) in enumerate(sources):
+        for name, src_path in tqdm(samples, desc=f"合併 '{source_dir}'"):
+            if source_idx == 0:
+                new_filename = name
+            else:
+                new_filename = f"layout_{next_index}.json"
+                next_index += 1
+            if mode == 'virtual':
+                manifest_entries[new_filename] = {"name": new_filename, "source": os.path.abspath(os.path.dirname(src_path)),
+                                                  "file": os.path.basename(src_path)}
+                continue
+            dst_path = os.path.join(output_dir, new_filename)
+            try:
+                link(src_path, dst_path)
+            except OSError:
+                fallback_count += 1
+                shutil.copy2(src_path, dst_path)
+
+    if mode == 'virtual':
+        tmp_path = manifest_path + '.tmp'
+        with serialization.JsonLinesWriter(tmp_path) as out:
+            for entry in manifest_entries.values():
+                out.write(entry)
+        os.replace(tmp_path, manifest_path)
+        print(f"\n已寫出虛擬合併清單 '{manifest_path}' ({len(manifest_entries)} 筆)。")
+    elif fallback_count:
+        print(f"\n警告：有 {fallback_count} 個檔案無法以 {mode} 建立，已改為複製。")
 
-    print(f"\n正在複製來源 A ('{dir1}') 的檔案...")
-    for filename in tqdm(files1, desc="複製來源 A"):
-        src_path = os.path.join(dir1, filename)
-        dst_path = os.path.join(output_dir, filename)
-        shutil.copy2(src_path, dst_path)
-    
-    current_files_in_output = [f for f in os.listdir(output_dir) if f.startswith('layout_') and f.endswith('.json')]
-    start_index = 0
-    if current_files_in_output:
-        indices = [int(f.replace('layout_', '').replace('.json', '')) for f in current_files_in_output]
-        start_index = max(indices)
-
-    print(f"\n正在複製並重新編號來源 B ('{dir2}') 的檔案...")
-    print(f"檔案將從索引 {start_index + 1} 開始編號。")
-    
-    for i, filename in enumerate(tqdm(files2, desc="複製並重新編號來源 B")):
-        new_index = start_index + 1 + i
-        new_filename = f"layout_{new_index}.json"
-        
-        src_path = os.path.join(dir2, filename)
-        dst_path = os.path.join(output_dir, new_filename)
-        shutil.copy2(src_path, dst_path)
-
-    total_files = len(os.listdir(output_dir))
+    total_files = len(names) + sum(len(samples) for _, samples in sources[1:])
     print(f"\n合併完成！")
-    print(f"新的資料夾 '{output_dir}' 中總共有 {total_files} 個檔案。")
+    print(f"新的資料夾 '{output_dir}' 中總共有 {total_files} 個樣本。")
 
 def main():
-    parser = argparse.ArgumentParser(description="Merge two generated layout datasets into one.")
-    parser.add_argument("source_dir1", type=str, help="Path to the first source dataset directory.")
-    parser.add_argument("source_dir2", type=str, help="Path to the second source dataset directory.")
-    parser.add_argument("output_dir", type=str, help="Path to the new merged dataset directory.")
+    parser = argparse.ArgumentParser(description="Merge generated layout datasets into one.")
+    parser.add_argument("paths", nargs='+', metavar="dir",
+                        help="One or more source dataset directories followed by the merged output directory.")
+    parser.add_argument("--mode", choices=MERGE_MODES, default='copy',
+                        help="How samples are materialized: copy, hardlink, reflink, or a virtual manifest only.")
     args = parser.parse_args()
+    if len(args.paths) < 2:
+        parser.error("at least one source directory and the output directory are required")
 
-    merge_datasets(args.source_dir1, args.source_dir2, args.output_dir)
+    merge_datasets(args.paths[:-1], args.paths[-1], args.mode)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,121 @@
+# metrics.py
+
+import multiprocessing
+import numpy as np
+from shared_layout import SharedLayout, layout_data_arrays, layout_object_arrays, map_blocks
+
+def _geometry(arrays, canvas):
+    return {"canvas": canvas, "boxes": arrays['boxes'], "pin_pos": arrays['pin_pos'], "pin_rect": arrays['pin_rect'],
+            "src": arrays['edges'][:, 0], "dst": arrays['edges'][:, 1]}
+
+def layout_geometry(layout):
+    """
+    由記憶體中的 Layout 物件一次建立指標所需的陣列：矩形 (cx, cy, w, h)、引腳絕對座標、
+    引腳所屬矩形索引與連線兩端的引腳索引 (src, dst)。生成期間的篩選直接使用，不需先序列化。
+    """
+    return _geometry(layout_object_arrays(layout), (layout.canvas_width, layout.canvas_height))
+
+def raw_geometry(layout_data):
+    """與 layout_geometry 相同，但來源為原始 JSON 的 layout_data。"""
+    return _geometry(layout_data_arrays(layout_data), (layout_data['canvas_width'], layout_data['canvas_height']))
+
+def wirelengths(pin_pos, src, dst):
+    """每條連線的歐氏與曼哈頓線長，回傳 (euclidean, manhattan)。"""
+    delta = pin_pos[src] - pin_pos[dst]
+    return np.hypot(delta[:, 0], delta[:, 1]), np.abs(delta).sum(axis=1)
+
+def net_hpwl(pin_pos, members, starts):
+    """
+    每個 net 的半周長線長 (HPWL)。nets 以 CSR 形式給定：members 為依 net 排列的引腳索引，
+    starts 為每個 net 在 members 中的起始位置 (每個 net 至少一個引腳)。
+    """
+    if len(starts) == 0:
+        return np.zeros(0)
+    pts = pin_pos[members]
+    span = np.maximum.reduceat(pts, starts) - np.minimum.reduceat(pts, starts)
+    return span[:, 0] + span[:, 1]
+
+def edge_hpwl(pin_pos, src, dst):
+    """把每條連線視為一個兩引腳 net 的 HPWL (即兩引腳的曼哈頓距離)。"""
+    return net_hpwl(pin_pos, np.stack([src, dst], axis=1).reshape(-1), np.arange(0, 2 * len(src), 2))
+
+def rect_degree(pin_rect, src, dst, num_rects):
+    """每個矩形上的連線端點數 (兩端都在同一矩形的連線計兩次)。"""
+    return np.bincount(pin_rect[src], minlength=num_rects) + np.bincount(pin_rect[dst], minlength=num_rects)
+
+def _overlap_block(sorted_boxes, bounds, eps):
+    """依左邊界排序後的第 s..e 個矩形與其後、左邊界落在該批最大右邊界之前的矩形比較，回傳排序後的索引對。"""
+    x0, x1, y0, y1 = (sorted_boxes[k] for k in ('x0', 'x1', 'y0', 'y1'))
+    s, e = bounds
+    hi = int(np.searchsorted(x0, x1[s:e].max() - eps, side='left'))
+    if hi <= s + 1:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    cols = slice(s + 1, hi)
+    overlap_x = np.minimum(x1[s:e, None], x1[None, cols]) - np.maximum(x0[s:e, None], x0[None, cols])
+    overlap_y = np.minimum(y1[s:e, None], y1[None, cols]) - np.maximum(y0[s:e, None], y0[None, cols])
+    upper = np.arange(s, e)[:, None] < np.arange(s + 1, hi)[None, :]
+    rows, offsets = np.nonzero((overlap_x > eps) & (overlap_y > eps) & upper)
+    return rows + s, offsets + s + 1
+
+def overlapping_pairs(boxes, chunk=512, eps=1e-9, workers=1):
+    """
+    找出內部互相重疊 (不含邊界接觸) 的矩形對，回傳兩個索引陣列 (i, j)，且 i < j。
+    依左邊界排序後，每一批只與左邊界落在該批最大右邊界之前的矩形比較，記憶體用量受 chunk 限制。
+    workers > 1 時排序後的座標放進共享記憶體，各批交給行程池處理；結果與 workers 無關。
+    """
+    n = len(boxes)
+    if n < 2:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    order = np.argsort(boxes[:, 0] - boxes[:, 2] / 2, kind='stable')
+    sorted_boxes = {"x0": (boxes[:, 0] - boxes[:, 2] / 2)[order], "x1": (boxes[:, 0] + boxes[:, 2] / 2)[order],
+                    "y0": (boxes[:, 1] - boxes[:, 3] / 2)[order], "y1": (boxes[:, 1] + boxes[:, 3] / 2)[order]}
+    blocks = [(s, min(n, s + chunk)) for s in range(0, n, chunk)]
+    if workers > 1 and len(blocks) > 1 and not multiprocessing.current_process().daemon:
+        with SharedLayout.create(sorted_boxes) as shared:
+            results = map_blocks(shared, _overlap_block, blocks, workers, eps=eps)
+    else:
+        results = [_overlap_block(sorted_boxes, bounds, eps) for bounds in blocks]
+    first, second = order[np.concatenate([r[0] for r in results])], order[np.concatenate([r[1] for r in results])]
+    return np.minimum(first, second), np.maximum(first, second)
+
+def count_overlaps(boxes, chunk=512, eps=1e-9, workers=1):
+    """計算內部互相重疊 (不含邊界接觸) 的矩形對數。"""
+    return len(overlapping_pairs(boxes, chunk, eps, workers)[0])
+
+def geometry_metrics(geometry, workers=1, overlaps=True):
+    """
+    由 layout_geometry / raw_geometry 的陣列計算指標，回傳 (純量指標 dict, 逐項陣列 dict)。
+    逐項陣列包含每條連線的 wirelength (歐氏) / manhattan / hpwl 與每個矩形的 degree。
+    overlaps=False 時不計算 overlap_count (矩形數很多時這是最耗時的部分)。
+    """
+    canvas_w, canvas_h = geometry['canvas']
+    boxes, pin_pos = geometry['boxes'], geometry['pin_pos']
+    src, dst, pin_rect = geometry['src'], geometry['dst'], geometry['pin_rect']
+
+    density = float((boxes[:, 2] * boxes[:, 3]).sum() / (canvas_w * canvas_h))
+    euclid, manhattan = wirelengths(pin_pos, src, dst)
+    hpwl = edge_hpwl(pin_pos, src, dst)
+    degree = rect_degree(pin_rect, src, dst, len(boxes))
+    has_edges = len(euclid) > 0
+    wl_p50, wl_p90, wl_p99 = np.percentile(euclid, [50, 90, 99]) if has_edges else (0.0, 0.0, 0.0)
+    metrics = {"num_rects": len(boxes), "num_pins": len(pin_pos), "num_edges": len(euclid), "density": density}
+    if overlaps:
+        metrics["overlap_count"] = count_overlaps(boxes, workers=workers)
+    metrics.update({
+        "wl_total": float(euclid.sum()), "wl_mean": float(euclid.mean()) if has_edges else 0.0,
+        "wl_p50": float(wl_p50), "wl_p90": float(wl_p90), "wl_p99": float(wl_p99),
+        "hpwl_total": float(hpwl.sum()), "hpwl_mean": float(hpwl.mean()) if has_edges else 0.0,
+        "degree_mean": float(degree.mean()) if len(degree) else 0.0, "degree_max": int(degree.max()) if len(degree) else 0,
+    })
+    return metrics, {"wirelength": euclid, "manhattan": manhattan, "hpwl": hpwl, "degree": degree}
+
+def wirelength_in_band(layout, metric='wl_mean', minimum=None, maximum=None):
+    """
+    生成期間的線長篩選：在連線建立後直接由 Layout 物件計算指標 (略過重疊檢查)，
+    回傳 (是否落在 [minimum, maximum] 內, 指標值)；未設定的界限不檢查。
+    """
+    metrics, _ = geometry_metrics(layout_geometry(layout), overlaps=False)
+    if metric not in metrics:
+        raise ValueError(f"未知的線長指標 '{metric}'，可用：{', '.join(metrics)}")
+    value = metrics[metric]
+    return (minimum is None or value >= minimum) and (maximum is None or value <= maximum), value
@@ -0,0 +1,92 @@
+# occupancy.py
+
+import math
+import random
+import numpy as np
+
+class OccupancyMap:
+    """
+    以固定解析度的布林網格記錄畫布上已被佔用的區域。
+    佔用標記與查詢都採保守策略 (只要碰到格子就算佔用)，
+    因此地圖判定為空的區域，保證不會與已標記的矩形相交 (含邊界接觸)。
+    """
+    def __init__(self, canvas_w, canvas_h, cell_size=4.0):
+        self.canvas_w, self.canvas_h = canvas_w, canvas_h
+        self.cell = float(cell_size)
+        self.nx = int(math.floor(canvas_w / self.cell)) + 1
+        self.ny = int(math.floor(canvas_h / self.cell)) + 1
+        self.grid = np.zeros((self.ny, self.nx), dtype=bool)
+        # 佔用網格的積分影像，第一次 sample_free_box 時建立，之後只在 occupy 改動網格時失效
+        self._sat = None
+
+    @classmethod
+    def from_rects(cls, canvas_w, canvas_h, rects, cell_size=4.0):
+        occupancy = cls(canvas_w, canvas_h, cell_size)
+        for r in rects:
+            occupancy.occupy_rect(r)
+        return occupancy
+
+    def _cell_span(self, x0, y0, x1, y1):
+        i0 = max(0, int(math.floor(x0 / self.cell)))
+        j0 = max(0, int(math.floor(y0 / self.cell)))
+        i1 = min(self.nx - 1, int(math.floor(x1 / self.cell)))
+        j1 = min(self.ny - 1, int(math.floor(y1 / self.cell)))
+        return i0, j0, i1, j1
+
+    def occupy(self, x0, y0, x1, y1):
+        i0, j0, i1, j1 = self._cell_span(x0, y0, x1, y1)
+        if i0 <= i1 and j0 <= j1:
+            self.grid[j0:j1 + 1, i0:i1 + 1] = True
+            self._sat = None
+
+    def occupy_rect(self, r):
+        self.occupy(r.x - r.w / 2, r.y - r.h / 2, r.x + r.w / 2, r.y + r.h / 2)
+
+    def _summed_area(self):
+        if self._sat is None:
+            self._sat = np.zeros((self.ny + 1, self.nx + 1), dtype=np.int32)
+            self._sat[1:, 1:] = self.grid.cumsum(axis=0).cumsum(axis=1)
+        return self._sat
+
+    def is_free(self, x0, y0, x1, y1):
+        """檢查一個邊界框是否完全落在畫布內且未被佔用。"""
+        if x0 < 0 or y0 < 0 or x1 > self.canvas_w or y1 > self.canvas_h:
+            return False
+        i0, j0, i1, j1 = self._cell_span(x0, y0, x1, y1)
+        return not self.grid[j0:j1 + 1, i0:i1 + 1].any()
+
+    def sample_free_box(self, box_w, box_h, region=None):
+        """
+        在 region (min_x, min_y, max_x, max_y，限制邊界框左上角的範圍) 內
+        隨機挑選一個不與任何已佔用格子重疊的邊界框左上角位置。
+        以積分影像一次評估所有候選格子，找不到可行位置時回傳 None。
+        """
+        min_x, min_y, max_x, max_y = region if region else (0, 0, self.canvas_w - box_w, self.canvas_h - box_h)
+        min_x, min_y = max(min_x, 0.0), max(min_y, 0.0)
+        max_x, max_y = min(max_x, self.canvas_w - box_w), min(max_y, self.canvas_h - box_h)
+        if max_x < min_x or max_y < min_y:
+            return None
+
+        # 左上角落在格子 (i, j) 內任一點時，邊界框最多跨越 kx * ky 個格子
+        kx = int(math.floor(box_w / self.cell)) + 2
+        ky = int(math.floor(box_h / self.cell)) + 2
+        if kx > self.nx or ky > self.ny:
+            return None
+        sat = self._summed_area()
+        window = sat[ky:, kx:] - sat[:-ky, kx:] - sat[ky:, :-kx] + sat[:-ky, :-kx]
+
+        i_lo, i_hi = int(math.floor(min_x / self.cell)), int(math.floor(max_x / self.cell))
+        j_lo, j_hi = int(math.floor(min_y / self.cell)), int(math.floor(max_y / self.cell))
+        i_hi, j_hi = min(i_hi, window.shape[1] - 1), min(j_hi, window.shape[0] - 1)
+        if i_hi < i_lo or j_hi < j_lo:
+            return None
+        candidates = np.flatnonzero(window[j_lo:j_hi + 1, i_lo:i_hi + 1] == 0)
+        if candidates.size == 0:
+            return None
+
+        pick = int(candidates[random.randrange(candidates.size)])
+        j, i = divmod(pick, i_hi - i_lo + 1)
+        cell_x0, cell_y0 = (i_lo + i) * self.cell, (j_lo + j) * self.cell
+        x = random.uniform(max(cell_x0, min_x), min(cell_x0 + self.cell, max_x))
+        y = random.uniform(max(cell_y0, min_y), min(cell_y0 + self.cell, max_y))
+        return x, y
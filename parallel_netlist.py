@@ -0,0 +1,113 @@
+# parallel_netlist.py
+
+import concurrent.futures
+import multiprocessing
+import os
+import numpy as np
+
+# 距離矩陣每個區塊最多的元素數 (float64 約 32 MB)；區塊大小只影響記憶體用量，不影響結果
+MAX_BLOCK_ELEMENTS = 1 << 22
+
+def resolve_workers(workers):
+    """None 或 0 代表使用所有 CPU。"""
+    return max(1, workers or os.cpu_count() or 1)
+
+def map_chunks(func, chunks, workers=1):
+    """依區塊順序回傳 func(chunk) 的結果；workers > 1 時交給執行緒池 (NumPy 運算期間會釋放 GIL)。"""
+    if workers <= 1 or len(chunks) <= 1:
+        return [func(chunk) for chunk in chunks]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(func, chunks))
+
+def _row_blocks(num_rows, num_cols):
+    rows = max(1, MAX_BLOCK_ELEMENTS // max(num_cols, 1))
+    return [(start, min(start + rows, num_rows)) for start in range(0, num_rows, rows)]
+
+def pin_arrays(pins):
+    """回傳引腳的絕對座標 (P, 2) 與所屬元件編號 (P,)。"""
+    pos = np.array([pin.get_absolute_pos() for pin in pins], dtype=float).reshape(-1, 2)
+    parent = np.array([pin.parent_rect.id for pin in pins], dtype=np.int64)
+    return pos, parent
+
+def _distances(pos, parent, start, end, metric):
+    dx = pos[start:end, None, 0] - pos[None, :, 0]
+    dy = pos[start:end, None, 1] - pos[None, :, 1]
+    d = np.hypot(dx, dy) if metric == 'euclidean' else np.abs(dx) + np.abs(dy)
+    d[parent[start:end, None] == parent[None, :]] = np.inf
+    return d
+
+def _nearest_rows(pos, parent, start, end):
+    d = _distances(pos, parent, start, end, 'euclidean')
+    nearest = np.argmin(d, axis=1)
+    return np.where(np.isfinite(d[np.arange(len(d)), nearest]), nearest, -1)
+
+def _knn_rows(pos, parent, start, end, max_length, k):
+    d = _distances(pos, parent, start, end, 'manhattan')
+    d[d >= max_length] = np.inf
+    kk = min(k, d.shape[1])
+    kth = np.partition(d, kk - 1, axis=1)[:, kk - 1]
+    out = []
+    for row, limit in zip(d, kth):
+        idx = np.flatnonzero(row <= limit if np.isfinite(limit) else np.isfinite(row))
+        idx = idx[np.argsort(row[idx], kind='stable')][:k]
+        out.append((row[idx].tolist(), idx.tolist()))
+    return out
+
+def _shared_rows(shared, bounds, kernel, **kwargs):
+    return kernel(shared['pin_pos'], shared['pin_rect'], *bounds, **kwargs)
+
+def _map_rows(kernel, pos, parent, workers=1, backend='thread', **kwargs):
+    """
+    依列區塊執行距離核心。backend='process' 時把引腳陣列放進共享記憶體交給行程池 (不需 pickle 佈局物件)，
+    否則使用執行緒池；兩者的結果都依區塊順序合併。已在行程池的子行程中 (不能再建立子行程) 時改用執行緒池。
+    """
+    blocks = _row_blocks(len(pos), len(pos))
+    in_daemon = multiprocessing.current_process().daemon
+    if backend == 'process' and workers > 1 and len(blocks) > 1 and not in_daemon:
+        from shared_layout import SharedLayout, map_blocks
+        with SharedLayout.create({"pin_pos": pos, "pin_rect": parent}) as shared:
+            return map_blocks(shared, _shared_rows, blocks, workers, kernel=kernel, **kwargs)
+    return map_chunks(lambda bounds: kernel(pos, parent, *bounds, **kwargs), blocks, workers)
+
+def nearest_neighbors(pos, parent, workers=1, backend='thread'):
+    """
+    連線階段 1：每個引腳在其他元件上最近 (歐氏距離) 的引腳索引，距離相同時取索引最小者；
+    所有引腳都在同一個元件上時為 -1。
+    """
+    results = _map_rows(_nearest_rows, pos, parent, workers, backend)
+    return np.concatenate(results) if results else np.zeros(0, dtype=np.int64)
+
+def knn_candidates(pos, parent, max_length, k, workers=1, backend='thread'):
+    """
+    連線階段 2 的候選：每個引腳在曼哈頓距離 < max_length 內、屬於其他元件的最近 k 個引腳，
+    依 (距離, 索引) 排序。回傳每個引腳的 (距離串列, 索引串列)；是否連線的亂數仍由呼叫端依序抽取。
+    """
+    if k <= 0:
+        return [([], [])] * len(pos)
+    results = _map_rows(_knn_rows, pos, parent, workers, backend, max_length=max_length, k=k)
+    return [row for rows in results for row in rows]
+
+def sample_pin_offsets(sizes, k, p, margin_ratio, seed, chunk_size=4096, workers=1):
+    """
+    向量化的引腳取樣 (分布與 Layout.generate_pins 的逐一取樣相同)。sizes 為 (n, 2) 的元件 (w, h)，
+    元件依固定的 chunk_size 分塊，每塊使用由 (seed, 區塊編號) 衍生的亂數流，因此結果與 workers 無關。
+    回傳每個元件的引腳數 (n,) 與依元件順序排列的引腳相對座標 (總引腳數, 2)。
+    """
+    def block(index):
+        w, h = sizes[index * chunk_size:(index + 1) * chunk_size].T
+        area = w * h
+        counts = (k * area ** p).astype(np.int64)
+        counts[(area > 1) & (counts == 0)] = 1
+        hw, hh = np.repeat(w / 2, counts), np.repeat(h / 2, counts)
+        mx, my = np.minimum(2 * hw * margin_ratio, hw), np.minimum(2 * hh * margin_ratio, hh)
+        rng = np.random.default_rng(np.random.SeedSequence([seed, index]))
+        side, u, v = rng.integers(0, 4, size=len(hw)), rng.random(len(hw)), rng.random(len(hw))
+        # 0: top, 1: bottom, 2: left, 3: right；u 沿著邊取位置，v 取邊界帶內的深度
+        px = np.select([side < 2, side == 2], [-hw + 2 * hw * u, -hw + mx * v], hw - mx * v)
+        py = np.select([side == 0, side == 1], [-hh + my * v, hh - my * v], -hh + 2 * hh * u)
+        return counts, np.stack([px, py], axis=1)
+
+    results = map_chunks(block, list(range(-(-len(sizes) // chunk_size))), workers)
+    if not results:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, 2))
+    return np.concatenate([r[0] for r in results]), np.concatenate([r[1] for r in results])
@@ -0,0 +1,108 @@
+# serialization.py
+
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKENDS = ('orjson', 'json') if orjson is not None else ('json',)
+
+# 全域預設值，可由 config.yaml 的 serialization_settings 或環境變數 LAYOUT_JSON_BACKEND 覆寫
+_settings = {'backend': os.environ.get('LAYOUT_JSON_BACKEND', 'auto'), 'indent': None}
+
+def configure(backend=None, indent=None, **_):
+    """
+    設定預設的 JSON 後端 ('auto' / 'orjson' / 'json') 與縮排 (None 代表緊湊輸出)。
+    backend 為 None 或 'auto' 時，環境變數 LAYOUT_JSON_BACKEND (若有設定) 優先。
+    """
+    if backend in (None, 'auto'):
+        backend = os.environ.get('LAYOUT_JSON_BACKEND') or backend
+    if backend is not None:
+        _settings['backend'] = backend
+    _settings['indent'] = indent
+    return dict(_settings)
+
+def get_settings():
+    return dict(_settings)
+
+def resolve_backend(backend=None):
+    name = backend or _settings['backend']
+    if name == 'auto':
+        return BACKENDS[0]
+    if name not in BACKENDS:
+        raise ValueError(f"JSON 後端 '{name}' 無法使用，可用的後端: {BACKENDS}")
+    return name
+
+def _default(obj):
+    """讓 NumPy 陣列與純量等物件也能被序列化。"""
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(obj, indent=None, backend=None):
+    """
+    將物件序列化為 UTF-8 bytes。indent 未指定時使用全域設定。
+    orjson 只支援 2 格縮排，指定其他縮排時改用標準函式庫 json 輸出。
+    """
+    indent = _settings['indent'] if indent is None else indent
+    if resolve_backend(backend) == 'orjson' and indent in (None, 0, 2):
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_default, option=option)
+    if indent:
+        return json.dumps(obj, ensure_ascii=False, indent=indent, default=_default).encode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=_default).encode('utf-8')
+
+def canonical_dumps(obj):
+    """鍵排序、緊湊且與後端無關的序列化結果，用於計算雜湊 (例如快取鍵)。"""
+    return json.dumps(obj, sort_keys=True, separators=(',', ':'), default=_default).encode('utf-8')
+
+def loads(data, backend=None):
+    if resolve_backend(backend) == 'orjson':
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dump(obj, path, indent=None, backend=None):
+    with open(path, 'wb') as f:
+        f.write(dumps(obj, indent, backend))
+
+def load(path, backend=None):
+    with open(path, 'rb') as f:
+        return loads(f.read(), backend)
+
+class JsonLinesWriter:
+    """逐筆寫出 JSON Lines 檔案，不需把整批資料留在記憶體中。"""
+    def __init__(self, path, backend=None):
+        self.path, self.backend = path, backend
+        self._file = None
+        self.count = 0
+
+    def __enter__(self):
+        self._file = open(self.path, 'wb')
+        return self
+
+    def write(self, obj):
+        self._file.write(dumps(obj, indent=0, backend=self.backend))
+        self._file.write(b'\n')
+        self.count += 1
+
+    def write_bytes(self, data):
+        """寫入一筆已序列化好的單行 JSON (例如取自快取的內容)。"""
+        self._file.write(data)
+        self._file.write(b'\n')
+        self.count += 1
+
+    def __exit__(self, *exc):
+        self._file.close()
+        return False
+
+def iter_json_lines(path, backend=None):
+    """逐行讀取 JSON Lines 檔案。"""
+    with open(path, 'rb') as f:
+        for line in f:
+            if line.strip():
+                yield loads(line, backend)
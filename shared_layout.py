@@ -0,0 +1,152 @@
+# shared_layout.py
+
+import functools
+import multiprocessing
+import multiprocessing.util
+from multiprocessing import shared_memory
+import numpy as np
+from id_index import index_of
+
+# 每個陣列在共享記憶體區段中的起始位置對齊到 64 位元組
+ALIGNMENT = 64
+
+class SharedLayout:
+    """
+    把佈局的陣列 (矩形、引腳、連線，或任何具名的 NumPy 陣列) 放進同一個 multiprocessing.shared_memory 區段。
+    handle 只包含區段名稱與各陣列的 dtype / shape / 位移，可以直接傳給子行程，子行程以 attach() 取得唯讀的陣列視圖，
+    不需要 pickle 任何 Rectangle / Pin 物件，也不會為每個行程複製一份資料。
+
+    由 from_layout / from_layout_data 建立的標準欄位：
+      boxes (N, 4) 矩形 (cx, cy, w, h)、rect_ids (N,)、pin_ids (P,)、pin_rect (P,) 引腳所屬矩形的索引、
+      pin_pos (P, 2) 引腳絕對座標、edges (E, 2) 連線兩端的引腳索引 (只包含兩端都存在的連線)。
+    建立者在用完後要呼叫 unlink() (或使用 with 區塊)；關閉前須先釋放取出的陣列視圖。
+    """
+    def __init__(self, shm, fields, canvas=None, owner=False):
+        self.shm, self.fields, self.canvas, self.owner = shm, fields, canvas, owner
+        self._arrays = {}
+        for name, (dtype, shape, offset) in fields.items():
+            array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+            if not owner:
+                array.flags.writeable = False
+            self._arrays[name] = array
+
+    @classmethod
+    def create(cls, arrays, canvas=None):
+        """配置一個新的共享記憶體區段並複製 arrays ({名稱: 陣列}) 進去。"""
+        arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+        fields, size = {}, 0
+        for name, array in arrays.items():
+            fields[name] = (array.dtype.str, array.shape, size)
+            size += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        shared = cls(shm, fields, canvas, owner=True)
+        for name, array in arrays.items():
+            shared[name][...] = array
+        return shared
+
+    @classmethod
+    def from_layout(cls, layout):
+        """由記憶體中的 Layout 物件建立標準欄位。"""
+        return cls.create(layout_object_arrays(layout), (layout.canvas_width, layout.canvas_height))
+
+    @classmethod
+    def from_layout_data(cls, layout_data):
+        """由原始 JSON 的 layout_data 建立標準欄位。"""
+        return cls.create(layout_data_arrays(layout_data), (layout_data['canvas_width'], layout_data['canvas_height']))
+
+    @classmethod
+    def attach(cls, handle):
+        """在子行程中連接到既有的區段 (唯讀)。"""
+        return cls(shared_memory.SharedMemory(name=handle['name']), handle['fields'], handle.get('canvas'))
+
+    @property
+    def handle(self):
+        return {"name": self.shm.name, "fields": self.fields, "canvas": self.canvas}
+
+    def __getitem__(self, name):
+        return self._arrays[name]
+
+    def __contains__(self, name):
+        return name in self._arrays
+
+    @property
+    def nbytes(self):
+        return self.shm.size
+
+    def close(self):
+        self._arrays = {}
+        self.shm.close()
+
+    def unlink(self):
+        self.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.unlink()
+
+def _edge_indices(pin_ids, edges):
+    edges = np.array(edges, dtype=np.int64).reshape(-1, 2)
+    src, dst = index_of(pin_ids, edges[:, 0]), index_of(pin_ids, edges[:, 1])
+    valid = (src >= 0) & (dst >= 0)
+    return np.stack([src[valid], dst[valid]], axis=1)
+
+def layout_object_arrays(layout):
+    """把記憶體中的 Layout 物件轉成 SharedLayout 的標準欄位 (一般的 NumPy 陣列)。"""
+    rects = layout.rectangles
+    pins = [pin for r in rects for pin in r.pins]
+    arrays = {
+        "boxes": np.array([(r.x, r.y, r.w, r.h) for r in rects], dtype=float).reshape(-1, 4),
+        "rect_ids": np.array([r.id for r in rects], dtype=np.int64),
+        "pin_ids": np.array([pin.id for pin in pins], dtype=np.int64),
+        "pin_rect": np.repeat(np.arange(len(rects), dtype=np.int64), [len(r.pins) for r in rects]),
+        "pin_pos": np.array([pin.get_absolute_pos() for pin in pins], dtype=float).reshape(-1, 2),
+    }
+    arrays["edges"] = _edge_indices(arrays["pin_ids"], layout.edges)
+    return arrays
+
+def layout_data_arrays(layout_data):
+    """把原始 JSON 的 layout_data 轉成 SharedLayout 的標準欄位 (一般的 NumPy 陣列)。"""
+    rects = layout_data['rectangles']
+    rect_ids = np.array([r['id'] for r in rects], dtype=np.int64)
+    boxes = np.array([(r['x'], r['y'], r['w'], r['h']) for r in rects], dtype=float).reshape(-1, 4)
+
+    pins = layout_data.get('pins', [])
+    pin_ids = np.array([pin['id'] for pin in pins], dtype=np.int64)
+    pin_rect = index_of(rect_ids, np.array([pin['parent_rect_id'] for pin in pins], dtype=np.int64))
+    pin_rel = np.array([pin['rel_pos'] for pin in pins], dtype=float).reshape(-1, 2)
+    # 找不到父矩形 (-1) 的引腳座標留為 0，與其相連的連線已在下面排除
+    pin_valid = pin_rect >= 0
+    pin_pos = np.zeros((len(pins), 2))
+    pin_pos[pin_valid] = boxes[pin_rect[pin_valid], :2] + pin_rel[pin_valid]
+    edges = _edge_indices(pin_ids, layout_data.get('netlist_edges', []))
+    edges = edges[pin_valid[edges[:, 0]] & pin_valid[edges[:, 1]]]
+    return {"boxes": boxes, "rect_ids": rect_ids, "pin_ids": pin_ids, "pin_rect": pin_rect,
+            "pin_pos": pin_pos, "edges": edges}
+
+# 子行程內連接好的共享佈局，由 _init_worker 建立
+_worker_layout = None
+
+def _init_worker(handle):
+    global _worker_layout
+    _worker_layout = SharedLayout.attach(handle)
+    # 子行程正常結束時關閉連接的區段 (行程池的子行程不會執行 atexit，只會執行帶 exitpriority 的 Finalize)
+    multiprocessing.util.Finalize(None, _worker_layout.close, exitpriority=10)
+
+def _run_block(func, kwargs, bounds):
+    return func(_worker_layout, bounds, **kwargs)
+
+def map_blocks(shared, func, blocks, workers=None, **kwargs):
+    """
+    以行程池對每個區塊執行 func(shared_layout, bounds, **kwargs)，依區塊順序回傳結果。
+    每個子行程只在啟動時連接一次共享區段；func 必須是模組層級的函式。
+    """
+    with multiprocessing.Pool(processes=workers, initializer=_init_worker, initargs=(shared.handle,)) as pool:
+        results = pool.map(functools.partial(_run_block, func, kwargs), blocks, chunksize=1)
+        # 先讓子行程正常結束以關閉各自的區段，再離開 with (離開時的 terminate() 會直接終止子行程)
+        pool.close()
+        pool.join()
+    return results
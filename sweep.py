@@ -0,0 +1,205 @@
+# sweep.py
+
+import argparse
+import contextlib
+import functools
+import io
+import itertools
+import multiprocessing
+import os
+import time
+import numpy as np
+import serialization
+from cache import ResultCache, layout_cache_key, patch_cached_layout
+from config_compiler import ConfigError, compile_config
+from acceptance import AcceptanceStats
+from main import generate_accepted, load_config, save_layout_to_json
+
+MANIFEST_NAME = 'sweep_manifest.jsonl'
+SWEEP_METHODS = ('grid', 'lhs')
+
+def _axis_values(spec):
+    """grid 的單一參數取值：串列直接使用；{low, high, num} 取等距點 (上下界皆為整數時四捨五入為整數)。"""
+    if isinstance(spec, list):
+        return list(spec)
+    values = np.linspace(spec['low'], spec['high'], int(spec.get('num', 2)))
+    if isinstance(spec['low'], int) and isinstance(spec['high'], int):
+        return sorted(set(int(v) for v in np.rint(values)))
+    return values.tolist()
+
+def _lhs_values(spec, u):
+    """lhs 的單一參數：u 為 [0, 1) 的分層樣本。串列視為離散水準，{low, high} 視為連續範圍 (整數上下界時取整)。"""
+    if isinstance(spec, list):
+        return [spec[int(k)] for k in np.minimum((u * len(spec)).astype(int), len(spec) - 1)]
+    values = spec['low'] + u * (spec['high'] - spec['low'])
+    if isinstance(spec['low'], int) and isinstance(spec['high'], int):
+        return [int(v) for v in np.rint(values)]
+    return values.tolist()
+
+def expand_points(sweep_settings):
+    """把掃描設定展開成座標點的串列，每個點是 {參數名稱: 值}。"""
+    parameters = sweep_settings.get('parameters') or {}
+    method = sweep_settings.get('method', 'grid')
+    if method not in SWEEP_METHODS:
+        raise ValueError(f"不支援的掃描方法 '{method}'，可用的方法: {SWEEP_METHODS}")
+    names = list(parameters)
+    if method == 'grid':
+        axes = [_axis_values(parameters[name]) for name in names]
+        return [dict(zip(names, combo)) for combo in itertools.product(*axes)]
+
+    # 拉丁超立方：每個維度各自把 [0, 1) 切成 num_points 層，每層恰好取一點，再隨機打亂各維度的配對
+    num_points = int(sweep_settings.get('num_points', 10))
+    rng = np.random.default_rng(sweep_settings.get('base_seed'))
+    columns = [_lhs_values(parameters[name], (rng.permutation(num_points) + rng.random(num_points)) / num_points)
+               for name in names]
+    return [dict(zip(names, values)) for values in zip(*columns)]
+
+def job_cost(params):
+    """估計單一樣本的相對耗時 (矩形數 × 目標密度)，用於讓長的工作先開始。"""
+    return params['NUM_RECTANGLES'] * params['TARGET_DENSITY']
+
+def build_jobs(config, compiled_config):
+    """展開掃描設定並抽出每個工作的完整參數；工作編號依 (座標點, 重複次數) 排列。"""
+    sweep_settings = config['sweep_settings']
+    points = expand_points(sweep_settings)
+    unknown = sorted({name for point in points for name in point if not compiled_config.has_param(name)})
+    if unknown:
+        raise ValueError(f"掃描參數不存在於設定檔中: {', '.join(unknown)}")
+    replicates = int(sweep_settings.get('samples_per_point', 1))
+    columns = compiled_config.sample_columns(len(points) * replicates, sweep_settings.get('base_seed'))
+
+    jobs = []
+    for point_index, coordinates in enumerate(points):
+        for replicate in range(replicates):
+            index = len(jobs)
+            params = compiled_config.build_params(columns, index, overrides=coordinates)
+            params['sweep_point'] = {"point": point_index, "replicate": replicate, "coordinates": coordinates}
+            jobs.append({"index": index, "file": f"layout_{index + 1}.json", "params": params, "cost": job_cost(params)})
+    return jobs
+
+_worker_cache = None
+_worker_acceptance = None
+
+def _acceptance_from_config(config):
+    settings = config.get('acceptance_settings') or {}
+    return settings if settings.get('enable', False) else None
+
+def _init_worker(serialization_settings, cache_settings, acceptance_settings=None):
+    global _worker_cache, _worker_acceptance
+    serialization.configure(**serialization_settings)
+    _worker_cache = ResultCache.from_settings(cache_settings)
+    _worker_acceptance = acceptance_settings
+
+def run_job(job, output_dir, verbose=False):
+    """
+    在子行程中生成一個樣本 (與 main.py 相同套用 acceptance_settings 的篩選與重試) 並寫出；回傳清單紀錄。
+    生成過程的輸出預設不顯示，以免多個行程的訊息交錯。重試用完仍未通過的樣本不寫出檔案。
+    """
+    start_time = time.time()
+    params = job['params']
+    cache_key = layout_cache_key(params) if _worker_cache else None
+    stats = AcceptanceStats() if _worker_acceptance else None
+    with contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO()):
+        layout = generate_accepted(params, _worker_acceptance, stats)
+        data = save_layout_to_json(layout, params, os.path.join(output_dir, job['file'])) if layout else None
+    if _worker_cache and data:
+        _worker_cache.put(cache_key, data)
+    return _manifest_entry(job, params, time.time() - start_time, cached=False, stats=stats)
+
+def _manifest_entry(job, params, seconds, cached, stats=None):
+    """清單紀錄；params 為最終使用的參數 (重試後的 SEED)。啟用篩選時另記錄嘗試次數與各條件的拒絕次數。"""
+    tag = params['sweep_point']
+    entry = {"file": job['file'], "point": tag['point'], "replicate": tag['replicate'], "coordinates": tag['coordinates'],
+             "SEED": params['SEED'], "cost": job['cost'], "seconds": round(seconds, 3), "cached": cached}
+    if stats is not None:
+        entry.update({"file": job['file'] if stats.accepted else None,
+                      "attempts": params.get('acceptance_retry', {}).get('attempt', 0) + 1,
+                      "rejections": dict(stats.rejections)})
+    return entry
+
+def run_sweep(config, workers=None, dry_run=False, verbose=False):
+    """
+    依 sweep_settings 展開所有工作，按估計成本由大到小排入行程池 (最長的工作最先開始，縮短整體完成時間)，
+    並寫出 sweep_manifest.jsonl 記錄每個輸出檔案對應的掃描座標。
+    """
+    from tqdm import tqdm
+
+    sweep_settings = config['sweep_settings']
+    output_dir = sweep_settings.get('output_directory', 'sweep_layouts')
+    try:
+        compiled_config = compile_config(config)
+        jobs = build_jobs(config, compiled_config)
+    except (ConfigError, ValueError) as e:
+        print(f"錯誤：{e}")
+        return None
+    jobs.sort(key=lambda job: job['cost'], reverse=True)
+    num_points = len({job['params']['sweep_point']['point'] for job in jobs})
+    print(f"共 {num_points} 個掃描點、{len(jobs)} 個工作 (方法: {sweep_settings.get('method', 'grid')})。")
+
+    if dry_run:
+        print(f"{'file':<18} {'cost':>10}  coordinates")
+        for job in jobs:
+            print(f"{job['file']:<18} {job['cost']:>10.1f}  {job['params']['sweep_point']['coordinates']}")
+        return None
+
+    os.makedirs(output_dir, exist_ok=True)
+    cache = ResultCache.from_settings(config.get('cache_settings'))
+    acceptance = _acceptance_from_config(config)
+    entries, pending = [], []
+    for job in jobs:
+        cached = cache.get(layout_cache_key(job['params'])) if cache else None
+        if cached is None:
+            pending.append(job)
+            continue
+        with open(os.path.join(output_dir, job['file']), 'wb') as f:
+            f.write(patch_cached_layout(cached, job['params']))
+        params, stats = job['params'], None
+        if acceptance:
+            # 快取中的樣本都已通過篩選；只能由 acceptance_retry 還原嘗試次數，不知道先前被哪些條件拒絕
+            stored = serialization.loads(cached)['generation_params']
+            params = {**params, **{k: stored[k] for k in ('SEED', 'acceptance_retry') if k in stored}}
+            stats = AcceptanceStats()
+            stats.finish(params.get('acceptance_retry', {}).get('attempt', 0) + 1, accepted=True)
+        entries.append(_manifest_entry(job, params, 0.0, cached=True, stats=stats))
+    if entries:
+        print(f"{len(entries)} 個工作命中快取，直接寫出。")
+
+    start_time = time.time()
+    initargs = (config.get('serialization_settings', {}), config.get('cache_settings'), acceptance)
+    with multiprocessing.Pool(processes=workers or sweep_settings.get('workers'), initializer=_init_worker, initargs=initargs) as pool:
+        worker_func = functools.partial(run_job, output_dir=output_dir, verbose=verbose)
+        results = pool.imap_unordered(worker_func, pending, chunksize=1)
+        entries.extend(tqdm(results, total=len(pending), desc="參數掃描"))
+
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp_path = manifest_path + '.tmp'
+    with serialization.JsonLinesWriter(tmp_path) as out:
+        for entry in sorted(entries, key=lambda entry: (entry['point'], entry['replicate'])):
+            out.write(entry)
+    os.replace(tmp_path, manifest_path)
+    if acceptance:
+        stats = AcceptanceStats()
+        for entry in entries:
+            stats.rejections.update(entry['rejections'])
+            stats.finish(entry['attempts'], accepted=entry['file'] is not None)
+        print(f"\n{stats.summary()}")
+    written = sum(entry['file'] is not None for entry in entries)
+    print(f"\n掃描完成！{written} 個樣本已寫入 '{output_dir}' (耗時: {time.time() - start_time:.2f} 秒)，清單: '{manifest_path}'")
+    return entries
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a parameter sweep (grid or Latin hypercube) over the layout generator.")
+    parser.add_argument("--config", type=str, default='config.yaml', help="Config file containing a sweep_settings section.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: sweep_settings.workers or all CPUs).")
+    parser.add_argument("--dry-run", action='store_true', help="Only list the expanded jobs in scheduling order.")
+    parser.add_argument("--verbose", action='store_true', help="Show the generator output of every job.")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    if not config.get('sweep_settings'):
+        parser.error(f"'{args.config}' has no sweep_settings section")
+    serialization.configure(**config.get('serialization_settings', {}))
+    run_sweep(config, args.workers, args.dry_run, args.verbose)
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,10 @@
 
 import random
 import math
+import numpy as np
 from layout import Rectangle, Pin
+from occupancy import OccupancyMap
+from config_compiler import draw_int
 
 class SymmetricGenerator:
     def __init__(self, main_params):
@@ -14,98 +17,133 @@ class SymmetricGenerator:
         self.pin_edge_margin_ratio = self.params.get('PIN_EDGE_MARGIN_RATIO', 0.1)
         self.k = self.params.get('PIN_DENSITY_K', 0.01)
         self.p = self.params.get('RENT_EXPONENT_P', 0.6)
-
-    def _generate_pins_on_edge(self, rect, num_pins, start_pin_id):
-        """為單個矩形在邊緣生成引腳，並返回引腳列表和最後的 ID"""
-        pins = []
-        current_pin_id = start_pin_id
-        if num_pins == 0:
-            return pins, current_pin_id
-
-        hw, hh = rect.w / 2, rect.h / 2
-        margin_x = min(rect.w * self.pin_edge_margin_ratio, hw)
-        margin_y = min(rect.h * self.pin_edge_margin_ratio, hh)
-
-        for _ in range(num_pins):
-            edge = random.choice(['top', 'bottom', 'left', 'right'])
-            if edge == 'top': px, py = random.uniform(-hw, hw), random.uniform(-hh, -hh + margin_y)
-            elif edge == 'bottom': px, py = random.uniform(-hw, hw), random.uniform(hh - margin_y, hh)
-            elif edge == 'left': px, py = random.uniform(-hw, -hw + margin_x), random.uniform(-hh, hh)
-            else: px, py = random.uniform(hw - margin_x, hw), random.uniform(-hh, hh)
-            
-            pin = Pin(current_pin_id, rect, (px, py))
-            pins.append(pin)
-            current_pin_id += 1
-        return pins, current_pin_id
-
-    def _generate_rects_for_group_at_center(self, config, center_x, center_y, start_id, start_pin_id, group_id):
+        self._validate_group_configs()
+
+    def _validate_group_configs(self):
+        """在生成前檢查 group_configs，避免不支援的設定在重試迴圈中白白消耗時間。"""
+        min_w = min(t['width_range'][0] for t in self.comp_types_config.values())
+        min_h = min(t['height_range'][0] for t in self.comp_types_config.values())
+        min_gap = self.analog_config['group_gap_range'][0]
+        for config in self.analog_config['group_configs']:
+            n, axis = config['rects_per_group'], config['group_axis']
+            if axis == 'common_centroid':
+                if n != 4:
+                    raise ValueError(f"common_centroid 對稱群組只支援 rects_per_group=4，收到 {n}")
+                min_box = (2 * min_w + min_gap, 2 * min_h + min_gap)
+            elif axis in ('vertical', 'horizontal'):
+                if n < 2:
+                    raise ValueError(f"{axis} 對稱群組至少需要 2 個元件，收到 {n}")
+                min_box = (n * min_w + (n - 1) * min_gap, min_h) if axis == 'vertical' else (min_w, n * min_h + (n - 1) * min_gap)
+            else:
+                raise ValueError(f"不支援的對稱軸 group_axis='{axis}'")
+            # 放置時只限制群組中心離畫布邊緣 150，邊界框本身只需放得進畫布
+            if min_box[0] > self.canvas_w or min_box[1] > self.canvas_h:
+                raise ValueError(f"對稱群組設定 {config} 的最小尺寸 {min_box} 大於畫布")
+
+    def _sample_pin_offsets(self, w, h, num_pins):
+        """在矩形邊緣範圍內取樣引腳的相對座標，回傳 (num_pins, 2) 陣列。"""
+        hw, hh = w / 2, h / 2
+        margin_x = min(w * self.pin_edge_margin_ratio, hw)
+        margin_y = min(h * self.pin_edge_margin_ratio, hh)
+        # 依序為 top, bottom, left, right 四個邊緣的取樣範圍
+        lo = np.array([[-hw, -hh], [-hw, hh - margin_y], [-hw, -hh], [hw - margin_x, -hh]])
+        hi = np.array([[hw, -hh + margin_y], [hw, hh], [-hw + margin_x, hh], [hw, hh]])
+        edge = np.random.randint(0, 4, size=num_pins)
+        return lo[edge] + np.random.uniform(size=(num_pins, 2)) * (hi[edge] - lo[edge])
+
+    def _draw_group_shape(self, config):
+        """
+        抽取一個對稱群組的元件類型與尺寸，並計算整個群組的邊界框大小、各元件相對中心的偏移，
+        以及每個元件相對基準引腳的鏡射符號 (None 代表元件位於對稱軸上，需自我對稱)。
+        - vertical / horizontal: N 個元件沿 x / y 排成一列，對稱軸位於中央，以 ABBA... 交錯指派角色。
+        - common_centroid: 2x2 共質心排列，對角線元件屬於同一角色。
+        """
         comp_type = 'macro' if random.random() < self.analog_config.get('macro_proportion', 0.1) else 'std_cell'
         type_def = self.comp_types_config[comp_type]
-        
         rects_per_group = config['rects_per_group']
         axis = config['group_axis']
-        generated_rects = []
-        current_id = start_id
-        current_pin_id = start_pin_id
-
-        def _set_properties(rect, sym_id, sym_axis):
-            rect.fixed = True
-            rect.constraints['symmetry_id'] = sym_id
-            rect.constraints['symmetry_axis'] = sym_axis
-            return rect
-
-        if rects_per_group == 2:
-            w = random.uniform(*type_def['width_range'])
-            h = random.uniform(*type_def['height_range'])
-            growth_prob = random.uniform(*type_def['growth_prob_range'])
-            gap_mirror = random.uniform(*self.analog_config['group_gap_range'])
-            
-            if axis == 'vertical':
-                base_x, base_y = center_x - gap_mirror / 2 - w / 2, center_y
-                mirror_x = center_x + gap_mirror / 2 + w / 2
-                base_rect = Rectangle(current_id, base_x, base_y, w, h, growth_prob, comp_type)
-                mirror_rect = Rectangle(current_id + 1, mirror_x, base_y, w, h, growth_prob, comp_type)
-            else: # horizontal
-                base_x, base_y = center_x, center_y - gap_mirror / 2 - h / 2
-                mirror_y = center_y + gap_mirror / 2 + h / 2
-                base_rect = Rectangle(current_id, base_x, base_y, w, h, growth_prob, comp_type)
-                mirror_rect = Rectangle(current_id + 1, base_x, mirror_y, w, h, growth_prob, comp_type)
 
-            _set_properties(base_rect, group_id, axis)
-            _set_properties(mirror_rect, group_id, axis)
-
-            area = w * h
-            num_pins = int(self.k * (area ** self.p))
-            if area > 1 and num_pins == 0: num_pins = 1
-
-            base_pins, temp_pin_id = self._generate_pins_on_edge(base_rect, num_pins, current_pin_id)
-            base_rect.pins = base_pins
-            
-            mirror_pins = []
-            for base_pin in base_pins:
-                rel_pos = base_pin.rel_pos
-                mirror_rel_pos = (-rel_pos[0], rel_pos[1]) if axis == 'vertical' else (rel_pos[0], -rel_pos[1])
-                mirror_pin = Pin(temp_pin_id, mirror_rect, mirror_rel_pos)
-                mirror_pins.append(mirror_pin)
-                temp_pin_id += 1
-
-            mirror_rect.pins = mirror_pins
-            current_pin_id = temp_pin_id
-
-            generated_rects.extend([base_rect, mirror_rect])
-            current_id += 2
+        w = random.uniform(*type_def['width_range'])
+        h = random.uniform(*type_def['height_range'])
+        growth_prob = random.uniform(*type_def['growth_prob_range'])
+        gap_mirror = random.uniform(*self.analog_config['group_gap_range'])
+
+        if axis == 'common_centroid':
+            sx, sy = (w + gap_mirror) / 2, (h + gap_mirror) / 2
+            offsets = [(-sx, -sy), (sx, -sy), (-sx, sy), (sx, sy)]
+            mirrors = [(1, 1), (-1, 1), (1, -1), (-1, -1)]
+            roles = ['A', 'B', 'B', 'A']
+            box_w, box_h = 2 * w + gap_mirror, 2 * h + gap_mirror
         else:
-             pass
-
-        return generated_rects, current_id, current_pin_id
-
-    def generate_analog_groups(self, start_id, start_pin_id, existing_rects):
+            pitch = w + gap_mirror if axis == 'vertical' else h + gap_mirror
+            flip = (-1, 1) if axis == 'vertical' else (1, -1)
+            offsets, mirrors, roles = [], [], []
+            for k in range(rects_per_group):
+                t = (k - (rects_per_group - 1) / 2) * pitch
+                offsets.append((t, 0) if axis == 'vertical' else (0, t))
+                if 2 * k == rects_per_group - 1: mirrors.append(None)
+                else: mirrors.append(flip if 2 * k > rects_per_group - 1 else (1, 1))
+                roles.append('AB'[min(k, rects_per_group - 1 - k) % 2])
+            span = rects_per_group * (w if axis == 'vertical' else h) + (rects_per_group - 1) * gap_mirror
+            box_w, box_h = (span, h) if axis == 'vertical' else (w, span)
+        return {'comp_type': comp_type, 'axis': axis, 'w': w, 'h': h, 'growth_prob': growth_prob,
+                'offsets': offsets, 'mirrors': mirrors, 'roles': roles, 'box_w': box_w, 'box_h': box_h}
+
+    def _build_group_rects(self, shape, center_x, center_y, start_id, group_id):
+        """依群組形狀在指定中心建立 (尚未含引腳的) 固定矩形。"""
+        rects = []
+        for idx, (dx, dy) in enumerate(shape['offsets']):
+            rect = Rectangle(start_id + idx, center_x + dx, center_y + dy, shape['w'], shape['h'],
+                             shape['growth_prob'], shape['comp_type'])
+            rect.fixed = True
+            rect.constraints['symmetry_id'] = group_id
+            rect.constraints['symmetry_axis'] = shape['axis']
+            if len(shape['offsets']) > 2:
+                rect.constraints['symmetry_role'] = shape['roles'][idx]
+            rects.append(rect)
+        return rects
+
+    def _axis_pin_offset(self, w, h, axis):
+        """取樣一個落在對稱軸上的邊緣引腳 (鏡射後與自身重合)：vertical 時在上/下邊緣的 x=0，horizontal 時在左/右邊緣的 y=0。"""
+        sign, depth = (1 if np.random.randint(0, 2) else -1), np.random.uniform()
+        if axis == 'vertical':
+            return np.array([[0.0, sign * (h / 2 - min(h * self.pin_edge_margin_ratio, h / 2) * depth)]])
+        return np.array([[sign * (w / 2 - min(w * self.pin_edge_margin_ratio, w / 2) * depth), 0.0]])
+
+    def _attach_mirrored_pins(self, rects, shape, start_pin_id):
+        """
+        在已確定放置的群組上取樣一組基準引腳，並以陣列運算鏡射到群組內每個元件。
+        奇數個元件排成一列時，位於對稱軸上的中央元件需自我對稱：取前 num_pins // 2 個基準引腳與其鏡像，
+        num_pins 為奇數時再加一個落在對稱軸上的引腳，因此引腳數與其他元件相同。
+        """
+        area = shape['w'] * shape['h']
+        num_pins = int(self.k * (area ** self.p))
+        if area > 1 and num_pins == 0: num_pins = 1
+
+        base = self._sample_pin_offsets(shape['w'], shape['h'], num_pins)
+        axis_flip = np.array((-1, 1) if shape['axis'] == 'vertical' else (1, -1))
+        current_pin_id = start_pin_id
+        for rect, mirror in zip(rects, shape['mirrors']):
+            if mirror is None:
+                half = base[:num_pins // 2]
+                rel = np.concatenate([half, half * axis_flip])
+                if num_pins % 2:
+                    rel = np.concatenate([rel, self._axis_pin_offset(shape['w'], shape['h'], shape['axis'])])
+            else:
+                rel = base * np.array(mirror)
+            rect.pins = [Pin(current_pin_id + k, rect, (px, py)) for k, (px, py) in enumerate(rel.tolist())]
+            current_pin_id += len(rect.pins)
+        return current_pin_id
+
+    def generate_analog_groups(self, start_id, start_pin_id, existing_rects, occupancy=None):
         print("\n--- 開始生成帶有對稱引腳的對稱群組 ---")
-        num_groups_config = self.analog_config['num_groups']
-        num_groups = random.randint(num_groups_config['low'], num_groups_config['high'])
+        num_groups = draw_int(self.analog_config['num_groups'])
         group_choices = self.analog_config['group_configs']
         weights = [config['weight'] for config in group_choices]
-        
+        if occupancy is None:
+            occupancy = OccupancyMap.from_rects(self.canvas_w, self.canvas_h, existing_rects,
+                                                self.params.get('OCCUPANCY_CELL_SIZE', 4.0))
+
         newly_placed_rects = []
         current_id = start_id
         current_pin_id = start_pin_id
@@ -114,19 +152,21 @@ class SymmetricGenerator:
             group_id_str = f"sym_group_{i}"
             chosen_config = random.choices(group_choices, weights=weights, k=1)[0]
             for _ in range(200):
-                center_x = random.uniform(150, self.canvas_w - 150)
-                center_y = random.uniform(150, self.canvas_h - 150)
-                
-                potential_rects, next_id, next_pin_id = self._generate_rects_for_group_at_center(
-                    chosen_config, center_x, center_y, current_id, current_pin_id, group_id_str)
-
-                if not potential_rects: continue
-                if any(pr.intersects(er) for pr in potential_rects for er in existing_rects): continue
-                if any(not (0 <= r.x - r.w/2 and r.x + r.w/2 <= self.canvas_w and 0 <= r.y - r.h/2 and r.y + r.h/2 <= self.canvas_h) for r in potential_rects): continue
-                
-                newly_placed_rects.extend(potential_rects)
-                existing_rects.extend(potential_rects)
-                current_id, current_pin_id = next_id, next_pin_id
+                shape = self._draw_group_shape(chosen_config)
+                # 群組中心限制在離畫布邊緣 150 的範圍內，換算成邊界框左上角的範圍
+                half_w, half_h = shape['box_w'] / 2, shape['box_h'] / 2
+                region = (150 - half_w, 150 - half_h, self.canvas_w - 150 - half_w, self.canvas_h - 150 - half_h)
+                anchor = occupancy.sample_free_box(shape['box_w'], shape['box_h'], region)
+                if anchor is None: continue
+
+                center_x, center_y = anchor[0] + half_w, anchor[1] + half_h
+                placed_rects = self._build_group_rects(shape, center_x, center_y, current_id, group_id_str)
+                for r in placed_rects: occupancy.occupy_rect(r)
+                current_pin_id = self._attach_mirrored_pins(placed_rects, shape, current_pin_id)
+
+                newly_placed_rects.extend(placed_rects)
+                existing_rects.extend(placed_rects)
+                current_id += len(placed_rects)
                 break
         
         total_pins = sum(len(r.pins) for r in newly_placed_rects)
@@ -0,0 +1,7 @@
+# tests/conftest.py
+
+import os
+import sys
+
+# 測試直接匯入專案根目錄的模組 (與執行 python main.py 時相同)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
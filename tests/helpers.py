@@ -0,0 +1,22 @@
+# tests/helpers.py
+
+import contextlib
+import copy
+import io
+import os
+from config_compiler import compile_config
+from main import load_config
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config.yaml')
+
+def sample_params(index=0, base_seed=3, num_samples=1, **overrides):
+    """以專案的 config.yaml 與固定的 base_seed 抽出第 index 個樣本的參數 (可覆寫個別參數)。"""
+    compiled = compile_config(load_config(CONFIG_PATH))
+    params = compiled.build_params(compiled.sample_columns(max(num_samples, index + 1), base_seed), index)
+    params.update(copy.deepcopy(overrides))
+    return params
+
+def quiet(func, *args, **kwargs):
+    """執行 func 並丟棄其列印輸出。"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
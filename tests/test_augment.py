@@ -0,0 +1,45 @@
+# tests/test_augment.py
+
+import math
+import pytest
+import serialization
+from augment import TRANSFORMS, augment_ml, augment_raw
+from benchmark import make_synthetic_layout
+from format_for_ml import format_layout_data
+from main import generate_layout, save_layout_to_json
+from helpers import quiet, sample_params
+
+def _assert_close(a, b, path='$'):
+    if isinstance(a, dict):
+        assert isinstance(b, dict) and a.keys() == b.keys(), path
+        for key in a:
+            _assert_close(a[key], b[key], f"{path}.{key}")
+    elif isinstance(a, (list, tuple)):
+        assert isinstance(b, (list, tuple)) and len(a) == len(b), path
+        for i, (x, y) in enumerate(zip(a, b)):
+            _assert_close(x, y, f"{path}[{i}]")
+    elif isinstance(a, float) or isinstance(b, float):
+        assert math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9), f"{path}: {a} != {b}"
+    else:
+        assert a == b, f"{path}: {a!r} != {b!r}"
+
+@pytest.fixture(scope='module')
+def generated(tmp_path_factory):
+    params = sample_params()
+    layout = quiet(generate_layout, dict(params))
+    return serialization.loads(quiet(save_layout_to_json, layout, params, str(tmp_path_factory.mktemp('raw') / 'layout.json')))
+
+@pytest.mark.parametrize("encoding", ['clique', 'hyperedge'])
+@pytest.mark.parametrize("source", ['synthetic', 'generated'])
+def test_augment_commutes_with_format(request, source, encoding):
+    raw = make_synthetic_layout(120, seed=4) if source == 'synthetic' else request.getfixturevalue('generated')
+    names = list(TRANSFORMS)
+    formatted_then_augmented = augment_ml(format_layout_data(raw, encoding), names)
+    for name, augmented, expected in zip(names, augment_raw(raw, names), formatted_then_augmented):
+        _assert_close(format_layout_data(augmented, encoding), expected, name)
+
+def test_augment_raw_round_trips():
+    raw = make_synthetic_layout(60, seed=5)
+    back = augment_raw(augment_raw(raw, ['rot90'])[0], ['rot270'])[0]['layout_data']
+    for r, s in zip(raw['layout_data']['rectangles'], back['rectangles']):
+        _assert_close([r['x'], r['y'], r['w'], r['h']], [s['x'], s['y'], s['w'], s['h']])
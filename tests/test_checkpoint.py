@@ -0,0 +1,34 @@
+# tests/test_checkpoint.py
+
+import copy
+import pytest
+import serialization
+from generator import LayoutGenerator
+from main import complete_layout, generate_layout, generate_placement, save_layout_to_json, start_generator
+from helpers import quiet, sample_params
+
+class _Interrupted(Exception):
+    pass
+
+def _layout_bytes(layout, params, path):
+    return serialization.dumps(serialization.loads(save_layout_to_json(layout, params, path))['layout_data'])
+
+def test_resume_is_bit_identical(tmp_path):
+    params = sample_params()
+    expected = _layout_bytes(quiet(generate_layout, copy.deepcopy(params)), copy.deepcopy(params), str(tmp_path / 'a.json'))
+
+    checkpoint = str(tmp_path / 'layout.ckpt')
+    generator = start_generator(copy.deepcopy(params), checkpoint, checkpoint_every=5)
+
+    def interrupt(generator, rects, iteration, **_):
+        if iteration == 12:
+            raise _Interrupted()
+    generator.add_hook('iteration_end', interrupt)
+    with pytest.raises(_Interrupted):
+        quiet(generator.generate)
+
+    resumed = LayoutGenerator.resume(checkpoint)
+    assert resumed._resume_state['iteration'] == 10
+    placed, alignment_constraints, last_pin_id = quiet(generate_placement, resumed.params, resumed)
+    layout = quiet(complete_layout, placed, resumed.params, alignment_constraints, last_pin_id)
+    assert _layout_bytes(layout, resumed.params, str(tmp_path / 'b.json')) == expected
@@ -0,0 +1,51 @@
+# tests/test_compaction.py
+
+import numpy as np
+from compaction import compact_rects, legalize_boxes
+from generator import LayoutGenerator
+from layout import Rectangle
+from metrics import count_overlaps
+from helpers import quiet, sample_params
+
+def _random_rects(n, seed, size_range=(10, 30), canvas=1000.0, num_fixed=0):
+    rng = np.random.default_rng(seed)
+    rects = []
+    for k in range(n):
+        w, h = rng.uniform(*size_range, 2)
+        rect = Rectangle(k, rng.uniform(w / 2, canvas - w / 2), rng.uniform(h / 2, canvas - h / 2), w, h)
+        rect.fixed = k < num_fixed
+        rects.append(rect)
+    # fixed 元件之間互不重疊 (否則任何合法化都無法消除)
+    return [r for k, r in enumerate(rects) if not r.fixed or not any(r.intersects(o) for o in rects[:k] if o.fixed)]
+
+def test_compaction_removes_overlaps_and_keeps_fixed_rects():
+    rects = _random_rects(400, seed=1, num_fixed=30)
+    before = {r.id: (r.x, r.y, r.w, r.h) for r in rects if r.fixed}
+    assert count_overlaps(np.array([(r.x, r.y, r.w, r.h) for r in rects])) > 0
+    final, stats = compact_rects(rects, 1000.0, 1000.0, passes=4, max_area_loss=0.02, max_removed=0)
+    assert not stats['exceeded']
+    assert count_overlaps(np.array([(r.x, r.y, r.w, r.h) for r in final])) == 0
+    assert {r.id: (r.x, r.y, r.w, r.h) for r in final if r.fixed} == before
+    assert all(0 <= r.x - r.w / 2 and r.x + r.w / 2 <= 1000.0 + 1e-9 for r in final)
+    # 傳入的元件不會被修改
+    assert {r.id: (r.x, r.y, r.w, r.h) for r in rects if r.fixed} == before
+
+def test_dense_input_exceeds_the_loss_limit():
+    rng = np.random.default_rng(0)
+    n, side = 2000, 1000.0
+    w, h = rng.uniform(5, 40, n), rng.uniform(5, 40, n)
+    scale = np.sqrt(0.8 * side * side / (w * h).sum())
+    w, h = w * scale, h * scale
+    boxes = np.column_stack([rng.uniform(w / 2, side - w / 2), rng.uniform(h / 2, side - h / 2), w, h])
+    keep, stats = legalize_boxes(boxes, np.zeros(n, dtype=bool), (side, side), 4, max_area_loss=0.02, max_removed=0)
+    assert stats['exceeded']
+    assert stats['area_lost'] <= 0.03 and stats['removed'] == 0
+
+def test_generator_falls_back_to_shake_past_the_limit():
+    params = sample_params(LEGALIZER='compaction', COMPACTION_MAX_AREA_LOSS=0.0, COMPACTION_MAX_REMOVED=0,
+                           CANVAS_WIDTH=300, CANVAS_HEIGHT=300)
+    rects = _random_rects(150, seed=2, size_range=(20, 40), canvas=300.0)
+    final = quiet(LayoutGenerator(params)._legalize, rects)
+    # Shake 不會移除或縮小元件
+    assert len(final) == len(rects)
+    assert sorted((r.w, r.h) for r in final) == sorted((r.w, r.h) for r in rects)
@@ -0,0 +1,27 @@
+# tests/test_demo_generator.py
+
+from PIL import Image
+from layout import Rectangle
+from demo_generator import FrameRecorder, write_gif
+
+def _gif_durations(path):
+    with Image.open(path) as image:
+        durations = []
+        for k in range(image.n_frames):
+            image.seek(k)
+            durations.append(image.info.get('duration'))
+    return durations
+
+def test_write_gif_keeps_per_frame_durations_in_milliseconds(tmp_path):
+    recorder = FrameRecorder(100, 100)
+    rects = [Rectangle(0, 20, 20, 10, 10)]
+    recorder.capture(rects, "start")
+    recorder.capture(rects, "start")  # 內容相同：延長上一張 (hold 2)
+    rects.append(Rectangle(1, 60, 60, 20, 20))
+    recorder.capture(rects, "key frame", is_final=True)  # 關鍵影格 hold 5
+    rects.append(Rectangle(2, 80, 20, 10, 30))
+    recorder.capture(rects, "end")
+
+    gif_path = tmp_path / "demo.gif"
+    write_gif(recorder, str(gif_path), renderer='raster', width=64, frame_duration=0.2, workers=1)
+    assert _gif_durations(gif_path) == [400, 1000, 200]
@@ -0,0 +1,25 @@
+# tests/test_format_for_ml.py
+
+import pytest
+import serialization
+from benchmark import legacy_format_layout_data, make_synthetic_layout
+from format_for_ml import format_layout_data
+from main import generate_layout, save_layout_to_json
+from helpers import quiet, sample_params
+
+def _int_dims(raw):
+    for r in raw['layout_data']['rectangles']:
+        r['x'], r['y'], r['w'], r['h'] = int(r['x']), int(r['y']), max(1, int(r['w'])), max(1, int(r['h']))
+    raw['layout_data']['canvas_width'] = raw['layout_data']['canvas_height'] = 1000
+    return raw
+
+@pytest.mark.parametrize("raw", [make_synthetic_layout(50, seed=1), make_synthetic_layout(300, seed=2),
+                                 _int_dims(make_synthetic_layout(200, seed=3))], ids=["small", "large", "int_dims"])
+def test_format_matches_legacy_on_synthetic(raw):
+    assert serialization.dumps(format_layout_data(raw)) == serialization.dumps(legacy_format_layout_data(raw))
+
+def test_format_matches_legacy_on_generated(tmp_path):
+    params = sample_params()
+    layout = quiet(generate_layout, dict(params))
+    raw = serialization.loads(quiet(save_layout_to_json, layout, params, str(tmp_path / 'layout.json')))
+    assert serialization.dumps(format_layout_data(raw)) == serialization.dumps(legacy_format_layout_data(raw))
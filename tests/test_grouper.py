@@ -0,0 +1,43 @@
+# tests/test_grouper.py
+
+import itertools
+import random
+from collections import defaultdict
+from grouper import LayoutGrouper
+from layout import Layout, Rectangle
+from helpers import quiet
+
+def _grid_hierarchy_layout(n=400, seed=0):
+    rng = random.Random(seed)
+    layout = Layout(600, 600)
+    layout.rectangles = [Rectangle(i, rng.uniform(0, 600), rng.uniform(0, 600), 8, 8) for i in range(n)]
+    settings = {"enable": True, "method": "grid_hierarchy", "grid_cell_size": 60.0, "num_levels": 3,
+                "level_scale": 2.0, "min_units_per_group": 2}
+    random.seed(seed)
+    return quiet(LayoutGrouper(layout, {"grouping_settings": settings}).create_hierarchical_groups)
+
+def test_grid_hierarchy_encodes_each_pair_once():
+    layout = _grid_hierarchy_layout()
+    pairs = [pair for group in layout.hierarchical_group_constraints for pair in itertools.combinations(sorted(group), 2)]
+    assert pairs and len(pairs) == len(set(pairs))
+
+def test_grid_hierarchy_groups_stay_connected():
+    layout = _grid_hierarchy_layout()
+    neighbors = defaultdict(set)
+    for group in layout.hierarchical_group_constraints:
+        for a, b in itertools.combinations(group, 2):
+            neighbors[a].add(b); neighbors[b].add(a)
+    members = defaultdict(set)
+    for r in layout.rectangles:
+        for group_id in r.constraints.get('grouping_path', []):
+            members[group_id].add(r.id)
+    assert any(group_id.startswith('h_group_L2') for group_id in members)
+    for group_id, ids in members.items():
+        # 每個群組的所有成員都必須能只經由群組約束的連線互相到達
+        seen, stack = set(), [next(iter(ids))]
+        while stack:
+            node = stack.pop()
+            if node in seen: continue
+            seen.add(node)
+            stack.extend(neighbors[node])
+        assert ids <= seen, group_id
@@ -0,0 +1,58 @@
+# tests/test_incremental_netlist.py
+
+import random
+import numpy as np
+from incremental_netlist import IncrementalNetlist
+from layout import Layout, Rectangle
+from parallel_netlist import knn_candidates, nearest_neighbors, pin_arrays
+from helpers import quiet
+
+EDGE_SETTINGS = {"p_max": 0.8, "decay_rate": 0.02, "max_length_limit": 80.0, "k_neighbors": 4}
+
+def _layout():
+    rng = random.Random(0)
+    layout = Layout(400, 400)
+    layout.rectangles = [Rectangle(i, rng.uniform(0, 400), rng.uniform(0, 400), rng.uniform(4, 20), rng.uniform(4, 20))
+                         for i in range(150)]
+    random.seed(1)
+    quiet(layout.generate_pins, k=1.0, p=0.5)
+    quiet(layout.generate_edges, **EDGE_SETTINGS)
+    return layout
+
+def _jitter(netlist, rounds=5, moved_per_round=8):
+    rng = random.Random(2)
+    for _ in range(rounds):
+        moved = rng.sample(netlist.layout.rectangles, moved_per_round)
+        for r in moved:
+            r.x += rng.uniform(-30, 30); r.y += rng.uniform(-30, 30)
+        netlist.update(moved)
+
+def test_update_matches_full_rebuild():
+    layout = _layout()
+    netlist = IncrementalNetlist(layout, **EDGE_SETTINGS)
+    _jitter(netlist)
+
+    pos, parent = pin_arrays(netlist.pins)
+    assert np.allclose(netlist.pos, pos)
+    assert netlist.nn.tolist() == nearest_neighbors(pos, parent).tolist()
+    full = knn_candidates(pos, parent, EDGE_SETTINGS['max_length_limit'], EDGE_SETTINGS['k_neighbors'])
+    assert netlist.topk == [neighbors for _, neighbors in full]
+
+    rebuilt = IncrementalNetlist(layout, **EDGE_SETTINGS)
+    assert rebuilt.nn.tolist() == netlist.nn.tolist() and rebuilt.topk == netlist.topk
+
+def test_updated_edges_are_justified():
+    layout = _layout()
+    netlist = IncrementalNetlist(layout, **EDGE_SETTINGS)
+    _jitter(netlist)
+
+    edges = {tuple(sorted(edge)) for edge in layout.edges}
+    assert edges == netlist.edge_set
+    index_of = netlist.index_of
+    for i, j in enumerate(netlist.nn.tolist()):
+        if j >= 0:
+            assert tuple(sorted((netlist.pins[i].id, netlist.pins[j].id))) in edges
+    # 完整重建只會產生最近鄰或候選關係的連線，局部更新後也不能留下其他連線
+    for a_id, b_id in edges:
+        a, b = index_of[a_id], index_of[b_id]
+        assert netlist.nn[a] == b or netlist.nn[b] == a or b in netlist.topk[a] or a in netlist.topk[b]
@@ -0,0 +1,43 @@
+# tests/test_parallel_netlist.py
+
+import random
+import numpy as np
+import pytest
+import parallel_netlist
+from layout import Layout, Rectangle
+from helpers import quiet
+
+def _edges(monkeypatch, block_elements, workers, backend, chunk_size=None):
+    monkeypatch.setattr(parallel_netlist, 'MAX_BLOCK_ELEMENTS', block_elements)
+    rng = random.Random(0)
+    layout = Layout(400, 400)
+    layout.rectangles = [Rectangle(i, rng.uniform(0, 400), rng.uniform(0, 400), rng.uniform(4, 20), rng.uniform(4, 20))
+                         for i in range(150)]
+    random.seed(1)
+    quiet(layout.generate_pins, k=1.0, p=0.5, chunk_size=chunk_size, workers=workers)
+    quiet(layout.generate_edges, p_max=0.8, decay_rate=0.02, max_length_limit=120.0, k_neighbors=5,
+          workers=workers, backend=backend)
+    pins = [(pin.id, pin.parent_rect.id, pin.rel_pos) for r in layout.rectangles for pin in r.pins]
+    return pins, sorted(layout.edges)
+
+@pytest.mark.parametrize("workers,backend", [(1, 'thread'), (3, 'thread'), (2, 'process'), (3, 'process')])
+def test_chunked_edges_match_single_block(monkeypatch, workers, backend):
+    pins, expected = _edges(monkeypatch, 1 << 22, 1, 'thread')
+    assert len(pins) > 300 and expected
+    # 區塊很小時每次呼叫會切成數十個區塊，結果仍必須與單一區塊完全相同
+    assert _edges(monkeypatch, 1 << 12, workers, backend) == (pins, expected)
+
+@pytest.mark.parametrize("chunk_size,workers", [(16, 1), (16, 3), (4096, 2)])
+def test_chunked_pin_sampling_ignores_workers(monkeypatch, chunk_size, workers):
+    assert _edges(monkeypatch, 1 << 22, workers, 'thread', chunk_size) == _edges(monkeypatch, 1 << 22, 1, 'thread', chunk_size)
+
+def test_knn_candidates_match_brute_force():
+    rng = np.random.default_rng(0)
+    pos, parent = rng.random((200, 2)) * 50, rng.integers(0, 40, 200)
+    candidates = parallel_netlist.knn_candidates(pos, parent, 20.0, 4, workers=2)
+    for i, (distances, neighbors) in enumerate(candidates):
+        d = np.abs(pos - pos[i]).sum(axis=1)
+        ok = [(d[j], j) for j in range(len(pos)) if parent[j] != parent[i] and d[j] < 20.0]
+        expected = sorted(ok)[:4]
+        assert neighbors == [j for _, j in expected]
+        assert np.allclose(distances, [dist for dist, _ in expected])
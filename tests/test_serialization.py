@@ -0,0 +1,50 @@
+# tests/test_serialization.py
+
+import json
+import numpy as np
+import pytest
+import serialization
+from benchmark import make_synthetic_layout
+
+@pytest.fixture(autouse=True)
+def restore_settings():
+    saved = serialization.get_settings()
+    yield
+    serialization._settings.update(saved)
+
+@pytest.mark.parametrize("backend", serialization.BACKENDS)
+@pytest.mark.parametrize("indent", [None, 2, 4])
+def test_round_trip_matches_stdlib(backend, indent):
+    data = make_synthetic_layout(40, seed=6)
+    encoded = serialization.dumps(data, indent=indent, backend=backend)
+    # tuple 會輸出成 list，與標準函式庫 json 的結果相同
+    assert serialization.loads(encoded, backend) == json.loads(json.dumps(data))
+    assert (b'\n' in encoded) == bool(indent)
+
+@pytest.mark.parametrize("backend", serialization.BACKENDS)
+def test_numpy_values_are_serialized(backend):
+    data = {"a": np.arange(3), "b": np.float64(1.5), "c": np.int64(7), "d": np.zeros((2, 2))}
+    assert serialization.loads(serialization.dumps(data, backend=backend)) == {"a": [0, 1, 2], "b": 1.5, "c": 7,
+                                                                               "d": [[0.0, 0.0], [0.0, 0.0]]}
+
+def test_canonical_dumps_ignores_key_order():
+    assert serialization.canonical_dumps({"b": 1, "a": [1, 2]}) == serialization.canonical_dumps({"a": [1, 2], "b": 1})
+
+def test_environment_overrides_auto_backend(monkeypatch):
+    monkeypatch.setenv('LAYOUT_JSON_BACKEND', 'json')
+    assert serialization.configure('auto')['backend'] == 'json'
+    assert serialization.resolve_backend() == 'json'
+    # 明確指定的後端優先於環境變數
+    assert serialization.configure(serialization.BACKENDS[0])['backend'] == serialization.BACKENDS[0]
+    with pytest.raises(ValueError):
+        serialization.resolve_backend('missing')
+
+def test_json_lines_round_trip(tmp_path):
+    path = str(tmp_path / 'samples.jsonl')
+    records = [make_synthetic_layout(5, seed=k) for k in range(3)]
+    with serialization.JsonLinesWriter(path) as writer:
+        for record in records[:2]:
+            writer.write(record)
+        writer.write_bytes(serialization.dumps(records[2], indent=0))
+    assert writer.count == 3
+    assert list(serialization.iter_json_lines(path)) == json.loads(json.dumps(records))
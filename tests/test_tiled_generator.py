@@ -0,0 +1,16 @@
+# tests/test_tiled_generator.py
+
+import copy
+import pytest
+from main import generate_placement
+from helpers import quiet, sample_params
+
+@pytest.mark.parametrize("tiles", [2, 4])
+def test_tiled_density_tracks_untiled(tiles):
+    params = sample_params()
+    untiled = quiet(generate_placement, copy.deepcopy(params))[0]
+    tiled_params = dict(copy.deepcopy(params), tiling_settings={"enable": True, "tiles_x": tiles, "tiles_y": tiles,
+                                                               "halo": 40.0, "workers": 1})
+    tiled = quiet(generate_placement, tiled_params)[0]
+    assert abs(tiled.get_density() - untiled.get_density()) < 0.04
+    assert abs(tiled.get_density() - params['TARGET_DENSITY']) < 0.04
@@ -0,0 +1,175 @@
+# tiled_generator.py
+
+import contextlib
+import io
+import multiprocessing
+import random
+import time
+import numpy as np
+from generator import LayoutGenerator
+from layout import Rectangle, Layout
+from metrics import overlapping_pairs
+
+def tile_grid(canvas_w, canvas_h, tiles_x, tiles_y, halo):
+    """
+    把畫布切成 tiles_x * tiles_y 個區塊。每個區塊有核心區域 core (新元件的中心只會放在這裡)
+    與向外擴張 halo 的延伸區域 extended (元件可以長進鄰近區塊的邊界帶，裁切到畫布內)。
+    """
+    xs, ys = np.linspace(0, canvas_w, tiles_x + 1), np.linspace(0, canvas_h, tiles_y + 1)
+    tiles = []
+    for j in range(tiles_y):
+        for i in range(tiles_x):
+            core = (float(xs[i]), float(ys[j]), float(xs[i + 1]), float(ys[j + 1]))
+            extended = (max(0.0, core[0] - halo), max(0.0, core[1] - halo),
+                        min(float(canvas_w), core[2] + halo), min(float(canvas_h), core[3] + halo))
+            tiles.append({"index": len(tiles), "core": core, "extended": extended})
+    return tiles
+
+def split_count(total, weights):
+    """依權重把 total 分配成整數 (最大餘數法)，總和恰為 total。"""
+    weights = np.asarray(weights, dtype=float)
+    exact = total * weights / weights.sum()
+    counts = np.floor(exact).astype(int)
+    counts[np.argsort(-(exact - counts), kind='stable')[:total - counts.sum()]] += 1
+    return counts.tolist()
+
+def tile_seed(seed, index):
+    """由樣本 SEED 與區塊編號衍生區塊的種子，結果與平行的行程數無關。"""
+    return int(np.random.SeedSequence([seed, index]).generate_state(1)[0])
+
+def _generate_tile(task):
+    """
+    在子行程中生成一個區塊：座標平移到延伸區域的原點，延伸區域內的預置元件作為固定障礙物，
+    在核心區域放置隨機元件後執行完整的生長、Shake 與區塊內的合法化。回傳平移回全域座標的可移動元件。
+    """
+    from main import place_random_components
+
+    params, (ox, oy, _, _) = task['params'], task['extended']
+    random.seed(params['SEED']); np.random.seed(params['SEED'])
+    rects = []
+    for k, (cx, cy, w, h) in enumerate(task['obstacles']):
+        obstacle = Rectangle(k, cx - ox, cy - oy, w, h)
+        obstacle.fixed = True
+        rects.append(obstacle)
+    x0, y0, x1, y1 = task['core']
+    with contextlib.redirect_stdout(io.StringIO()):
+        place_random_components(params, rects, len(rects) - 1, region=(x0 - ox, y0 - oy, x1 - ox, y1 - oy))
+        params['initial_rects'] = rects
+        layout = LayoutGenerator(params).generate()
+    movable = [r for r in layout.rectangles if not r.fixed]
+    boxes = np.array([(r.x + ox, r.y + oy, r.w, r.h) for r in movable], dtype=float).reshape(-1, 4)
+    return task['index'], boxes, [r.growth_prob for r in movable], [r.component_type for r in movable]
+
+def reconcile_boundaries(boxes, num_fixed, min_size=1.0):
+    """
+    消除區塊之間 (與區塊內殘留) 的重疊：每一對重疊的矩形中，編號較大者 (預置的固定元件排在最前面，永不修改)
+    把面向對方的邊縮到對方的邊界上，並選擇損失面積較小的軸。矩形只會縮小，因此單次掃描就不會產生新的重疊；
+    縮到小於 min_size 的矩形會被移除。回傳 (保留遮罩, 被縮小的矩形數)。
+    """
+    x0 = boxes[:, 0] - boxes[:, 2] / 2; x1 = boxes[:, 0] + boxes[:, 2] / 2
+    y0 = boxes[:, 1] - boxes[:, 3] / 2; y1 = boxes[:, 1] + boxes[:, 3] / 2
+    keep = np.ones(len(boxes), dtype=bool)
+    trimmed = set()
+    firsts, seconds = overlapping_pairs(boxes)
+    for a, b in sorted(zip(firsts.tolist(), seconds.tolist())):
+        if not (keep[a] and keep[b]) or b < num_fixed:
+            continue
+        if min(x1[a], x1[b]) - max(x0[a], x0[b]) <= 0 or min(y1[a], y1[b]) - max(y0[a], y0[b]) <= 0:
+            continue
+        # 把 b 面向 a 的那條邊移到 a 的另一側邊界上 (b 跨越 a 時也能完全分開)，選擇裁掉較少的軸
+        right, below = x0[b] + x1[b] >= x0[a] + x1[a], y0[b] + y1[b] >= y0[a] + y1[a]
+        cut_x = x1[a] - x0[b] if right else x1[b] - x0[a]
+        cut_y = y1[a] - y0[b] if below else y1[b] - y0[a]
+        if cut_x * (y1[b] - y0[b]) <= cut_y * (x1[b] - x0[b]):
+            if right: x0[b] = x1[a]
+            else: x1[b] = x0[a]
+        else:
+            if below: y0[b] = y1[a]
+            else: y1[b] = y0[a]
+        trimmed.add(b)
+        if x1[b] - x0[b] < min_size or y1[b] - y0[b] < min_size:
+            keep[b] = False
+    boxes[:, 0], boxes[:, 1] = (x0 + x1) / 2, (y0 + y1) / 2
+    boxes[:, 2], boxes[:, 3] = x1 - x0, y1 - y0
+    return keep, len(trimmed)
+
+class TiledLayoutGenerator:
+    """
+    把畫布切成帶有邊界帶 (halo) 的區塊，各區塊在不同行程中獨立執行生長與 Shake，
+    之後縮回區塊之間的重疊、重新編號，並執行全域的最終合法化。輸出與 LayoutGenerator 相同的 Layout。
+    """
+    def __init__(self, params, tiles_x=None, tiles_y=None, halo=None, workers=None):
+        settings = params.get('tiling_settings', {})
+        self.params = params
+        self.tiles_x = tiles_x or settings.get('tiles_x', 2)
+        self.tiles_y = tiles_y or settings.get('tiles_y', 2)
+        self.halo = settings.get('halo', 40.0) if halo is None else halo
+        self.workers = workers or settings.get('workers')
+
+    def _tile_tasks(self, fixed_boxes):
+        p = self.params
+        tiles = tile_grid(p['CANVAS_WIDTH'], p['CANVAS_HEIGHT'], self.tiles_x, self.tiles_y, self.halo)
+        areas = [(t['core'][2] - t['core'][0]) * (t['core'][3] - t['core'][1]) for t in tiles]
+        counts = split_count(p['NUM_RECTANGLES'], areas)
+        base = {k: v for k, v in p.items() if k != 'initial_rects'}
+        for tile, count in zip(tiles, counts):
+            ex0, ey0, ex1, ey1 = tile['extended']
+            inside = ((fixed_boxes[:, 0] + fixed_boxes[:, 2] / 2 >= ex0) & (fixed_boxes[:, 0] - fixed_boxes[:, 2] / 2 <= ex1) &
+                      (fixed_boxes[:, 1] + fixed_boxes[:, 3] / 2 >= ey0) & (fixed_boxes[:, 1] - fixed_boxes[:, 3] / 2 <= ey1))
+            tile['obstacles'] = fixed_boxes[inside].tolist()
+            # 目標密度以核心區域衡量：延伸區域的邊界帶與鄰近區塊重疊，整合邊界時會被縮回，不能算進這個區塊
+            x0, y0, x1, y1 = tile['core']
+            tile['params'] = dict(base, CANVAS_WIDTH=ex1 - ex0, CANVAS_HEIGHT=ey1 - ey0, NUM_RECTANGLES=count,
+                                  SEED=tile_seed(p['SEED'], tile['index']),
+                                  DENSITY_REGION=(x0 - ex0, y0 - ey0, x1 - ex0, y1 - ey0))
+        return tiles
+
+    def generate(self, fixed_rects, last_id):
+        """fixed_rects: 已放置的預置元件 (對稱/對齊群組，含引腳)，保留原物件與編號；last_id: 其最大編號。"""
+        p = self.params
+        start_time = time.time()
+        fixed_boxes = np.array([(r.x, r.y, r.w, r.h) for r in fixed_rects], dtype=float).reshape(-1, 4)
+        tasks = self._tile_tasks(fixed_boxes)
+        print(f"開始分塊生成佈局：{self.tiles_x}x{self.tiles_y} 個區塊，邊界帶 {self.halo}，"
+              f"共 {p['NUM_RECTANGLES']} 個隨機元件...")
+
+        results = [None] * len(tasks)
+        # 元件數較多的區塊先開始；結果依區塊編號排列，與完成順序無關
+        ordered = sorted(tasks, key=lambda t: t['params']['NUM_RECTANGLES'], reverse=True)
+        if multiprocessing.current_process().daemon or self.workers == 1:
+            # 已在行程池的子行程中 (例如 sweep.py 的工作) 不能再建立子行程：在本行程依序生成，
+            # 並還原各區塊重設過的全域亂數狀態，使後續步驟與使用行程池時相同
+            states = random.getstate(), np.random.get_state()
+            for index, boxes, probs, types in map(_generate_tile, ordered):
+                results[index] = (boxes, probs, types)
+            random.setstate(states[0]); np.random.set_state(states[1])
+        else:
+            with multiprocessing.Pool(processes=self.workers) as pool:
+                for index, boxes, probs, types in pool.imap_unordered(_generate_tile, ordered, chunksize=1):
+                    results[index] = (boxes, probs, types)
+        print(f"所有區塊生成完畢 (耗時: {time.time() - start_time:.2f} 秒)，開始整合區塊邊界...")
+
+        boxes = np.concatenate([fixed_boxes] + [r[0] for r in results])
+        probs = [prob for r in results for prob in r[1]]
+        types = [t for r in results for t in r[2]]
+        keep, trimmed = reconcile_boundaries(boxes, len(fixed_rects))
+        print(f"邊界整合完成：縮小了 {trimmed} 個元件，移除了 {int((~keep).sum())} 個過小的元件。")
+
+        rects = list(fixed_rects)
+        for k in np.flatnonzero(keep[len(fixed_rects):]).tolist():
+            cx, cy, w, h = boxes[len(fixed_rects) + k].tolist()
+            last_id += 1
+            rects.append(Rectangle(last_id, cx, cy, w, h, probs[k], types[k]))
+
+        remaining = len(overlapping_pairs(boxes[keep])[0])
+        if remaining:
+            print(f"仍有 {remaining} 對重疊，執行全域合法化...")
+            rects = LayoutGenerator(p)._legalize(rects)
+        else:
+            print("全域合法化檢查：已無重疊。")
+
+        final_layout = Layout(p['CANVAS_WIDTH'], p['CANVAS_HEIGHT'])
+        final_layout.rectangles = rects
+        print(f"\n分塊佈局生成完畢，耗時: {time.time() - start_time:.2f} 秒")
+        print(f"最終元件數量: {len(final_layout.rectangles)}, 最終密度: {final_layout.get_density():.3%}")
+        return final_layout
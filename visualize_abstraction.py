@@ -1,11 +1,12 @@
 # visualize_abstraction.py
 
-import json
+import serialization
 import argparse
 import os
 from collections import defaultdict
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
+from fast_render import layout_arrays, draw_layout
 
 VIVID_COLORS = {
     'grouping':     {'face': "#1F1F1F", 'edge': '#6A1B9A'},
@@ -29,56 +30,12 @@ def load_json_data(file_path):
     if not os.path.exists(file_path):
         print(f"錯誤：找不到檔案 {file_path}")
         exit(1)
-    with open(file_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
-
-def get_color_scheme(r_data, color_palette):
-    """根據元件的約束和類型，從指定的調色盤中獲取顏色"""
-    constraints = r_data.get('constraints', {})
-    component_type = r_data.get('component_type')
-
-    if 'grouping_id' in constraints:
-        return color_palette['grouping']
-    elif 'symmetry_id' in constraints:
-        return color_palette['symmetry']
-    elif 'alignment_id' in constraints:
-        return color_palette['alignment']
-    elif component_type == 'macro':
-        return color_palette['macro']
-    elif component_type == 'std_cell':
-        return color_palette['std_cell']
-    else:
-        return color_palette['default']
+    return serialization.load(file_path)
 
 def draw_rects_and_pins(ax, rects_data, pins, edges, color_palette):
-    """根據指定的調色盤繪製元件、引腳和連線"""
-    rect_map = {r['id']: r for r in rects_data}
-    pin_map = {p['id']: p for p in pins}
-
-    for r in rects_data:
-        colors = get_color_scheme(r, color_palette)
-        rect_patch = patches.Rectangle(
-            (r['x'] - r['w'] / 2, r['y'] - r['h'] / 2), r['w'], r['h'],
-            linewidth=1.5, edgecolor=colors['edge'], facecolor=colors['face'], zorder=2
-        )
-        ax.add_patch(rect_patch)
-        ax.text(r['x'], r['y'], str(r['id']), ha='center', va='center', fontsize=6, zorder=5)
-
-    for pin1_id, pin2_id in edges:
-        pin1, pin2 = pin_map.get(pin1_id), pin_map.get(pin2_id)
-        if not pin1 or not pin2: continue
-        rect1, rect2 = rect_map.get(pin1['parent_rect_id']), rect_map.get(pin2['parent_rect_id'])
-        if not rect1 or not rect2: continue
-        pos1 = (rect1['x'] + pin1['rel_pos'][0], rect1['y'] + pin1['rel_pos'][1])
-        pos2 = (rect2['x'] + pin2['rel_pos'][0], rect2['y'] + pin2['rel_pos'][1])
-        ax.plot([pos1[0], pos2[0]], [pos1[1], pos2[1]], color='gray', alpha=0.5, linewidth=0.6, zorder=3)
-
-    for pin in pins:
-        parent_rect = rect_map.get(pin['parent_rect_id'])
-        if parent_rect:
-            abs_x = parent_rect['x'] + pin['rel_pos'][0]
-            abs_y = parent_rect['y'] + pin['rel_pos'][1]
-            ax.plot(abs_x, abs_y, 'k.', markersize=3, zorder=4)
+    """根據指定的調色盤繪製元件、引腳和連線 (以 collection 一次繪製，見 fast_render.draw_layout)"""
+    arrays = layout_arrays({"rectangles": rects_data, "pins": pins, "netlist_edges": edges})
+    draw_layout(ax, arrays, color_palette, label_fontsize=6, edge_alpha=0.5)
 
 def draw_abstracted_view(ax, rects_data, pins, edges):
     """繪製模型眼中的抽象化視圖"""